@@ -0,0 +1,267 @@
+"""
+Benchmark LanceDBDatabase ingest and search at several table sizes.
+
+Every scale runs in a fresh process against a temporary local LanceDB
+directory, so peak RSS numbers are not polluted by earlier scales.
+
+Example:
+    python benchmarks/lancedb_benchmark.py --scales 1e4 1e5 1e6 --dim 384 --output bench_results/before.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import multiprocessing as mp
+from queue import Empty
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from rag.lancedb_database import LanceDBDatabase, VectorStoreItem
+
+
+WORDS = {
+    "en": ["hello", "dance", "night", "shrine", "fox", "festival", "story", "tea", "sakura", "thunder", "publisher", "novel"],
+    "zh": ["你好", "跳舞", "夜晚", "神社", "狐狸", "祭典", "故事", "喝茶", "樱花", "雷电", "出版社", "小说"],
+    "ja": ["こんにちは", "踊り", "夜", "神社", "狐", "祭り", "物語", "お茶", "桜", "雷", "出版社", "小説"],
+}
+CONTENT_TYPES = ["chat", "lore", "note"]
+START_TIME = datetime(2024, 1, 1)
+
+
+def _current_rss() -> int:
+    """Current resident set size in bytes"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # ru_maxrss is the peak, the best we can do without /proc
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class PeakRSSSampler():
+    """Sample RSS in a background thread and keep the peak"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+
+
+def generate_items(start: int, count: int, dim: int, rng: np.random.Generator) -> list[VectorStoreItem]:
+    """Synthetic multilingual rows with timestamps, attributes and unit-norm vectors"""
+    vectors = rng.standard_normal((count, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    offsets = rng.integers(0, 365 * 24 * 3600, size=count)
+    languages = rng.choice(list(WORDS), size=count)
+    lengths = rng.integers(4, 24, size=count)
+
+    items = []
+    for i in range(count):
+        words = WORDS[languages[i]]
+        content = " ".join(random.choices(words, k=int(lengths[i])))
+        items.append(VectorStoreItem(
+            id=str(start + i),
+            timestamp=(START_TIME + timedelta(seconds=int(offsets[i]))).strftime("%Y-%m-%d %H:%M:%S"),
+            content_type=CONTENT_TYPES[i % len(CONTENT_TYPES)],
+            content=content,
+            vector=vectors[i].tolist(),
+            attributes={"language": str(languages[i]), "sender": "You" if i % 2 else "Role"},
+        ))
+    return items
+
+
+def percentiles(samples: list[float]) -> dict:
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+        "max_ms": float(values.max()),
+    }
+
+
+def run_scale(rows: int, args: argparse.Namespace) -> dict:
+    random.seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+    db_dir = tempfile.mkdtemp(prefix="lancedb_bench_", dir=args.tmp_dir)
+
+    try:
+        database = LanceDBDatabase(db_dir, "bench")
+        database.connect()
+
+        # Ingest
+        generate_time = 0.0
+        load_time = 0.0
+        with PeakRSSSampler() as ingest_rss:
+            for start in range(0, rows, args.batch_size):
+                count = min(args.batch_size, rows - start)
+                t0 = time.perf_counter()
+                items = generate_items(start, count, args.dim, rng)
+                t1 = time.perf_counter()
+                database.load_data(items)
+                load_time += time.perf_counter() - t1
+                generate_time += t1 - t0
+                del items
+
+        result = {
+            "rows": rows,
+            "ingest": {
+                "seconds": load_time,
+                "rows_per_second": rows / load_time if load_time else None,
+                "generate_seconds": generate_time,
+                "peak_rss_bytes": ingest_rss.peak,
+            },
+            "disk_bytes": sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(db_dir)
+                for name in names
+            ),
+            "queries": {},
+        }
+
+        # Search
+        queries = {
+            "search_by_content": lambda i: database.search_by_content(
+                random.choice(WORDS[random.choice(list(WORDS))]), limit=args.limit),
+            "search_by_timestamp_range": lambda i: database.search_by_timestamp_range(
+                (START_TIME + timedelta(days=i % 300)).strftime("%Y-%m-%d"),
+                (START_TIME + timedelta(days=i % 300 + args.range_days)).strftime("%Y-%m-%d"),
+                limit=args.limit),
+            "search_by_content_type": lambda i: database.search_by_content_type(
+                CONTENT_TYPES[i % len(CONTENT_TYPES)], limit=args.limit),
+        }
+
+        for name, make_query in queries.items():
+            latencies = []
+            result_rows = []
+            with PeakRSSSampler() as query_rss:
+                for i in range(args.warmup + args.repeat):
+                    t0 = time.perf_counter()
+                    # Materialize so the lazy result is actually read
+                    table = make_query(i).to_arrow()
+                    elapsed = time.perf_counter() - t0
+                    if i >= args.warmup:
+                        latencies.append(elapsed)
+                        result_rows.append(table.num_rows)
+                    del table
+
+            result["queries"][name] = {
+                **percentiles(latencies),
+                "repeat": args.repeat,
+                "mean_result_rows": float(np.mean(result_rows)),
+                "peak_rss_bytes": query_rss.peak,
+            }
+
+        return result
+
+    finally:
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def _worker(rows: int, args: argparse.Namespace, queue: mp.Queue):
+    try:
+        queue.put(run_scale(rows, args))
+    except Exception as e:
+        queue.put({"rows": rows, "error": repr(e)})
+
+
+def _wait_result(process, queue, rows: int, poll_interval: float = 1.0) -> dict:
+    """Result of a worker, or an error when it exited without one (e.g. killed when out of memory)"""
+    while True:
+        try:
+            return queue.get(timeout=poll_interval)
+        except Empty:
+            if not process.is_alive():
+                break
+    # the result may have been put right before the process exited
+    try:
+        return queue.get(timeout=poll_interval)
+    except Empty:
+        return {"rows": rows, "error": f"worker exited with code {process.exitcode} without a result"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LanceDBDatabase at several table sizes")
+    parser.add_argument("--scales", nargs="+", default=["1e4", "1e5", "1e6"], help="Row counts, e.g. 1e4 1e5 1e7")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Rows per load_data call")
+    parser.add_argument("--repeat", type=int, default=20, help="Measured queries per method")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured queries per method")
+    parser.add_argument("--limit", type=int, default=None, help="Row limit passed to each search (default: all rows)")
+    parser.add_argument("--range-days", type=int, default=7, help="Width of the timestamp range queries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tmp-dir", default=None, help="Parent directory of the temporary databases")
+    parser.add_argument("--output", default=None, help="Result JSON path (default: bench_results/lancedb_<time>.json)")
+    args = parser.parse_args()
+
+    import lancedb
+    import pyarrow
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "lancedb": lancedb.__version__,
+            "pyarrow": pyarrow.__version__,
+        },
+        "parameters": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": [],
+    }
+
+    context = mp.get_context("spawn")
+    for scale in args.scales:
+        rows = int(float(scale))
+        print(f"⏱️ Benchmarking {rows} rows...")
+        queue = context.Queue()
+        process = context.Process(target=_worker, args=(rows, args, queue))
+        process.start()
+        result = _wait_result(process, queue, rows)
+        process.join()
+        report["results"].append(result)
+
+        if "error" in result:
+            print(f"❌ {rows} rows failed: {result['error']}")
+            continue
+        print(f"✅ ingest {result['ingest']['rows_per_second']:.0f} rows/s, peak RSS {result['ingest']['peak_rss_bytes'] / 2**20:.0f} MiB")
+        for name, stats in result["queries"].items():
+            print(f"   {name}: p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms, peak RSS {stats['peak_rss_bytes'] / 2**20:.0f} MiB")
+
+    output = args.output or os.path.join("bench_results", f"lancedb_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,8 @@ import {
 import { Button } from "@/components/ui/button"
 import { ArrowUp, Square, Mic, MicOff } from "lucide-react"
 import { useState, useRef, useEffect } from "react"
-import { sendTextMessage, sendAudioMessage } from "../data/api-service"
+import { sendTextMessage, sendAudioMessageStream, fetchFiller, interruptTurn } from "../data/api-service"
+import { playAudio, stopAudio } from "../data/audio-player"
 import { AudioRecorder } from "../data/audio-recorder"
 import type { ChatMessage } from "../data/chat-message"
 
@@ -20,13 +21,32 @@ interface MessageInputProps {
   disabled?: boolean;
 }
 
+// 等待回复时先播放一条语气词，回复语音到达后会替换它
+function playFiller() {
+  fetchFiller().then(filler => {
+    if (filler?.audio_path) {
+      playAudio(filler.audio_path).catch(error => {
+        console.error('🎵 Failed to play filler:', error);
+      });
+    }
+  });
+}
+
+// 打断角色：停止播放，并让后端取消还在生成的回复
+function bargeIn() {
+  stopAudio()
+  interruptTurn()
+}
+
 export function MessageInput({ onMessageSending, onMessageSent, disabled = false }: MessageInputProps) {
   const [input, setInput] = useState("")
   const [isLoading, setIsLoading] = useState(false)
   const [isRecording, setIsRecording] = useState(false)
   const [error, setError] = useState<string | null>(null)
+  const [partialText, setPartialText] = useState<string | null>(null) // 识别中的语音文本
   
   const audioRecorderRef = useRef<AudioRecorder | null>(null)
+  const requestIdRef = useRef(0) // 只有最新的请求可以结束加载状态
 
   // 初始化音频录制器
   useEffect(() => {
@@ -42,6 +62,7 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
     if (!input.trim() || isLoading || disabled) return
 
     const userText = input.trim()
+    const requestId = ++requestIdRef.current
     setInput("")
     setIsLoading(true)
     setError(null)
@@ -59,9 +80,12 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
       onMessageSending(userMessage);
     }
 
+    playFiller()
+
     try {
       // 发送到后端
       const response = await sendTextMessage(userText)
+      if (response.interrupted) return
       
       // 创建角色回复消息
       const roleMessage: ChatMessage = {
@@ -89,13 +113,16 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
       console.error('Error sending text message:', error)
       setError('Failed to send message. Please try again.')
     } finally {
-      setIsLoading(false)
+      if (requestId === requestIdRef.current) setIsLoading(false)
     }
   }
 
   // 开始录音
   const handleStartRecording = async () => {
-    if (isLoading || disabled) return
+    if (disabled) return
+
+    // 用户开口即打断正在生成或播放的回复
+    bargeIn()
 
     try {
       setError(null)
@@ -112,6 +139,7 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
   const handleStopRecording = async () => {
     if (!audioRecorderRef.current || !isRecording) return
 
+    const requestId = ++requestIdRef.current
     setIsRecording(false)
     setIsLoading(true)
     setError(null)
@@ -129,6 +157,8 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
       onMessageSending(userMessage);
     }
 
+    playFiller()
+
     try {
       // 停止录制
       // console.log('🎤 Stopping recording...');
@@ -137,7 +167,8 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
 
       // 发送到后端
       // console.log('🎤 Sending audio to backend...');
-      const response = await sendAudioMessage(audioBlob)
+      const response = await sendAudioMessageStream(audioBlob, setPartialText)
+      if (response.interrupted) return
       // console.log('🎤 Backend response:', response);
       
       // 更新用户消息为音频图标+ASR识别的文本
@@ -174,7 +205,10 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
       console.error('Error sending audio message:', error)
       setError('Failed to process audio message. Please try again.')
     } finally {
-      setIsLoading(false)
+      if (requestId === requestIdRef.current) {
+        setPartialText(null)
+        setIsLoading(false)
+      }
     }
   }
 
@@ -195,6 +229,13 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
         </div>
       )}
 
+      {/* 识别中的语音文本 */}
+      {partialText && (
+        <div className="text-sm text-muted-foreground bg-background/15 backdrop-blur-sm rounded-lg p-2 w-[40vw]">
+          🎵 {partialText}
+        </div>
+      )}
+
       <div className="flex items-center gap-3 w-[40vw]">
         {/* 语音录制按钮 - 在输入框左侧 */}
         <Button
@@ -206,7 +247,7 @@ export function MessageInput({ onMessageSending, onMessageSent, disabled = false
               : 'bg-background/15 backdrop-blur-sm shadow-2xl border-1 hover:bg-background/50'
           }`}
           onClick={isRecording ? handleStopRecording : handleStartRecording}
-          disabled={disabled || isLoading}
+          disabled={disabled}
         >
           {isRecording ? (
             <MicOff className="size-5" />
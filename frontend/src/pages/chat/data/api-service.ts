@@ -2,6 +2,20 @@
 const API_BASE_URL = "http://localhost:8000";
 const TEXT_ENDPOINT = `${API_BASE_URL}/chat_api/text`;
 const AUDIO_ENDPOINT = `${API_BASE_URL}/chat_api/audio`;
+const AUDIO_STREAM_ENDPOINT = `${API_BASE_URL}/chat_api/audio/stream`;
+const INTERRUPT_ENDPOINT = `${API_BASE_URL}/chat_api/interrupt`;
+
+// 会话ID：后端按会话保存聊天记录和角色设定、跟踪对话轮次（新消息会打断同一会话中未完成的回复）
+function getSessionId(): string {
+  let sessionId = localStorage.getItem('kokoromate_session_id');
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    localStorage.setItem('kokoromate_session_id', sessionId);
+  }
+  return sessionId;
+}
+
+export const SESSION_HEADERS = { 'X-Session-Id': getSessionId() };
 
 // 文本请求接口
 export interface TextRequest {
@@ -13,12 +27,22 @@ export interface AudioRequest {
   audio_file: File; // 音频文件
 }
 
+// 口型数据：每帧的嘴部张开程度（0-255），流式音频时从stream地址按NDJSON获取
+export interface LipSync {
+  fps: number;
+  energy?: number[];
+  stream?: string;
+}
+
 // API响应接口
 export interface ApiResponse {
   text: string;
   motion?: string;
   audio_path?: string;
+  lipsync?: LipSync; // 启用lipsync时返回
   asr_text?: string; // 仅音频接口返回
+  speech_duration?: number | null; // 仅音频接口返回，启用VAD时为检测到的语音时长（秒）
+  interrupted?: boolean; // 回复被新消息或打断请求取消，应忽略
 }
 
 // 发送文本请求
@@ -32,6 +56,7 @@ export async function sendTextMessage(text: string): Promise<ApiResponse> {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...SESSION_HEADERS,
       },
       body: JSON.stringify(payload),
     });
@@ -62,6 +87,7 @@ export async function sendAudioMessage(audioBlob: Blob): Promise<ApiResponse> {
 
     const response = await fetch(AUDIO_ENDPOINT, {
       method: 'POST',
+      headers: SESSION_HEADERS,
       body: formData, // 不设置Content-Type，让浏览器自动设置multipart/form-data
     });
 
@@ -77,6 +103,84 @@ export async function sendAudioMessage(audioBlob: Blob): Promise<ApiResponse> {
   }
 }
 
+// 发送音频请求，识别过程中通过onPartial返回到目前为止的识别文本（NDJSON流式响应）
+export async function sendAudioMessageStream(
+  audioBlob: Blob,
+  onPartial: (asrText: string) => void
+): Promise<ApiResponse> {
+  try {
+    const formData = new FormData();
+    formData.append('audio_file', new File([audioBlob], 'audio.wav', { type: 'audio/wav' }));
+
+    const response = await fetch(AUDIO_STREAM_ENDPOINT, {
+      method: 'POST',
+      headers: SESSION_HEADERS,
+      body: formData,
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // 每行一个JSON事件
+      let newline;
+      while ((newline = buffer.indexOf('\n')) >= 0) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        if (!line) continue;
+
+        const event = JSON.parse(line);
+        if (event.type === 'partial' || event.type === 'asr') {
+          onPartial(event.asr_text);
+        } else if (event.type === 'reply') {
+          return event as ApiResponse;
+        } else if (event.type === 'interrupted') {
+          return { text: '', interrupted: true };
+        } else if (event.type === 'error') {
+          throw new Error(event.error);
+        }
+      }
+    }
+
+    throw new Error('Audio stream ended without a reply');
+  } catch (error) {
+    console.error('Error sending audio message:', error);
+    throw error;
+  }
+}
+
+// 打断当前回复：后端取消未完成的生成和合成
+export async function interruptTurn(): Promise<void> {
+  try {
+    await fetch(INTERRUPT_ENDPOINT, { method: 'POST', headers: SESSION_HEADERS });
+  } catch (error) {
+    console.error('Error interrupting turn:', error);
+  }
+}
+
+// 获取一条预合成的语气词（短语库未启用或未就绪时返回null）
+export async function fetchFiller(): Promise<ApiResponse | null> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/phrase/filler`);
+    if (response.status !== 200) {
+      return null;
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('Error fetching filler:', error);
+    return null;
+  }
+}
+
 // 检查服务器状态
 export async function checkServerStatus(): Promise<boolean> {
   try {
@@ -18,8 +18,8 @@ export class AudioPlayer {
         ? audioPath 
         : `http://localhost:8000${audioPath.startsWith('/') ? audioPath : '/' + audioPath}`;
       
-      // 添加时间戳参数来防止缓存
-      const audioUrl = `${baseUrl}?t=${Date.now()}`;
+      // 音频路径按内容寻址，同一路径的内容不会变化，直接使用浏览器缓存
+      const audioUrl = baseUrl;
       
       this.currentAudio.src = audioUrl;
       
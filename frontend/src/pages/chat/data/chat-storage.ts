@@ -1,4 +1,5 @@
 import type { ChatMessage } from './chat-message';
+import { SESSION_HEADERS } from './api-service';
 
 // 聊天记录存储接口
 export interface ChatRecord {
@@ -47,7 +48,7 @@ function recordToMessage(record: ChatRecord): ChatMessage {
 // 从后端加载聊天记录
 export async function loadChatHistory(): Promise<ChatMessage[]> {
   try {
-    const response = await fetch(`${API_BASE_URL}/chat_history`);
+    const response = await fetch(`${API_BASE_URL}/chat_history`, { headers: SESSION_HEADERS });
     
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
@@ -86,6 +87,7 @@ export async function saveChatHistory(messages: ChatMessage[]): Promise<void> {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...SESSION_HEADERS,
       },
       body: JSON.stringify(historyFile),
     });
@@ -118,6 +120,7 @@ export async function clearChatHistory(): Promise<void> {
   try {
     const response = await fetch(`${API_BASE_URL}/chat_history`, {
       method: 'DELETE',
+      headers: SESSION_HEADERS,
     });
 
     if (!response.ok) {
@@ -0,0 +1,196 @@
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from loguru import logger
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+# Lower value = served first
+PRIORITY_TEXT = 0
+PRIORITY_AUDIO = 1
+PRIORITY_LONG_AUDIO = 2
+
+
+class Overloaded(Exception):
+    """A request would wait longer than the admission deadline"""
+
+    def __init__(self, stage: str, retry_after: float):
+        super().__init__(f"{stage} stage is overloaded, retry after {retry_after:.1f}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class StageLimiter():
+    def __init__(self, name: str, limit: int = 4, max_queue: int = 32, service_time: float = 1.0, ewma_alpha: float = 0.2):
+        """
+        Concurrency limit of one pipeline stage (asr, llm, tts) with a bounded priority queue
+
+        Args:
+            - limit(int): Requests in the stage at once
+            - max_queue(int): Requests allowed to wait for the stage
+            - service_time(float): Initial estimate of the seconds a request spends in the
+              stage, updated from measurements (EWMA)
+        """
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.service_time = service_time
+        self.ewma_alpha = ewma_alpha
+
+        self.active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+
+        # metrics
+        self.admitted = 0
+        self.rejected = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def queued_ahead(self, priority: int) -> int:
+        return sum(1 for waiter_priority, _, future in self._waiters if waiter_priority <= priority and not future.done())
+
+    def projected_wait(self, priority: int) -> float:
+        """Seconds a new request of this priority is expected to wait for a slot"""
+        if self.active < self.limit and not self._queued:
+            return 0.0
+        # every `limit` requests ahead take one service time to drain
+        return math.ceil((self.queued_ahead(priority) + 1) / self.limit) * self.service_time
+
+    def _wake_next(self):
+        while self._waiters and self.active < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._queued -= 1
+            self.active += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: int, deadline: float | None = None):
+        """
+        Wait for a slot of the stage
+
+        Args:
+            - priority(int): Lower values are served first
+            - deadline(float): Reject when the queue is full or the projected wait is longer.
+              None always queues, for requests admitted earlier whose work must not be thrown away
+
+        Raises:
+            Overloaded: The request was rejected
+        """
+        if self.active < self.limit and not self._queued:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if deadline is not None:
+            wait = self.projected_wait(priority)
+            if self._queued >= self.max_queue or wait > deadline:
+                self.rejected += 1
+                raise Overloaded(self.name, wait)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._queued += 1
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over just before the cancellation
+                self.release()
+            else:
+                self._queued -= 1
+            raise
+
+        waited = time.perf_counter() - started
+        self.admitted += 1
+        self._waits += 1
+        self._wait_time += waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def release(self):
+        self.active -= 1
+        self._wake_next()
+
+    def record(self, seconds: float):
+        self.service_time += self.ewma_alpha * (seconds - self.service_time)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "service_time": round(self.service_time, 3),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_time_avg": round(self._wait_time / self._waits, 4) if self._waits else 0.0,
+            "wait_time_max": round(self._max_wait, 4),
+        }
+
+
+class AdmissionController():
+    def __init__(self, stages: dict[str, dict] | None = None, deadline: float = 10.0):
+        """
+        Admission control and backpressure in front of the chat pipeline
+
+        Every stage has its own concurrency limit and wait queue. A new turn whose
+        stages would together wait longer than deadline, or whose stages have full
+        queues, is rejected up front by `check` (HTTP 429 with Retry-After) instead
+        of slowing down everyone already admitted. Admitted turns are never rejected
+        later, so no finished ASR or LLM work is thrown away; waiting requests are
+        served by priority, text turns before audio uploads.
+
+        Args:
+            - stages(dict): Per stage settings, e.g. {"llm": {"limit": 8, "max_queue": 64}}
+            - deadline(float): Longest acceptable projected wait of a turn, in seconds
+        """
+        self.deadline = deadline
+        self.stages = {name: StageLimiter(name, **settings) for name, settings in (stages or {}).items()}
+
+        logger.info(f"""-----Initialized AdmissionController with----- \n
+                    - deadline: {deadline} \n
+                    - stages: {stages} \n """)
+
+    def check(self, stages: list[str], priority: int):
+        """
+        Reject a new turn up front when its stages together would wait too long
+
+        Raises:
+            Overloaded: Projected wait exceeds the deadline
+        """
+        waits = {name: self.stages[name].projected_wait(priority) for name in stages if name in self.stages}
+        total = sum(waits.values())
+        full = [name for name in waits if self.stages[name]._queued >= self.stages[name].max_queue]
+        if total > self.deadline or full:
+            stage = full[0] if full else max(waits, key=waits.get)
+            self.stages[stage].rejected += 1
+            raise Overloaded(stage, total)
+
+    @asynccontextmanager
+    async def slot(self, stage: str, priority: int) -> AsyncIterator[None]:
+        """Hold a slot of a stage for an admitted turn, waiting in its queue if needed"""
+        limiter = self.stages.get(stage)
+        if limiter is None:
+            yield
+            return
+
+        await limiter.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            limiter.record(time.perf_counter() - started)
+            limiter.release()
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.stages.items()}
@@ -0,0 +1,143 @@
+import os
+import time
+import queue
+import threading
+from loguru import logger
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+
+def _current_rss() -> int:
+    """Current resident set size in bytes, 0 when unknown"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class ASRPool():
+    def __init__(
+            self,
+            factory: Callable[[], Any],
+            size: int = 1,
+            memory_cap: int = 0,
+            shared: bool = False,
+            name: str = "asr",
+            memory_probe: Callable[[], int] | None = None,
+    ):
+        """
+        Pool of recognizer instances with checkout/return semantics
+
+        The first instance is created right away, the others on demand when all
+        existing ones are busy.
+
+        Args:
+            - factory: Creates one recognizer instance
+            - size(int): Maximum number of concurrent users
+            - memory_cap(int): Maximum memory (MB) of all instances; the size is
+              lowered to fit, based on the memory taken by the first instance. 0 = no cap
+            - memory_probe: Returns the bytes in use where the weights are loaded, measured
+              before and after creating the first instance. Defaults to the host RSS; pass
+              e.g. torch.cuda.memory_allocated for models loaded on a GPU
+            - shared(bool): The runtime allows concurrent use of one instance (e.g.
+              sherpa-onnx recognizers, which keep per-request state in streams), so
+              the weights are loaded once and size only bounds concurrency
+            - name(str): Used in logs
+        """
+        self.factory = factory
+        self.shared = shared
+        self.name = name
+
+        # without /proc the host RSS reads 0 and the cap cannot be applied
+        measurable = memory_probe is not None or _current_rss() > 0
+        memory_probe = memory_probe or _current_rss
+        used = memory_probe()
+        first = factory()
+        self.instance_memory = max(0, memory_probe() - used) // (1024 * 1024) if measurable else 0
+
+        self.size = max(1, size)
+        if memory_cap and not shared and self.instance_memory:
+            capped = max(1, memory_cap // self.instance_memory)
+            if capped < self.size:
+                logger.warning(f"{name} pool: {self.size} instances of ~{self.instance_memory}MB exceed memory_cap {memory_cap}MB, using {capped}")
+                self.size = capped
+
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 1
+        self._idle.put(first)
+        if shared:
+            for _ in range(self.size - 1):
+                self._idle.put(first)
+            self._created = self.size
+
+        # metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._in_use = 0
+
+        logger.info(f"""-----Initialized ASRPool with----- \n
+                    - name: {name} \n
+                    - size: {self.size} \n
+                    - shared: {shared} \n
+                    - instance_memory: {self.instance_memory}MB \n """)
+
+    def _acquire(self, timeout: float | None):
+        try:
+            return self._idle.get_nowait(), 0.0
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            grow = self._created < self.size
+            if grow:
+                self._created += 1
+        if grow:
+            try:
+                return self.factory(), 0.0
+            except BaseException:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        started = time.perf_counter()
+        try:
+            instance = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No {self.name} instance available within {timeout}s")
+        return instance, time.perf_counter() - started
+
+    @contextmanager
+    def checkout(self, timeout: float | None = None) -> Iterator[Any]:
+        """Borrow an instance, waiting for one to be returned if all are busy"""
+        instance, waited = self._acquire(timeout)
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            if waited:
+                self._waits += 1
+                self._wait_time += waited
+                self._max_wait = max(self._max_wait, waited)
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(instance)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "shared": self.shared,
+                "instance_memory_mb": self.instance_memory,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_avg": round(self._wait_time / self._waits, 4) if self._waits else 0.0,
+                "wait_time_max": round(self._max_wait, 4),
+            }
@@ -6,6 +6,7 @@ import soundfile as sf
 from typing import Literal
 from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
+from asr.asr_pool import ASRPool
 
 class FunasrASR():
     def __init__(
@@ -23,15 +24,16 @@ class FunasrASR():
             use_itn: bool = True,
             batch_size_s: int = 60,
             sample_rate: int = 16000,
-            disable_update: bool = False
+            disable_update: bool = False,
+            num_workers: int = 1,  # model instances for concurrent requests and long-form chunks
+            memory_cap: int = 0,  # MB for all model instances, 0 = no cap
     ):
         self.sample_rate = sample_rate
         self.disable_update = disable_update
         self.language = language
         self.use_itn = use_itn
         self.batch_size_s = batch_size_s
-
-        self.model = AutoModel(
+        model_kwargs = dict(
             model=model,
             vad_model=vad_model,
             vad_kwargs=vad_kwargs,
@@ -42,15 +44,23 @@ class FunasrASR():
             model_path=model_path,
             device=device,
         )
+        # a model instance is not safe to share between threads
+        # on a GPU the weights live in device memory, which the host RSS does not show
+        memory_probe = None
+        if str(device).startswith("cuda") and torch.cuda.is_available():
+            memory_probe = lambda: torch.cuda.memory_allocated(torch.device(device))
+        self.pool = ASRPool(lambda: AutoModel(**model_kwargs), size=num_workers, memory_cap=memory_cap, name="funasr", memory_probe=memory_probe)
+        self.num_workers = self.pool.size
 
     def audio2text(self, audio: np.ndarray) -> str:
         
-        res = self.model.generate(
-            input=audio,
-            language=self.language,
-            use_itn=self.use_itn,
-            batch_size_s=self.batch_size_s,
-        )
+        with self.pool.checkout() as model:
+            res = model.generate(
+                input=audio,
+                language=self.language,
+                use_itn=self.use_itn,
+                batch_size_s=self.batch_size_s,
+            )
 
         text_result = rich_transcription_postprocess(res[0]['text'])
 
@@ -0,0 +1,182 @@
+import os
+import tempfile
+import sherpa_onnx
+import numpy as np
+from loguru import logger
+from typing import List
+
+
+class SherpaOnnxKeywordSpotter():
+    def __init__(
+            self,
+            tokens: str,  # Path to tokens.txt
+            encoder: str,  # Path to the encoder onnx model
+            decoder: str,  # Path to the decoder onnx model
+            joiner: str,  # Path to the joiner onnx model
+            keywords: List[str] | None = None,  # Wake words as plain text, e.g. ["八重神子"]
+            tokens_type: str = "ppinyin",  # How keywords are tokenized: ppinyin, bpe, cjkchar, ...
+            bpe_model: str = "",  # Path to bpe.model, for tokens_type containing bpe
+            keywords_score: float = 1.0,  # Boosting score of keyword tokens
+            keywords_threshold: float = 0.25,  # Trigger threshold, larger = fewer false alarms
+            num_trailing_blanks: int = 1,
+            max_active_paths: int = 4,
+            num_threads: int = 1,
+            provider: str = "cpu",
+            sample_rate: int = 16000,
+    ):
+        """
+        Lightweight always-on keyword spotter (sherpa-onnx KeywordSpotter)
+
+        One small shared model; every listener gets its own decoding stream.
+        """
+        self.sample_rate = sample_rate
+        self.keywords = list(keywords or [])
+        if not self.keywords:
+            raise ValueError("Keyword spotter needs at least one keyword")
+
+        # Keywords come from the character config: tokenize them and write a keywords file
+        token_lists = sherpa_onnx.text2token(self.keywords, tokens=tokens, tokens_type=tokens_type, bpe_model=bpe_model or None)
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", prefix="keywords_", encoding="utf-8", delete=False) as f:
+            for keyword, token_list in zip(self.keywords, token_lists):
+                f.write(f"{' '.join(token_list)} @{keyword}\n")
+            keywords_file = f.name
+
+        try:
+            self.spotter = sherpa_onnx.KeywordSpotter(
+                tokens=tokens,
+                encoder=encoder,
+                decoder=decoder,
+                joiner=joiner,
+                keywords_file=keywords_file,
+                num_threads=num_threads,
+                max_active_paths=max_active_paths,
+                keywords_score=keywords_score,
+                keywords_threshold=keywords_threshold,
+                num_trailing_blanks=num_trailing_blanks,
+                provider=provider,
+            )
+        finally:
+            # the keywords are read while the spotter is created
+            os.remove(keywords_file)
+
+        logger.info(f"""-----Initialized SherpaOnnxKeywordSpotter with----- \n
+                    - keywords: {self.keywords} \n
+                    - tokens_type: {tokens_type} \n
+                    - keywords_threshold: {keywords_threshold} \n
+                    - num_threads: {num_threads} \n """)
+
+    def create_stream(self):
+        return self.spotter.create_stream()
+
+    def reset(self, stream):
+        self.spotter.reset_stream(stream)
+
+    def accept(self, stream, samples: np.ndarray) -> str | None:
+        """Feed audio into a stream, return the keyword if one was just spotted"""
+        stream.accept_waveform(self.sample_rate, samples)
+        while self.spotter.is_ready(stream):
+            self.spotter.decode_stream(stream)
+            keyword = self.spotter.get_result(stream)
+            if keyword:
+                # start over so the same utterance does not trigger twice
+                self.reset(stream)
+                return keyword
+        return None
+
+
+class WakeWordSession():
+    def __init__(
+            self,
+            spotter: SherpaOnnxKeywordSpotter,
+            energy_threshold: float = 0.01,
+            hangover: float = 0.5,
+            end_silence: float = 0.8,
+            start_timeout: float = 5.0,
+            max_utterance: float = 15.0,
+    ):
+        """
+        Per-connection wake word state: listen for the keyword, then record the request
+
+        While listening, chunks whose RMS energy is below energy_threshold (plus a short
+        hangover, which the spotter needs to close a keyword) are not decoded at all,
+        so a silent listener costs almost no CPU.
+
+        Args:
+            - energy_threshold(float): RMS level that counts as sound
+            - hangover(float): Seconds of quiet audio still decoded after sound
+            - end_silence(float): Seconds of quiet that end the recorded request
+            - start_timeout(float): Give up if nothing is said this long after the wake word
+            - max_utterance(float): Upper bound of the recorded request in seconds
+        """
+        self.spotter = spotter
+        self.sample_rate = spotter.sample_rate
+        self.energy_threshold = energy_threshold
+        self.hangover = int(hangover * self.sample_rate)
+        self.end_silence = int(end_silence * self.sample_rate)
+        self.start_timeout = int(start_timeout * self.sample_rate)
+        self.max_utterance = int(max_utterance * self.sample_rate)
+
+        self.stream = spotter.create_stream()
+        self.state = "listening"
+        self.position = 0  # samples received so far
+        self.last_sound = -self.hangover - 1
+        self.recording: list[np.ndarray] = []
+        self.recording_start = 0
+        self.heard_speech = False
+
+    def _is_sound(self, samples: np.ndarray) -> bool:
+        return len(samples) > 0 and float(np.sqrt(np.mean(np.square(samples)))) >= self.energy_threshold
+
+    def skip_if_idle(self, samples: np.ndarray) -> bool:
+        """Cheap check on the event loop: True if the chunk needs no further processing"""
+        if self.state != "listening":
+            return False
+        if self._is_sound(samples):
+            return False
+        idle = self.position - self.last_sound > self.hangover
+        if idle:
+            self.position += len(samples)
+        return idle
+
+    def accept(self, samples: np.ndarray) -> list[dict]:
+        """
+        Process a chunk (run in a worker thread)
+
+        Returns:
+            list[dict]: Events, {"type": "wake", "keyword": ...},
+                {"type": "utterance", "audio": np.ndarray} or {"type": "timeout"}
+        """
+        events = []
+        sound = self._is_sound(samples)
+        if sound:
+            self.last_sound = self.position + len(samples)
+
+        if self.state == "listening":
+            keyword = self.spotter.accept(self.stream, samples)
+            if keyword:
+                logger.info(f"Wake word spotted: {keyword}")
+                events.append({"type": "wake", "keyword": keyword})
+                self.state = "recording"
+                self.recording = []
+                self.recording_start = self.position + len(samples)
+                self.heard_speech = False
+        else:
+            self.recording.append(samples)
+            self.heard_speech = self.heard_speech or sound
+            end = self.position + len(samples)
+            recorded = end - self.recording_start
+
+            if self.heard_speech and end - self.last_sound >= self.end_silence or recorded >= self.max_utterance:
+                events.append({"type": "utterance", "audio": np.concatenate(self.recording)})
+                self._listen()
+            elif not self.heard_speech and recorded >= self.start_timeout:
+                events.append({"type": "timeout"})
+                self._listen()
+
+        self.position += len(samples)
+        return events
+
+    def _listen(self):
+        self.state = "listening"
+        self.recording = []
+        self.spotter.reset(self.stream)
@@ -0,0 +1,184 @@
+import time
+import asyncio
+import numpy as np
+from loguru import logger
+from dataclasses import dataclass
+from typing import AsyncIterator, List
+from asr.vad import VADResult, VAD_SAMPLE_RATE
+
+
+@dataclass
+class AudioChunk:
+    index: int
+    start: int  # sample offsets into the recording
+    end: int
+    overlapped: bool = False  # starts inside the previous chunk (forced split, not at a pause)
+
+
+@dataclass
+class ChunkTranscript:
+    index: int
+    start: float  # seconds
+    end: float
+    text: str
+
+
+def _split_span(start: int, end: int, chunk: int, overlap: int) -> List[tuple[int, int, bool]]:
+    """Fixed-size windows over [start, end), each overlapping the previous one"""
+    spans = []
+    position = start
+    while True:
+        spans.append((position, min(position + chunk, end), position != start))
+        if position + chunk >= end:
+            return spans
+        position += chunk - overlap
+
+
+def plan_chunks(
+        length: int,
+        vad_result: VADResult | None = None,
+        chunk_duration: float = 30.0,
+        overlap: float = 1.0,
+        sample_rate: int = VAD_SAMPLE_RATE,
+) -> List[AudioChunk]:
+    """
+    Cut a recording into chunks of at most chunk_duration seconds
+
+    With a VAD result, speech segments are packed into chunks so cuts fall into
+    pauses; only segments longer than a chunk are split at fixed positions, with
+    overlap seconds shared between neighbours so no word is cut in half.
+    """
+    chunk = int(chunk_duration * sample_rate)
+    overlap = min(int(overlap * sample_rate), chunk // 2)
+
+    if vad_result is None:
+        spans = _split_span(0, length, chunk, overlap)
+    else:
+        spans = []
+        for segment in vad_result.segments:
+            start = int(segment.start * sample_rate)
+            end = start + len(segment.samples)
+            if end - start > chunk:
+                spans.extend(_split_span(start, end, chunk, overlap))
+            elif spans and not spans[-1][2] and end - spans[-1][0] <= chunk:
+                spans[-1] = (spans[-1][0], end, False)
+            else:
+                spans.append((start, end, False))
+
+    return [AudioChunk(index, start, end, overlapped) for index, (start, end, overlapped) in enumerate(spans)]
+
+
+def _join(left: str, right: str) -> str:
+    # Latin text needs a space between chunks
+    if left and right and left[-1].isascii() and left[-1] != " " and right[0].isascii() and right[0] != " ":
+        return f"{left} {right}"
+    return left + right
+
+
+def join_transcripts(texts: List[str]) -> str:
+    """Join the transcripts of separate segments, with a space between latin words"""
+    result = ""
+    for text in texts:
+        result = _join(result, text.strip())
+    return result
+
+
+def merge_overlap(previous: str, text: str, min_overlap: int = 2, max_overlap: int = 32) -> str:
+    """
+    Drop the beginning of text that repeats the end of previous
+
+    Neighbouring chunks share a little audio, so the words in it are usually
+    transcribed twice. The longest such repetition is removed, but never in the
+    middle of a latin word.
+    """
+    head = text.lstrip()
+    tail = previous.rstrip()
+    for size in range(min(len(head), len(tail), max_overlap), min_overlap - 1, -1):
+        if not tail.endswith(head[:size]):
+            continue
+        if head[size - 1].isalnum() and head[size - 1].isascii() and size < len(head) and head[size].isalnum() and head[size].isascii():
+            continue
+        return head[size:].lstrip()
+    return text
+
+
+def merge_transcripts(chunks: List[AudioChunk], texts: List[str]) -> str:
+    result = ""
+    for chunk, text in zip(chunks, texts):
+        text = text.strip()
+        if chunk.overlapped:
+            text = merge_overlap(result, text)
+        result = _join(result, text)
+    return result
+
+
+class LongFormTranscriber():
+    def __init__(
+            self,
+            asr_model,
+            min_duration: float = 45.0,
+            chunk_duration: float = 30.0,
+            overlap: float = 1.0,
+            max_workers: int = 0,
+            sample_rate: int = VAD_SAMPLE_RATE,
+    ):
+        """
+        Transcribe long recordings as concurrent chunks
+
+        Args:
+            - asr_model: Backend with audio2text; backends keeping a pool of model
+              instances expose num_workers
+            - min_duration(float): Shorter recordings are transcribed in one piece
+            - chunk_duration(float): Maximum chunk length in seconds
+            - overlap(float): Seconds shared by chunks that are cut inside speech
+            - max_workers(int): Chunks transcribed at once, 0 = the backend's num_workers
+        """
+        self.asr_model = asr_model
+        self.min_duration = min_duration
+        self.chunk_duration = chunk_duration
+        self.overlap = overlap
+        self.max_workers = max_workers or getattr(asr_model, "num_workers", 1)
+        self.sample_rate = sample_rate
+
+        logger.info(f"""-----Initialized LongFormTranscriber with----- \n
+                    - min_duration: {min_duration} \n
+                    - chunk_duration: {chunk_duration} \n
+                    - overlap: {overlap} \n
+                    - max_workers: {self.max_workers} \n """)
+
+    def applies_to(self, audio: np.ndarray) -> bool:
+        return len(audio) >= self.min_duration * self.sample_rate
+
+    def plan(self, audio: np.ndarray, vad_result: VADResult | None = None) -> List[AudioChunk]:
+        return plan_chunks(len(audio), vad_result, self.chunk_duration, self.overlap, self.sample_rate)
+
+    async def stream(self, audio: np.ndarray, chunks: List[AudioChunk]) -> AsyncIterator[ChunkTranscript]:
+        """
+        Transcribe the chunks concurrently, yielding each one as soon as it is done
+
+        Results arrive in completion order; use ChunkTranscript.index to put them in place.
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def transcribe(chunk: AudioChunk) -> ChunkTranscript:
+            async with semaphore:
+                text = await asyncio.to_thread(self.asr_model.audio2text, audio[chunk.start:chunk.end])
+            return ChunkTranscript(chunk.index, chunk.start / self.sample_rate, chunk.end / self.sample_rate, text or "")
+
+        tasks = [asyncio.create_task(transcribe(chunk)) for chunk in chunks]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def transcribe(self, audio: np.ndarray, vad_result: VADResult | None = None) -> str:
+        """Transcribe a whole recording, merging the chunk texts in order"""
+        chunks = self.plan(audio, vad_result)
+        started = time.perf_counter()
+        texts = [""] * len(chunks)
+        async for transcript in self.stream(audio, chunks):
+            texts[transcript.index] = transcript.text
+        logger.info(f"Long-form ASR: {len(audio) / self.sample_rate:.1f}s audio in {len(chunks)} chunks, {time.perf_counter() - started:.2f}s")
+        return merge_transcripts(chunks, texts)
@@ -2,6 +2,7 @@ import sherpa_onnx
 import numpy as np
 from loguru import logger
 from typing import List
+from asr.asr_pool import ASRPool
 
 
 class SherpaOnnxASR():
@@ -44,6 +45,8 @@ class SherpaOnnxASR():
         rule_fars: str = "",
         lm: str = "",
         lm_scale: float = 0.1,
+        # concurrency args
+        num_workers: int = 1,
     ):
         """
         Initialize SherpaOnnxASR
@@ -105,7 +108,12 @@ class SherpaOnnxASR():
         self.lm_scale = lm_scale
         
         # create recognizer
-        self.recognizer = self.create_recognizer()
+        # per-request state lives in streams, so one recognizer (and one copy of the weights)
+        # serves concurrent requests; num_workers bounds how many decode at once
+        self.pool = ASRPool(self.create_recognizer, size=num_workers, shared=True, name="sherpa_onnx")
+        self.num_workers = self.pool.size
+        with self.pool.checkout() as recognizer:
+            self.recognizer = recognizer
 
         logger.info(f"""\n-----Initialized SherpaOnnxASR with----- \n 
                     - model_name: {model_name} \n 
@@ -291,7 +299,19 @@ class SherpaOnnxASR():
         ]
     
     def audio2text(self, audio: np.ndarray) -> str:
-        stream = self.recognizer.create_stream()
-        stream.accept_waveform(self.sample_rate, audio)
-        self.recognizer.decode_streams([stream])
+        with self.pool.checkout() as recognizer:
+            stream = recognizer.create_stream()
+            stream.accept_waveform(self.sample_rate, audio)
+            recognizer.decode_streams([stream])
         return stream.result.text
+
+    def audio2text_batch(self, audios: List[np.ndarray]) -> List[str]:
+        """Decode several clips (e.g. VAD segments) in one batched call"""
+        streams = []
+        with self.pool.checkout() as recognizer:
+            for audio in audios:
+                stream = recognizer.create_stream()
+                stream.accept_waveform(self.sample_rate, audio)
+                streams.append(stream)
+            recognizer.decode_streams(streams)
+        return [stream.result.text for stream in streams]
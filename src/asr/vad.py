@@ -0,0 +1,140 @@
+import threading
+import sherpa_onnx
+import numpy as np
+from loguru import logger
+from dataclasses import dataclass, field
+from typing import List
+
+
+VAD_SAMPLE_RATE = 16000
+
+
+@dataclass
+class SpeechSegment:
+    start: float  # seconds from the beginning of the recording
+    samples: np.ndarray
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / VAD_SAMPLE_RATE
+
+
+@dataclass
+class VADResult:
+    segments: List[SpeechSegment] = field(default_factory=list)
+    total_duration: float = 0.0
+
+    @property
+    def speech_duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    @property
+    def has_speech(self) -> bool:
+        return bool(self.segments)
+
+    def joined(self, gap: float = 0.2) -> np.ndarray:
+        """All speech segments in one array, separated by gap seconds of silence"""
+        silence = np.zeros(int(gap * VAD_SAMPLE_RATE), dtype=np.float32)
+        parts = []
+        for segment in self.segments:
+            if parts:
+                parts.append(silence)
+            parts.append(segment.samples)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+class SileroVAD():
+    def __init__(
+            self,
+            model: str,  # Path to silero_vad.onnx
+            threshold: float = 0.5,  # Speech probability threshold
+            min_silence_duration: float = 0.25,  # Silence (seconds) that ends a segment
+            min_speech_duration: float = 0.25,  # Shorter segments are discarded as noise
+            max_speech_duration: float = 20.0,  # Longer segments are split
+            min_total_speech: float = 0.3,  # Recordings with less speech are treated as empty
+            speech_pad: float = 0.1,  # Seconds of context kept around each segment
+            window_size: int = 512,
+            num_threads: int = 1,
+            provider: str = "cpu",
+            debug: bool = False,
+    ):
+        """
+        Silero voice activity detection (sherpa-onnx) in front of the ASR
+
+        Trims silence, splits recordings into speech segments and recognizes
+        recordings without speech, so the ASR only sees audio worth decoding.
+        """
+        self.window_size = window_size
+        self.min_total_speech = min_total_speech
+        self.speech_pad = speech_pad
+        self.max_speech_duration = max_speech_duration
+
+        self.config = sherpa_onnx.VadModelConfig()
+        self.config.silero_vad.model = model
+        self.config.silero_vad.threshold = threshold
+        self.config.silero_vad.min_silence_duration = min_silence_duration
+        self.config.silero_vad.min_speech_duration = min_speech_duration
+        self.config.silero_vad.max_speech_duration = max_speech_duration
+        self.config.silero_vad.window_size = window_size
+        self.config.sample_rate = VAD_SAMPLE_RATE
+        self.config.num_threads = num_threads
+        self.config.provider = provider
+        self.config.debug = debug
+        if not self.config.validate():
+            raise ValueError("Invalid VAD config")
+
+        # The detector is stateful: one instance, reset between recordings
+        self.vad = sherpa_onnx.VoiceActivityDetector(self.config, buffer_size_in_seconds=max_speech_duration + 10)
+        self._lock = threading.Lock()
+
+        logger.info(f"""-----Initialized SileroVAD with----- \n
+                    - model: {model} \n
+                    - threshold: {threshold} \n
+                    - min_silence_duration: {min_silence_duration} \n
+                    - min_speech_duration: {min_speech_duration} \n
+                    - max_speech_duration: {max_speech_duration} \n """)
+
+    def _collect(self, spans: list):
+        while not self.vad.empty():
+            segment = self.vad.front
+            spans.append((segment.start, segment.start + len(segment.samples)))
+            self.vad.pop()
+
+    def detect(self, audio: np.ndarray) -> VADResult:
+        """
+        Find the speech in a 16 kHz mono recording
+
+        Args:
+            audio: float32 samples at 16 kHz
+
+        Returns:
+            VADResult: Speech segments (padded and merged) and durations
+        """
+        audio = np.asarray(audio, dtype=np.float32)
+        spans = []
+        with self._lock:
+            self.vad.reset()
+            for start in range(0, len(audio), self.window_size):
+                self.vad.accept_waveform(audio[start:start + self.window_size])
+                # pop as we go so the internal buffer stays small for long recordings
+                self._collect(spans)
+            self.vad.flush()
+            self._collect(spans)
+
+        # Keep some context around each segment, merging segments that then overlap
+        pad = int(self.speech_pad * VAD_SAMPLE_RATE)
+        merged = []
+        for start, end in spans:
+            start, end = max(0, start - pad), min(len(audio), end + pad)
+            if merged and start <= merged[-1][1] and end - merged[-1][0] <= self.max_speech_duration * VAD_SAMPLE_RATE:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        result = VADResult(
+            segments=[SpeechSegment(start / VAD_SAMPLE_RATE, audio[start:end]) for start, end in merged],
+            total_duration=len(audio) / VAD_SAMPLE_RATE,
+        )
+        if result.speech_duration < self.min_total_speech:
+            result.segments = []
+        return result
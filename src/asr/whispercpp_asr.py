@@ -1,7 +1,14 @@
+import os
+import threading
 import numpy as np
 from loguru import logger
+from typing import AsyncIterator
+from async_utils import ThreadBridge
+from asr.asr_pool import ASRPool
 from pywhispercpp.model import Model
 
+SAMPLE_RATE = 16000
+
 class WhisperCppASR():
     def __init__(
             self,
@@ -13,8 +20,15 @@ class WhisperCppASR():
             translate: bool = False,
             print_realtime: bool = False,
             print_progress: bool = False,
+            num_workers: int = 1,  # model instances for concurrent requests and long-form chunks
+            n_threads: int = None,  # threads per instance, default splits the cpu cores between the instances
+            memory_cap: int = 0,  # MB for all model instances, 0 = no cap
+            stream_window: float = 30.0,  # seconds decoded per call when streaming, cancellation is checked between windows
     ):
-        self.model = Model(
+        num_workers = max(1, num_workers)
+        # the cut is searched in the last fifth of a window, which must hold at least one 100 ms frame
+        self.stream_window = max(1.0, stream_window)
+        model_kwargs = dict(
             model=model,
             models_dir=models_dir,
             params_sampling_strategy=params_sampling_strategy,
@@ -24,6 +38,14 @@ class WhisperCppASR():
             print_realtime=print_realtime,
             print_progress=print_progress,
         )
+        if n_threads is None and num_workers > 1:
+            n_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        if n_threads is not None:
+            model_kwargs["n_threads"] = n_threads
+
+        # a whisper.cpp context is not safe to share between threads
+        self.pool = ASRPool(lambda: Model(**model_kwargs), size=num_workers, memory_cap=memory_cap, name="whispercpp")
+        self.num_workers = self.pool.size
 
     def audio2text(self, audio: np.ndarray) -> str:
         """
@@ -35,7 +57,8 @@ class WhisperCppASR():
         """
         try:
             
-            segments = self.model.transcribe(audio, new_segment_callback=logger.info)
+            with self.pool.checkout() as model:
+                segments = model.transcribe(audio, new_segment_callback=logger.info)
             
             text_result = ""
             for segment in segments:
@@ -46,5 +69,60 @@ class WhisperCppASR():
         except Exception as e:
             logger.error(f"Transcription failed: {e}")
             raise e
-        
- 
\ No newline at end of file
+
+    def _windows(self, audio: np.ndarray) -> list[tuple[int, int]]:
+        """Split audio into windows of about stream_window seconds, cut at the quietest 100 ms near each end"""
+        size = int(self.stream_window * SAMPLE_RATE)
+        frame = SAMPLE_RATE // 10
+        windows = []
+        start = 0
+        while len(audio) - start > size:
+            # look for the cut in the last fifth of the window
+            search_start = start + size * 4 // 5
+            frames = audio[search_start:start + size]
+            frames = frames[:len(frames) // frame * frame].reshape(-1, frame)
+            if len(frames):
+                end = search_start + int(np.argmin(np.abs(frames).mean(axis=1))) * frame + frame // 2
+            else:
+                end = start + size
+            windows.append((start, end))
+            start = end
+        windows.append((start, len(audio)))
+        return windows
+
+    async def stream_segments(self, audio: np.ndarray) -> AsyncIterator[dict]:
+        """
+        Transcribe audio, yielding each segment as soon as whisper.cpp decodes it
+
+        Long audio is decoded in windows of stream_window seconds; when the consumer
+        stops (e.g. the client disconnected or the user interrupted), decoding stops
+        after the current window and the model goes back to the pool.
+
+        Yields:
+            dict: {"start": seconds, "end": seconds, "text": segment text}
+        """
+        bridge = ThreadBridge()
+        offset = 0.0
+
+        def on_segment(segment):
+            # whisper.cpp timestamps are in units of 10 ms, relative to the window
+            bridge.put({"start": offset + segment.t0 / 100, "end": offset + segment.t1 / 100, "text": segment.text})
+
+        def worker():
+            nonlocal offset
+            try:
+                with self.pool.checkout() as model:
+                    for start, end in self._windows(audio):
+                        if bridge.cancelled:
+                            logger.info("Transcription cancelled")
+                            break
+                        offset = start / SAMPLE_RATE
+                        model.transcribe(audio[start:end], new_segment_callback=on_segment)
+                bridge.close()
+            except BaseException as e:
+                logger.error(f"Transcription failed: {e}")
+                bridge.close(e)
+
+        threading.Thread(target=worker, daemon=True).start()
+        async for segment in bridge:
+            yield segment
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Iterable
+
+
+_END = object()
+
+
+class ThreadBridge():
+    """
+    Hand items produced on a worker or native callback thread to an asyncio consumer
+
+    The producer thread calls `put` and finally `close`; the consumer iterates
+    with `async for`. When the consumer stops early, `cancelled` turns True so
+    the producer can abort (e.g. by returning 0 from a sherpa-onnx callback).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def put(self, item: Any):
+        """Called from the producer thread"""
+        if not self.cancelled:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def close(self, error: BaseException | None = None):
+        """Called from the producer thread when it is done (or failed)"""
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, error if error is not None else _END)
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Consumer finished or went away, tell the producer to stop
+            self.cancel()
+
+
+async def iterate_in_thread(iterable_factory: Callable[[], Iterable[Any]]) -> AsyncIterator[Any]:
+    """
+    Consume a blocking iterator in a worker thread and yield its items asynchronously
+
+    Args:
+        iterable_factory: Called in the worker thread to create the iterator,
+            so that creating it (e.g. sending the request) does not block either
+    """
+    bridge = ThreadBridge()
+
+    def worker():
+        try:
+            for item in iterable_factory():
+                if bridge.cancelled:
+                    break
+                bridge.put(item)
+            bridge.close()
+        except BaseException as e:
+            bridge.close(e)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    async for item in bridge:
+        yield item
@@ -0,0 +1,150 @@
+import time
+import asyncio
+import numpy as np
+from loguru import logger
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+STAGES = ("asr", "llm", "tts")
+
+
+class StagePressure():
+    def __init__(self, window: float = 30.0):
+        """
+        Latency and pending requests of one pipeline stage
+
+        Args:
+            - window(float): Seconds of latency samples to keep
+        """
+        self.window = window
+        self.pending = 0
+        self._samples: deque[tuple[float, float]] = deque()
+
+    def record(self, seconds: float):
+        self._samples.append((time.monotonic(), seconds))
+
+    def latency(self, percentile: float = 90) -> float:
+        """Latency percentile over the window, 0 when the stage was idle"""
+        deadline = time.monotonic() - self.window
+        while self._samples and self._samples[0][0] < deadline:
+            self._samples.popleft()
+        if not self._samples:
+            return 0.0
+        return float(np.percentile([seconds for _, seconds in self._samples], percentile))
+
+
+class DegradationPolicy():
+    def __init__(
+            self,
+            tiers: list[dict] | None = None,
+            interval: float = 2.0,
+            cooldown: float = 30.0,
+            recovery: float = 0.7,
+            window: float = 30.0,
+            percentile: float = 90,
+    ):
+        """
+        Load-adaptive quality tiers for new turns
+
+        Every stage's latency (including the time spent waiting for a slot) and
+        pending requests are watched. When a tier's thresholds are exceeded, new
+        turns switch to that tier's cheaper settings, e.g. a smaller LLM, a shorter
+        max_tokens or a local TTS. Once pressure stays below recovery times the
+        thresholds for cooldown seconds, quality steps back up one tier at a time.
+
+        Args:
+            - tiers(list[dict]): Cheaper tiers, ordered from mild to strong, e.g.
+              {"name": "reduced", "when": {"llm": {"latency": 6, "pending": 8}},
+              "llm": {"model": "ollama/qwen2.5:3b", "max_tokens": 256}, "tts": "sherpa_onnx"}
+            - interval(float): Seconds between evaluations
+            - cooldown(float): Seconds of low pressure before stepping back up
+            - recovery(float): Fraction of the thresholds pressure must fall below to recover
+            - window(float): Seconds of latency samples to evaluate
+            - percentile(float): Latency percentile compared with the thresholds
+        """
+        self.tiers = [{"name": "full", "when": {}, "llm": {}, "tts": None}]
+        for tier in tiers or []:
+            self.tiers.append({"when": {}, "llm": {}, "tts": None, **tier})
+        self.interval = interval
+        self.cooldown = cooldown
+        self.recovery = recovery
+        self.percentile = percentile
+
+        self.stages = {stage: StagePressure(window) for stage in STAGES}
+        self.level = 0
+        self._calm_since: float | None = None
+        self.changes = 0
+
+        logger.info(f"""-----Initialized DegradationPolicy with----- \n
+                    - tiers: {[tier["name"] for tier in self.tiers]} \n
+                    - interval: {interval} \n
+                    - cooldown: {cooldown} \n
+                    - recovery: {recovery} \n """)
+
+    @property
+    def tier(self) -> dict:
+        """Settings for a new turn: {"name", "llm": chat_completion overrides, "tts": backend name or None}"""
+        return self.tiers[self.level]
+
+    def tts_backends(self) -> set[str]:
+        return {tier["tts"] for tier in self.tiers if tier["tts"]}
+
+    @asynccontextmanager
+    async def track(self, stage: str) -> AsyncIterator[None]:
+        """Count a request as pending in a stage and record its latency"""
+        pressure = self.stages[stage]
+        pressure.pending += 1
+        started = time.perf_counter()
+        try:
+            yield
+            pressure.record(time.perf_counter() - started)
+        finally:
+            pressure.pending -= 1
+
+    def _exceeded(self, tier: dict, scale: float = 1.0) -> bool:
+        for stage, limits in tier["when"].items():
+            pressure = self.stages.get(stage)
+            if pressure is None:
+                continue
+            if "latency" in limits and pressure.latency(self.percentile) > limits["latency"] * scale:
+                return True
+            if "pending" in limits and pressure.pending > limits["pending"] * scale:
+                return True
+        return False
+
+    def evaluate(self) -> int:
+        """Move to the strongest exceeded tier right away, recover one tier after cooldown"""
+        target = max((level for level in range(1, len(self.tiers)) if self._exceeded(self.tiers[level])), default=0)
+        now = time.monotonic()
+
+        if target > self.level:
+            self._set_level(target)
+        elif self.level > 0 and not self._exceeded(self.tiers[self.level], self.recovery):
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.cooldown:
+                self._set_level(self.level - 1)
+        else:
+            self._calm_since = None
+        return self.level
+
+    def _set_level(self, level: int):
+        logger.info(f"Quality tier {self.tier['name']} -> {self.tiers[level]['name']}, pressure: {self.pressure()}")
+        self.level = level
+        self._calm_since = None
+        self.changes += 1
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.evaluate()
+
+    def pressure(self) -> dict:
+        return {
+            stage: {"latency": round(pressure.latency(self.percentile), 3), "pending": pressure.pending}
+            for stage, pressure in self.stages.items()
+        }
+
+    def stats(self) -> dict:
+        return {"tier": self.tier["name"], "changes": self.changes, "pressure": self.pressure()}
@@ -36,19 +36,23 @@ class AsyncLiteLLM():
 
         logger.info(f"Initialized Litellm service with model: {self.model}")
     
-    async def chat_completion(self, messages: List[Dict[str, Any]]):
+    async def chat_completion(self, messages: List[Dict[str, Any]], model: Optional[str] = None, max_tokens: Optional[int] = None):
         """
         Use LLM to generate completion for a list of messages
 
         Args:
             - messages(List[Dict[str, Any]]): The list of messages to LLM
+            - model(Optional[str]): Use this model instead of the configured one, e.g. a smaller one under load
+            - max_tokens(Optional[int]): Limit the length of the completion, default is no limit
         """
         logger.info(f"Chat_Messages: {messages}")
+        response = None
         try:
             response = await acompletion(
-                model=self.model, 
+                model=model or self.model, 
                 messages=messages, 
                 stream=self.stream, 
+                max_tokens=max_tokens, 
                 base_url=self.base_url, 
                 api_version=self.api_version, 
                 api_key=self.api_key, 
@@ -65,3 +69,36 @@ class AsyncLiteLLM():
         except Exception as e:
             logger.error(f"Exception: {e}")
             yield "Error: Exception"
+        finally:
+            # close the backend connection when the consumer stops early (e.g. the user interrupted)
+            if response is not None and hasattr(response, "aclose"):
+                await response.aclose()
+
+    async def embedding(self, texts: List[str]) -> List[List[float]]:
+        """
+        Use the embedding endpoint to embed a batch of texts
+
+        Args:
+            - texts(List[str]): The texts to embed, sent as one request
+
+        Returns:
+            - List[List[float]]: One vector per input text, in input order
+        """
+        try:
+            response = await aembedding(
+                model=self.model,
+                input=texts,
+                api_base=self.base_url,
+                api_version=self.api_version,
+                api_key=self.api_key,
+                api_type=self.api_type
+            )
+        except Exception as e:
+            logger.error(f"Embedding exception: {e}")
+            raise e
+
+        data = sorted(
+            response.data,
+            key=lambda item: item["index"] if isinstance(item, dict) else item.index
+        )
+        return [item["embedding"] if isinstance(item, dict) else item.embedding for item in data]
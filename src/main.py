@@ -1,17 +1,42 @@
 import yaml
 import json
+import asyncio
+import contextlib
 import base64
 import uvicorn
 import librosa
 import model_function
+import io
 import os
-from fastapi import FastAPI, Request, File, UploadFile
+import soxr
+import numpy as np
+from asr.keyword_spotter import WakeWordSession
+from asr.long_form import merge_transcripts
+from tts.audio_stream import AudioStreamRegistry
+from tts.audio_utils import media_type_for, content_address, is_content_addressed
+from tts.lipsync import lipsync_from_file, lipsync_from_wav_stream
+from http_utils import http_date, is_not_modified
+from tuning import load_tuning, save_tuning, apply_tuning, tune
+from turn_manager import TurnManager, TurnInterrupted
+from session_store import SessionStore, empty_history
+from admission import Overloaded, PRIORITY_TEXT, PRIORITY_AUDIO, PRIORITY_LONG_AUDIO
+from fastapi import FastAPI, Request, File, UploadFile, BackgroundTasks, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
 from fastapi import HTTPException
 
-config = yaml.safe_load(open("./frontend/public/default.yaml", "r", encoding="utf-8"))
+config_path = "./frontend/public/default.yaml"
+config = yaml.safe_load(open(config_path, "r", encoding="utf-8"))
+
+# 本机的线程数/推理后端调优结果（python src/tuning.py生成），覆盖配置中的默认值
+tuning_config = config["system"].get("tuning", {})
+tuning = load_tuning(config_path)
+if tuning is None and tuning_config.get("auto", False):
+    print("⏱️ No tuning for this machine yet, benchmarking models (only once)...")
+    tuning = tune(config, **{key: value for key, value in tuning_config.items() if key != "auto"})
+    save_tuning(config_path, tuning)
+config = apply_tuning(config, tuning)
 
 # set system prompt
 system_prompt = model_function.build_system_prompt(config)
@@ -37,23 +62,57 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有请求头
 )
 
+# 音频压缩编码（未启用时为None）
+audio_encoder = model_function.set_audio_encoder(config["system"].get("audio_encoding", {}))
+
 # 自定义音频文件服务，添加必要的头部
+# 支持Range请求和ETag/304；按内容寻址的文件可以被浏览器永久缓存
 @app.get("/audio/{filename}")
-async def serve_audio(filename: str):
+async def serve_audio(filename: str, request: Request):
     file_path = os.path.join("cache", filename)
-    if not os.path.exists(file_path):
+    # 只允许访问cache目录中的文件
+    if os.path.dirname(os.path.realpath(file_path)) != os.path.realpath("cache") or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="Audio file not found")
+
+    # 根据Accept头选择压缩格式，编码结果缓存在原文件旁边
+    if audio_encoder:
+        source_format = os.path.splitext(filename)[1].lstrip(".")
+        target_format = audio_encoder.negotiate(request.headers.get("accept"), source_format)
+        try:
+            file_path = await audio_encoder.encode_file(file_path, target_format)
+        except Exception as e:
+            print(f"⚠️ Failed to encode {filename} as {target_format}, serving original: {e}")
+
+    stat_result = os.stat(file_path)
+    name, extension = os.path.splitext(os.path.basename(file_path))
+    if is_content_addressed(file_path):
+        # 文件名就是内容哈希，同一个URL的内容永远不变
+        etag = f'"{name}-{extension.lstrip(".")}"'
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        cache_control = "no-cache"
+
+    headers = {
+        "Cross-Origin-Resource-Policy": "cross-origin",
+        "Cross-Origin-Embedder-Policy": "unsafe-none",
+        "Access-Control-Allow-Origin": "*",
+        "Cache-Control": cache_control,
+        "Vary": "Accept",
+        "ETag": etag,
+        "Last-Modified": http_date(stat_result.st_mtime)
+    }
+
+    # 浏览器缓存仍然有效，不需要重新传输
+    if is_not_modified(request.headers, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
     
-    # 返回文件响应，添加必要的头部
+    # 返回文件响应（FileResponse处理Range/If-Range，服务器支持时使用pathsend零拷贝发送）
     response = FileResponse(
         path=file_path,
-        media_type="audio/wav",
-        headers={
-            "Cross-Origin-Resource-Policy": "cross-origin",
-            "Cross-Origin-Embedder-Policy": "unsafe-none",
-            "Access-Control-Allow-Origin": "*",
-            "Cache-Control": "no-cache"
-        }
+        media_type=media_type_for(extension.lstrip(".")),
+        headers=headers,
+        stat_result=stat_result
     )
     return response
 
@@ -65,19 +124,354 @@ if config["system"]["chat_mode"] == "text_only":
     tts_model = model_function.set_tts_model(config["system"]["default_model"]["tts"], config["tts"][config["system"]["default_model"]["tts"]])
 
 else:
+    vad_model = model_function.set_vad_model(config["asr"].get("vad", {}))
     asr_model = model_function.set_asr_model(config["system"]["default_model"]["asr"], config["asr"][config["system"]["default_model"]["asr"]])
+    long_form = model_function.set_long_form_transcriber(config["asr"].get("long_form", {}), asr_model)
     llm_model = model_function.set_llm_model(config["system"]["default_model"]["llm"], config["llm"][config["system"]["default_model"]["llm"]])
     tts_model = model_function.set_tts_model(config["system"]["default_model"]["tts"], config["tts"][config["system"]["default_model"]["tts"]])
 
-@app.post("/chat_api/text")
-async def chat_api_text(request: Request):
-    chat_data = await request.json()
-    input_text = chat_data.get("input_text")
-    # input_file = chat_data.get("input_file")
+# 唤醒词检测：关键词为角色名，未启用或纯文本模式时为None
+keyword_spotter = None
+wake_session_config = config["asr"].get("keyword_spotter", {}).get("session", {})
+if config["system"]["chat_mode"] != "text_only":
+    keyword_spotter = model_function.set_keyword_spotter(
+        config["asr"].get("keyword_spotter", {}),
+        config["character"].get("wake_words") or [config["character"]["name"]],
+    )
+
+# 长期记忆（未启用时为None）
+memory = model_function.set_memory(config.get("rag", {}))
+
+# 流式音频：后端支持时，边合成边发送给前端
+stream_audio = config["system"].get("stream_audio", False)
+audio_streams = AudioStreamRegistry()
+
+# 口型数据：随音频返回每帧的嘴部张开程度
+lipsync_enabled = config["system"].get("lipsync", {}).get("enable", False)
+lipsync_fps = config["system"].get("lipsync", {}).get("fps", 30)
+
+@app.get("/audio_stream/{stream_id}")
+async def serve_audio_stream(stream_id: str, request: Request):
+    stream = audio_streams.get(stream_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Audio stream not found")
+
+    chunks, media_type = stream.iter_chunks(), stream.media_type
+
+    # WAV流可以边合成边压缩
+    if audio_encoder and media_type == "audio/wav":
+        target_format = audio_encoder.negotiate(request.headers.get("accept"), "wav")
+        if target_format != "wav":
+            chunks, media_type = audio_encoder.encode_wav_stream(chunks, target_format), media_type_for(target_format)
+
+    # 分块传输，收到第一个音频块即可开始播放
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Cross-Origin-Resource-Policy": "cross-origin",
+            "Cross-Origin-Embedder-Policy": "unsafe-none",
+            "Access-Control-Allow-Origin": "*",
+            "Cache-Control": "no-store",
+            "Vary": "Accept"
+        }
+    )
+
+@app.get("/audio_stream/{stream_id}/lipsync")
+async def serve_lipsync_stream(stream_id: str):
+    stream = audio_streams.get(stream_id)
+    if stream is None or stream.media_type != "audio/wav":
+        raise HTTPException(status_code=404, detail="Lip-sync stream not found")
+
+    # 每收到一段音频就输出对应的口型帧（NDJSON），与流式音频保持同步
+    async def frames():
+        async for frame in lipsync_from_wav_stream(stream.iter_chunks(), lipsync_fps):
+            yield json.dumps(frame) + "\n"
+
+    return StreamingResponse(
+        frames(),
+        media_type="application/x-ndjson",
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Cache-Control": "no-store"
+        }
+    )
+
+def to_audio_url(tts_file_path):
+    """将TTS返回的本地路径转换为前端可访问的路径"""
+    if tts_file_path and tts_file_path.startswith("cache/"):
+        audio_path = f"/audio/{tts_file_path.replace('cache/', '')}"
+        print(f"✅ Converted audio path: {audio_path}")
+    else:
+        audio_path = tts_file_path
+        print(f"⚠️ Using original path: {audio_path}")
+    return audio_path
+
+async def synthesize_file(text: str, model=None):
+    """合成语音文件，返回按内容命名的本地路径"""
+    tts_file_path = await model_function.generate_speech(model or tts_model, text)
+    
+    print(f"🔍 TTS file path: {tts_file_path}")
+    
+    # 按内容重命名，使音频URL可以被永久缓存
+    if tts_file_path:
+        tts_file_path = await asyncio.to_thread(content_address, tts_file_path)
+    return tts_file_path
+
+def compute_lipsync(tts_file_path: str):
+    try:
+        return lipsync_from_file(tts_file_path, lipsync_fps)
+    except Exception as e:
+        print(f"⚠️ Failed to compute lip-sync track: {e}")
+        return None
+
+async def hold_stage(chunks, stage: str, priority: int):
+    """流式合成在后台进行：在整个流的生命周期内占用阶段名额，并计入该阶段的负载"""
+    try:
+        async with stage_slot(stage, priority):
+            async for chunk in chunks:
+                yield chunk
+    finally:
+        await chunks.aclose()
+
+async def synthesize_reply(response_text: str, turn=None, model=None, priority: int = PRIORITY_AUDIO):
+    """合成回复语音，返回前端可访问的音频路径和口型数据（model为降级时使用的TTS后端）"""
+    model = model or tts_model
+    # 预先合成好的短语（如兜底回复）直接返回，无需等待合成
+    phrase = phrase_bank.lookup(response_text) if phrase_bank else None
+    if phrase:
+        return to_audio_url(phrase.file_path), phrase.lipsync
+
+    if stream_audio and hasattr(model, "stream_speech"):
+        # 名额在流结束或被取消时释放
+        chunks = hold_stage(model.stream_speech(response_text), "tts", priority)
+        stream_id = audio_streams.create(chunks, model.stream_media_type)
+        # 用户打断时停止合成（即使回复已经发出、仍在播放）
+        if turn:
+            turn.on_interrupt(lambda: audio_streams.cancel(stream_id))
+        audio_path = f"/audio_stream/{stream_id}"
+        print(f"✅ Streaming audio path: {audio_path}")
+        lipsync = None
+        if lipsync_enabled and model.stream_media_type == "audio/wav":
+            lipsync = {"fps": lipsync_fps, "stream": f"{audio_path}/lipsync"}
+        return audio_path, lipsync
+
+    async with stage_slot("tts", priority):
+        tts_file_path = await synthesize_file(response_text, model)
+
+    # 提前开始压缩编码，与返回响应并行
+    if audio_encoder and tts_file_path:
+        audio_encoder.warm(tts_file_path)
+
+    # 服务端计算口型数据，前端无需再分析音频
+    lipsync = None
+    if lipsync_enabled and tts_file_path:
+        lipsync = await asyncio.to_thread(compute_lipsync, tts_file_path)
+
+    return to_audio_url(tts_file_path), lipsync
+
+# 预合成短语：等待LLM时播放的语气词，以及无需合成的兜底回复
+phrase_bank = model_function.set_phrase_bank(
+    config["character"].get("phrases", {}),
+    synthesize_file,
+    voice_key=json.dumps([config["system"]["default_model"]["tts"], config["tts"][config["system"]["default_model"]["tts"]]], sort_keys=True, ensure_ascii=False),
+    lipsync=compute_lipsync if lipsync_enabled else None,
+)
+
+@app.on_event("startup")
+async def warm_phrase_bank():
+    # 后台合成，不阻塞服务启动；未就绪的短语按普通回复合成
+    if phrase_bank:
+        asyncio.create_task(phrase_bank.warm())
+
+# 缓存清理：回复音频和压缩后的版本按最近使用时间淘汰，预合成短语不会被删除
+audio_cache = model_function.set_audio_cache_sweeper(
+    config["system"].get("audio_cache", {}),
+    keep=phrase_bank.files if phrase_bank else None,
+)
+
+@app.on_event("startup")
+async def start_audio_cache_sweeper():
+    if audio_cache:
+        asyncio.create_task(audio_cache.run())
+
+def fallback_text(name: str, default: str) -> str:
+    return phrase_bank.fallback_text(name, default) if phrase_bank else default
+
+@app.get("/phrase/filler")
+async def get_filler():
+    """随机返回一条预合成的语气词，前端在等待回复时播放"""
+    phrase = phrase_bank.filler() if phrase_bank else None
+    if phrase is None:
+        return Response(status_code=204)
+    return {"text": phrase.text, "audio_path": to_audio_url(phrase.file_path), "lipsync": phrase.lipsync}
+
+async def detect_speech(audio_array):
+    """VAD：返回(vad_result, 语音时长)，未启用VAD时都为None"""
+    if not vad_model:
+        return None, None
+    vad_result = await asyncio.to_thread(vad_model.detect, audio_array)
+    speech_duration = round(vad_result.speech_duration, 3)
+    print(f"🎤 VAD: {speech_duration}s speech in {vad_result.total_duration:.2f}s, {len(vad_result.segments)} segments")
+    return vad_result, speech_duration
+
+# 准入控制：各阶段并发数和排队长度有上限，预计等待过长的请求直接返回429（未启用时为None）
+admission = model_function.set_admission_controller(config["system"].get("admission", {}))
+
+# 负载自适应降级：各阶段延迟或积压超过阈值时，新的对话轮次换用更便宜的档位（未启用时为None）
+degradation = model_function.set_degradation_policy(config["system"].get("degradation", {}))
+
+# 降级档位用到的TTS后端（如本地sherpa-onnx）在启动时加载，避免高负载时再加载模型
+tier_tts_models = {}
+if degradation:
+    for tts_name in degradation.tts_backends() - {config["system"]["default_model"]["tts"]}:
+        tier_tts_models[tts_name] = model_function.set_tts_model(tts_name, config["tts"][tts_name])
+
+def current_tier() -> dict:
+    """当前的质量档位：LLM参数覆盖（model、max_tokens）和TTS后端"""
+    if degradation is None:
+        return {"name": "full", "llm": {}, "tts": None}
+    return degradation.tier
+
+@contextlib.asynccontextmanager
+async def stage_slot(stage: str, priority: int):
+    """占用一个阶段（asr、llm、tts）的并发名额，名额已满时按优先级排队；排队和处理时间计入该阶段的负载"""
+    async with degradation.track(stage) if degradation else contextlib.nullcontext():
+        async with admission.slot(stage, priority) if admission else contextlib.nullcontext():
+            yield
+
+@app.on_event("startup")
+async def start_degradation_policy():
+    if degradation:
+        asyncio.create_task(degradation.run())
+
+def admit_turn(stages: list, priority: int):
+    """新一轮对话开始前检查预计等待时间，超过期限时抛出Overloaded（返回429）；通过后各阶段只排队，不再拒绝"""
+    if admission:
+        admission.check(stages, priority)
+
+def audio_priority(audio_array) -> int:
+    # 长语音排在短文本和短语音之后
+    if len(audio_array) >= 30 * 16000 or (long_form and long_form.applies_to(audio_array)):
+        return PRIORITY_LONG_AUDIO
+    return PRIORITY_AUDIO
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    print(f"🚦 Rejected request: {exc}")
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Server is busy, please retry later", "retry_after": exc.retry_after_header},
+        headers={"Retry-After": exc.retry_after_header}
+    )
+
+async def stream_recognition(audio_array, vad_result=None, priority: int = PRIORITY_AUDIO):
+    """
+    逐步产出识别结果（到目前为止的完整文本）
+
+    长语音按块、whisper.cpp按段边解码边返回，其他后端一次返回全部结果
+    """
+    async with stage_slot("asr", priority):
+        async for input_text in _stream_recognition(audio_array, vad_result):
+            yield input_text
+
+async def _stream_recognition(audio_array, vad_result=None):
+    print("🎤 Starting ASR...")
+    if long_form and long_form.applies_to(audio_array):
+        # 长语音切块后并行识别，按顺序输出已完成的部分
+        chunks = long_form.plan(audio_array, vad_result)
+        texts = [None] * len(chunks)
+        ready = 0
+        async for transcript in long_form.stream(audio_array, chunks):
+            texts[transcript.index] = transcript.text
+            done = ready
+            while done < len(texts) and texts[done] is not None:
+                done += 1
+            if done > ready:
+                ready = done
+                yield merge_transcripts(chunks[:ready], texts[:ready])
+    elif hasattr(asr_model, "stream_segments"):
+        text = ""
+        async for segment in asr_model.stream_segments(vad_result.joined() if vad_result else audio_array):
+            text += segment["text"]
+            yield text
+    elif vad_result:
+        yield await asyncio.to_thread(model_function.transcribe_speech, asr_model, vad_result)
+    else:
+        # 识别实例池中有空闲实例时并发识别，不阻塞事件循环
+        yield await asyncio.to_thread(asr_model.audio2text, audio_array)
+
+async def recognize_speech(audio_array, priority: int = PRIORITY_AUDIO):
+    """
+    VAD + ASR，返回(识别文本, 语音时长)
+
+    启用VAD时没有检测到语音会直接返回空文本，不调用ASR
+    """
+    vad_result, speech_duration = await detect_speech(audio_array)
+    if vad_result and not vad_result.has_speech:
+        return "", 0.0
+
+    input_text = ""
+    async for input_text in stream_recognition(audio_array, vad_result, priority):
+        pass
+    print(f"🎤 ASR result: {input_text}")
+    return input_text, speech_duration
+
+# 每个会话当前的对话轮次，新消息或打断请求会取消上一轮未完成的工作
+turn_manager = TurnManager()
+
+def session_id_of(connection) -> str:
+    """会话ID：请求头X-Session-Id或session_id参数"""
+    return connection.headers.get("x-session-id") or connection.query_params.get("session_id") or "default"
+
+# 会话状态（聊天记录、角色设定），内存中数量有限，空闲的会话写入磁盘后释放
+session_store = SessionStore(
+    **config["system"].get("sessions", {}),
+    is_busy=turn_manager.in_flight,
+    on_evict=turn_manager.forget,
+)
+
+def get_session(connection):
+    try:
+        return session_store.get(session_id_of(connection))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def session_system_prompt(session) -> str:
+    """会话的system prompt：会话选择了其他角色设定时单独构建"""
+    if not session.character:
+        return system_prompt
+    if session.system_prompt is None:
+        session.system_prompt = model_function.build_system_prompt({**config, "character": {**config["character"], **session.character}})
+    return session.system_prompt
+
+async def run_turn(session, input_text: str, memory_prefetch, fallback: str, priority: int = PRIORITY_AUDIO):
+    """在会话中运行一轮对话，被新一轮对话或打断请求取代时返回None"""
+    prompt = session_system_prompt(session)
+    try:
+        return await turn_manager.run(session.session_id, lambda turn: chat_turn(input_text, memory_prefetch, fallback, turn, prompt, priority, session.session_id))
+    except TurnInterrupted:
+        print(f"✋ Turn of session {session.session_id} was interrupted")
+        return None
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    asyncio.create_task(session_store.run_sweeper())
+
+@app.on_event("shutdown")
+def flush_sessions():
+    session_store.flush()
+
+async def chat_turn(input_text: str, memory_prefetch, fallback: str, turn=None, prompt: str = system_prompt, priority: int = PRIORITY_AUDIO, session_id: str = "default"):
+    """
+    一轮对话：注入记忆、调用LLM、解析回复并合成语音
+
+    在turn_manager中运行时可以被打断：取消时LLM流式连接关闭，排队和正在进行的合成被放弃
+    """
     messages = [
         {
             "role": "system",
-            "content": system_prompt
+            "content": prompt
         },
         {
             "role": "user",
@@ -85,42 +479,82 @@ async def chat_api_text(request: Request):
         }
     ]
 
-    response_generator = llm_model.chat_completion(messages)
-    full_response = ""
+    # 只注入本会话的记忆和共享设定
+    if memory:
+        memory_prefetch = memory_prefetch or memory.prefetch(input_text, session_id)
+        messages = memory.inject(messages, await memory_prefetch.result())
+
+    # 整轮对话使用开始时的档位
+    tier = current_tier()
+    if tier["name"] != "full":
+        print(f"📉 Degraded turn, tier: {tier['name']}")
 
-    async for chunk in response_generator:
-        full_response += chunk
+    full_response = ""
+    async with stage_slot("llm", priority):
+        response_generator = llm_model.chat_completion(messages, **tier["llm"])
+        async for chunk in response_generator:
+            full_response += chunk
 
     response = model_function.extract_json_from_markdown(full_response)
     
     # 检查JSON解析是否成功
     if response is None:
         print(f"❌ Failed to parse JSON from LLM response: {full_response}")
-        response = {"text": "抱歉，我现在无法处理您的请求，请稍后重试。", "motion": "idle"}
+        response = {"text": fallback, "motion": "idle"}
     
     response_text, response_motion = response.get("text"), response.get("motion")
-    tts_file_path = tts_model.generate_speech(response_text)
-    
-    print(f"🔍 TTS file path: {tts_file_path}")
+    audio_path, lipsync = await synthesize_reply(response_text, turn, tier_tts_models.get(tier["tts"]), priority)
+
+    return {"text": response_text, "motion": response_motion, "audio_path": audio_path, "lipsync": lipsync}
+
+async def load_audio_upload(audio_file: UploadFile):
+    """读取上传的音频文件，返回16kHz单声道数组（在内存中解码，不写临时文件）"""
+    # 读取音频文件内容
+    audio_content = await audio_file.read()
     
-    # 将TTS返回的本地路径转换为前端可访问的路径
-    if tts_file_path and tts_file_path.startswith("cache/"):
-        audio_path = f"/audio/{tts_file_path.replace('cache/', '')}"
-        print(f"✅ Converted audio path: {audio_path}")
-    else:
-        audio_path = tts_file_path
-        print(f"⚠️ Using original path: {audio_path}")
+    # 使用librosa加载音频文件
+    try:
+        audio_array, sample_rate = await asyncio.to_thread(librosa.load, io.BytesIO(audio_content), sr=16000)
+        print(f"🎤 Audio loaded with librosa: shape={audio_array.shape}, sample_rate={sample_rate}")
+    except Exception as e:
+        print(f"❌ Failed to load audio with librosa module, trying wave: {e}")
+        audio_array, sample_rate = model_function.load_wav_file(io.BytesIO(audio_content))
+        print(f"🎤 Audio loaded with wave: shape={audio_array.shape}, sample_rate={sample_rate}")
+    return audio_array
 
-    return {"text": response_text, "motion": response_motion, "audio_path": audio_path}
+@app.post("/chat_api/text")
+async def chat_api_text(request: Request, background_tasks: BackgroundTasks):
+    chat_data = await request.json()
+    input_text = chat_data.get("input_text")
+    # input_file = chat_data.get("input_file")
+
+    session = get_session(request)
+
+    # 过载时直接拒绝，文本对话优先于语音
+    admit_turn(["llm", "tts"], PRIORITY_TEXT)
+
+    # 尽早开始检索记忆
+    memory_prefetch = memory.prefetch(input_text, session.session_id) if memory else None
+
+    reply = await run_turn(session, input_text, memory_prefetch, fallback_text("text", "抱歉，我现在无法处理您的请求，请稍后重试。"), PRIORITY_TEXT)
+    if reply is None:
+        return {"interrupted": True}
+
+    # 响应发送后再写入记忆
+    if memory:
+        background_tasks.add_task(memory.remember_turn, input_text, reply["text"], session.session_id)
+
+    return reply
 
 @app.post("/chat_api/audio")
-async def chat_api_audio(audio_file: UploadFile = File(...)):
+async def chat_api_audio(request: Request, background_tasks: BackgroundTasks, audio_file: UploadFile = File(...)):
     print("🎤 Received audio file upload")
     
     if config["system"]["chat_mode"] == "text_only":
         print("❌ Audio mode is disabled in config")
         return {"error": "Audio mode is not supported in text only mode"}
     
+    session = get_session(request)
     try:
         # 检查文件类型
         if not audio_file.content_type.startswith('audio/'):
@@ -129,131 +563,235 @@ async def chat_api_audio(audio_file: UploadFile = File(...)):
         
         print(f"🎤 Audio file received: {audio_file.filename}, size: {audio_file.size}, type: {audio_file.content_type}")
         
-        # 读取音频文件内容
-        audio_content = await audio_file.read()
-        
-        # 保存临时文件
-        temp_audio_path = "temp_audio.wav"
-        with open(temp_audio_path, "wb") as f:
-            f.write(audio_content)
-        
-        print(f"🎤 Saved temp audio file: {temp_audio_path}")
-        
-        # 使用librosa加载音频文件
-        try:
-            audio_array, sample_rate = librosa.load(temp_audio_path, sr=16000)
-            print(f"🎤 Audio loaded with librosa: shape={audio_array.shape}, sample_rate={sample_rate}")
-        except Exception as e:
-            print(f"❌ Failed to load audio with librosa module, trying wave: {e}")
-            audio_array, sample_rate = model_function.load_wav_file(temp_audio_path)
-            print(f"🎤 Audio loaded with wave: shape={audio_array.shape}, sample_rate={sample_rate}")
+        audio_array = await load_audio_upload(audio_file)
+        priority = audio_priority(audio_array)
+        admit_turn(["asr", "llm", "tts"], priority)
         
-        # 清理临时文件
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
-        
-        print("🎤 Starting ASR...")
-        input_text = asr_model.audio2text(audio_array)
-        print(f"🎤 ASR result: {input_text}")
+        # VAD：去掉静音，没有语音时不调用ASR和LLM
+        input_text, speech_duration = await recognize_speech(audio_array, priority)
+        if speech_duration == 0.0:
+            return {"error": "No speech detected", "asr_text": "", "speech_duration": 0.0}
+
+        if not input_text or not input_text.strip():
+            print("⚠️ Empty ASR result, skipping LLM")
+            return {"error": "No speech recognized", "asr_text": "", "speech_duration": speech_duration}
+
+        # 识别完成后立即开始检索记忆
+        memory_prefetch = memory.prefetch(input_text, session.session_id) if memory else None
         
+    except Overloaded:
+        raise
     except Exception as e:
         print(f"❌ Error processing audio: {e}")
         import traceback
         traceback.print_exc()
-        # 清理临时文件
-        if os.path.exists("temp_audio.wav"):
-            os.remove("temp_audio.wav")
         return {"error": f"Audio processing failed: {str(e)}"}
     
-    messages = [
-        {
-            "role": "system",
-            "content": system_prompt
-        },
-        {
-            "role": "user",
-            "content": input_text
-        }
-    ]
+    reply = await run_turn(session, input_text, memory_prefetch, fallback_text("audio", "抱歉，我现在无法理解您的语音输入，请稍后重试。"), priority)
+    if reply is None:
+        return {"interrupted": True, "asr_text": input_text}
 
-    response_generator = llm_model.chat_completion(messages)
-    full_response = ""
+    # 响应发送后再写入记忆
+    if memory:
+        background_tasks.add_task(memory.remember_turn, input_text, reply["text"], session.session_id)
 
-    async for chunk in response_generator:
-        full_response += chunk
+    return {"asr_text": input_text, **reply, "speech_duration": speech_duration}
 
-    response = model_function.extract_json_from_markdown(full_response)
-    
-    # 检查JSON解析是否成功
-    if response is None:
-        print(f"❌ Failed to parse JSON from LLM response: {full_response}")
-        response = {"text": "抱歉，我现在无法理解您的语音输入，请稍后重试。", "motion": "idle"}
-    
-    response_text, response_motion = response.get("text"), response.get("motion")
-    tts_file_path = tts_model.generate_speech(response_text)
-    
-    print(f"🔍 Audio TTS file path: {tts_file_path}")
-    
-    # 将TTS返回的本地路径转换为前端可访问的路径
-    if tts_file_path and tts_file_path.startswith("cache/"):
-        audio_path = f"/audio/{tts_file_path.replace('cache/', '')}"
-        print(f"✅ Audio converted path: {audio_path}")
-    else:
-        audio_path = tts_file_path
-        print(f"⚠️ Audio using original path: {audio_path}")
+@app.post("/chat_api/audio/stream")
+async def chat_api_audio_stream(request: Request, background_tasks: BackgroundTasks, audio_file: UploadFile = File(...)):
+    """
+    与/chat_api/audio相同，但以NDJSON逐步返回：
+    识别过程中的{"type": "partial", "asr_text"}，然后是{"type": "asr"}和最终的{"type": "reply"}
+    """
+    if config["system"]["chat_mode"] == "text_only":
+        return {"error": "Audio mode is not supported in text only mode"}
+    if not audio_file.content_type.startswith('audio/'):
+        return {"error": "Invalid file type. Please upload an audio file."}
+
+    audio_array = await load_audio_upload(audio_file)
+    session = get_session(request)
+    priority = audio_priority(audio_array)
+    admit_turn(["asr", "llm", "tts"], priority)
+
+    async def events():
+        try:
+            vad_result, speech_duration = await detect_speech(audio_array)
+            if vad_result and not vad_result.has_speech:
+                yield json.dumps({"type": "error", "error": "No speech detected", "asr_text": "", "speech_duration": 0.0}, ensure_ascii=False) + "\n"
+                return
+
+            # 收到第一段识别结果就开始检索记忆，之后随识别结果更新
+            memory_prefetch = memory.prefetch(session_id=session.session_id) if memory else None
+            input_text = ""
+            async for input_text in stream_recognition(audio_array, vad_result, priority):
+                if memory_prefetch:
+                    memory_prefetch.update(input_text)
+                yield json.dumps({"type": "partial", "asr_text": input_text}, ensure_ascii=False) + "\n"
+            print(f"🎤 ASR result: {input_text}")
+
+            if not input_text or not input_text.strip():
+                yield json.dumps({"type": "error", "error": "No speech recognized", "asr_text": "", "speech_duration": speech_duration}, ensure_ascii=False) + "\n"
+                return
+            yield json.dumps({"type": "asr", "asr_text": input_text, "speech_duration": speech_duration}, ensure_ascii=False) + "\n"
+
+            reply = await run_turn(session, input_text, memory_prefetch, fallback_text("audio", "抱歉，我现在无法理解您的语音输入，请稍后重试。"), priority)
+            if reply is None:
+                yield json.dumps({"type": "interrupted"}) + "\n"
+                return
+            yield json.dumps({"type": "reply", "asr_text": input_text, **reply, "speech_duration": speech_duration}, ensure_ascii=False) + "\n"
 
-    return {"asr_text": input_text, "text": response_text, "motion": response_motion, "audio_path": audio_path}
+            if memory:
+                background_tasks.add_task(memory.remember_turn, input_text, reply["text"], session.session_id)
+        except Exception as e:
+            print(f"❌ Error processing audio: {e}")
+            yield json.dumps({"type": "error", "error": f"Audio processing failed: {str(e)}"}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson", headers={"Cache-Control": "no-store"})
+
+@app.websocket("/ws/wake")
+async def wake_word_socket(websocket: WebSocket):
+    """
+    唤醒词模式：前端持续发送麦克风音频（16位单声道PCM，采样率由sample_rate参数指定）
+
+    只运行轻量的关键词检测，听到角色的名字后才录制这句话并走完整的ASR、LLM、TTS流程：
+    唤醒时发送{"type": "wake"}，回复就绪后发送{"type": "reply", ...}
+    """
+    if keyword_spotter is None:
+        await websocket.close(code=1008, reason="Wake word mode is disabled")
+        return
+
+    await websocket.accept()
+    sample_rate = int(websocket.query_params.get("sample_rate", keyword_spotter.sample_rate))
+    resampler = soxr.ResampleStream(sample_rate, keyword_spotter.sample_rate, 1, dtype="float32") if sample_rate != keyword_spotter.sample_rate else None
+    session = WakeWordSession(keyword_spotter, **wake_session_config)
+    try:
+        session_id = session_store.get(session_id_of(websocket)).session_id
+    except ValueError:
+        await websocket.close(code=1008, reason="Invalid session id")
+        return
+    print(f"👂 Wake word listener connected, sample_rate={sample_rate}")
 
-# 聊天记录管理API
+    async def answer(audio):
+        try:
+            await answer_turn(audio)
+        except Overloaded as e:
+            await websocket.send_json({"type": "busy", "retry_after": e.retry_after_header})
+
+    async def answer_turn(audio):
+        priority = audio_priority(audio)
+        admit_turn(["asr", "llm", "tts"], priority)
+        input_text, speech_duration = await recognize_speech(audio, priority)
+        if not input_text or not input_text.strip():
+            await websocket.send_json({"type": "no_speech", "speech_duration": speech_duration})
+            return
+
+        memory_prefetch = memory.prefetch(input_text, session_id) if memory else None
+        reply = await run_turn(session_store.get(session_id), input_text, memory_prefetch, fallback_text("audio", "抱歉，我现在无法理解您的语音输入，请稍后重试。"), priority)
+        if reply is None:
+            return
+        await websocket.send_json({"type": "reply", "asr_text": input_text, **reply, "speech_duration": speech_duration})
+
+        if memory:
+            asyncio.create_task(memory.remember_turn(input_text, reply["text"], session_id))
+
+    # 回复在后台生成，期间继续监听，再次唤醒即打断
+    pending = None
+    try:
+        while True:
+            samples = np.frombuffer(await websocket.receive_bytes(), dtype="<i2").astype(np.float32) / 32768
+            if resampler:
+                samples = resampler.resample_chunk(samples)
+
+            # 安静时只做一次能量计算，不解码
+            if session.skip_if_idle(samples):
+                continue
+
+            for event in await asyncio.to_thread(session.accept, samples):
+                if event["type"] == "wake":
+                    # 用户开口打断：取消未完成的回复，通知前端停止播放
+                    if pending and not pending.done():
+                        pending.cancel()
+                    turn_manager.interrupt(session_id)
+                    await websocket.send_json({"type": "interrupt"})
+                    await websocket.send_json({"type": "wake", "keyword": event["keyword"]})
+                elif event["type"] == "timeout":
+                    await websocket.send_json({"type": "timeout"})
+                elif event["type"] == "utterance":
+                    pending = asyncio.create_task(answer(event["audio"]))
+    except WebSocketDisconnect:
+        print("👂 Wake word listener disconnected")
+    finally:
+        if pending and not pending.done():
+            pending.cancel()
+        turn_manager.interrupt(session_id)
+
+@app.post("/chat_api/interrupt")
+async def interrupt_turn(request: Request):
+    """打断当前会话：取消正在生成的回复和音频，前端同时停止播放"""
+    interrupted = turn_manager.interrupt(get_session(request).session_id)
+    return {"interrupted": interrupted}
+
+@app.get("/stats")
+async def get_stats():
+    """运行状态：ASR实例池、各阶段准入队列的长度和等待时间、当前质量档位，进行中和被打断的对话轮次"""
+    stats = {"turns": turn_manager.stats(), "sessions": session_store.stats()}
+    if admission:
+        stats["admission"] = admission.stats()
+    if degradation:
+        stats["degradation"] = degradation.stats()
+    if audio_cache:
+        stats["audio_cache"] = audio_cache.stats()
+    if config["system"]["chat_mode"] != "text_only" and hasattr(asr_model, "pool"):
+        stats["asr_pool"] = asr_model.pool.stats()
+    return stats
+
+# 会话角色设定：覆盖配置中的角色字段（如name、prompt、motion），只影响当前会话
+@app.get("/session/character")
+async def get_session_character(request: Request):
+    session = get_session(request)
+    return {**config["character"], **session.character}
+
+@app.put("/session/character")
+async def set_session_character(request: Request):
+    character = await request.json() or {}
+    session = get_session(request)
+    session.character = character
+    session.system_prompt = None
+    session_store.mark_dirty(session)
+    return {"success": True, "character": {**config["character"], **session.character}}
+
+# 聊天记录管理API（按会话保存）
 @app.get("/chat_history")
-async def get_chat_history():
+async def get_chat_history(request: Request):
     """获取聊天记录"""
-    try:
-        history_file = "chat_history/chat.json"
-        if os.path.exists(history_file):
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-            return history
-        else:
-            # 返回空的聊天记录结构
-            return {
-                "version": "1.0",
-                "created": "",
-                "updated": "",
-                "messages": []
-            }
-    except Exception as e:
-        print(f"Error loading chat history: {e}")
-        return {"error": "Failed to load chat history"}
+    return get_session(request).history
 
 @app.post("/chat_history")
 async def save_chat_history(request: Request):
     """保存聊天记录"""
     try:
+        # 先读取请求体再获取会话，避免等待期间会话被换出后写入旧的对象
         chat_data = await request.json()
-        history_file = "chat_history/chat.json"
-        
-        # 确保目录存在
-        os.makedirs("chat_history", exist_ok=True)
-        
-        # 保存聊天记录
-        with open(history_file, 'w', encoding='utf-8') as f:
-            json.dump(chat_data, f, ensure_ascii=False, indent=2)
+        session = get_session(request)
+        session.history = chat_data
+        session_store.mark_dirty(session)
         
-        print(f"✅ Chat history saved with {len(chat_data.get('messages', []))} messages")
+        print(f"✅ Chat history of session {session.session_id} saved with {len(chat_data.get('messages', []))} messages")
         return {"success": True, "message": "Chat history saved successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error saving chat history: {e}")
         return {"error": "Failed to save chat history"}
 
 @app.delete("/chat_history")
-async def clear_chat_history():
+async def clear_chat_history(request: Request):
     """清空聊天记录"""
+    session = get_session(request)
     try:
-        history_file = "chat_history/chat.json"
-        if os.path.exists(history_file):
-            os.remove(history_file)
-            print("✅ Chat history cleared")
+        session.history = empty_history()
+        session_store.mark_dirty(session)
+        print(f"✅ Chat history of session {session.session_id} cleared")
         return {"success": True, "message": "Chat history cleared"}
     except Exception as e:
         print(f"Error clearing chat history: {e}")
@@ -1,5 +1,8 @@
 import base64
 import re
+import asyncio
+import inspect
+import threading
 import json
 import wave
 import numpy as np
@@ -9,12 +12,28 @@ import io
 from asr.funasr_asr import FunasrASR
 from asr.sherpa_onnx_asr import SherpaOnnxASR
 from asr.whispercpp_asr import WhisperCppASR
+from asr.vad import SileroVAD, VADResult
+from asr.keyword_spotter import SherpaOnnxKeywordSpotter
+from asr.long_form import LongFormTranscriber, join_transcripts
 
 # LLM
 from llm.litellm_service import AsyncLiteLLM
 
+# Serving
+from admission import AdmissionController
+from degradation import DegradationPolicy
+
+# RAG
+from rag.lancedb_database import LanceDBDatabase
+from rag.ingestion import EmbeddingIngestionPipeline
+from rag.retriever import HybridRetriever
+from rag.memory import LongTermMemory
+
 # TTS
+from tts.audio_encoder import AudioEncoder
+from tts.audio_cache import AudioCacheSweeper
 from tts.fish_speech_tts import FishAudioTTS
+from tts.phrase_bank import PhraseBank
 from tts.gpt_sovits_tts import GPTSoVitsTTS
 from tts.indextts_tts import IndexTTS
 from tts.megatts_tts import MegaTTS
@@ -123,6 +142,41 @@ def build_system_prompt(config: dict) -> str:
     return complete_prompt
 
 
+# 同步TTS后端共享原生状态（以及输出文件），同一时间只允许一个请求；
+# 声明了thread_safe的后端（如使用模型实例池的sherpa-onnx）可以并发合成
+_sync_tts_locks: dict[int, asyncio.Lock] = {}
+
+
+async def generate_speech(tts_model, text: str):
+    """
+    调用TTS后端生成语音，不阻塞事件循环
+
+    异步后端直接await；同步后端放到线程中执行，除thread_safe的后端外按模型串行化。
+    排队中的请求被取消时直接放弃，正在合成的请求在后端支持时中止
+    """
+    if inspect.iscoroutinefunction(tts_model.generate_speech):
+        return await tts_model.generate_speech(text)
+
+    if getattr(tts_model, "thread_safe", False):
+        return await _generate_speech_in_thread(tts_model, text)
+
+    lock = _sync_tts_locks.setdefault(id(tts_model), asyncio.Lock())
+    async with lock:
+        return await _generate_speech_in_thread(tts_model, text)
+
+
+async def _generate_speech_in_thread(tts_model, text: str):
+    # 支持取消的后端：请求被取消（如用户打断）时通知线程中的合成停止
+    if "cancel_event" not in inspect.signature(tts_model.generate_speech).parameters:
+        return await asyncio.to_thread(tts_model.generate_speech, text)
+    cancel_event = threading.Event()
+    try:
+        return await asyncio.to_thread(tts_model.generate_speech, text, cancel_event=cancel_event)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+
+
 def set_asr_model(model_name: str, config: dict):
     if model_name == "funasr":
         return FunasrASR(**config)
@@ -134,6 +188,48 @@ def set_asr_model(model_name: str, config: dict):
         raise ValueError(f"Invalid model name: {model_name}")
 
 
+def set_vad_model(config: dict):
+    """
+    构建ASR前的语音活动检测（Silero VAD），未启用时返回None
+    """
+    if not config.get("enable", False):
+        return None
+    return SileroVAD(**{key: value for key, value in config.items() if key != "enable"})
+
+
+def set_long_form_transcriber(config: dict, asr_model):
+    """
+    构建长音频分块并行识别，未启用时返回None
+    """
+    if not config.get("enable", False):
+        return None
+    return LongFormTranscriber(asr_model, **{key: value for key, value in config.items() if key != "enable"})
+
+
+def set_keyword_spotter(config: dict, keywords: list[str]):
+    """
+    构建唤醒词检测（sherpa-onnx KWS），未启用时返回None
+
+    Args:
+        config: asr.keyword_spotter配置，session部分由每个连接的WakeWordSession使用
+        keywords: 唤醒词，默认为角色名
+    """
+    if not config.get("enable", False):
+        return None
+    return SherpaOnnxKeywordSpotter(keywords=keywords, **{key: value for key, value in config.items() if key not in ("enable", "session")})
+
+
+def transcribe_speech(asr_model, vad_result: VADResult) -> str:
+    """
+    只识别VAD检测到的语音段
+
+    支持批量识别的后端一次解码所有语音段，其他后端识别拼接后的语音
+    """
+    if hasattr(asr_model, "audio2text_batch"):
+        return join_transcripts(asr_model.audio2text_batch([segment.samples for segment in vad_result.segments]))
+    return asr_model.audio2text(vad_result.joined())
+
+
 def set_llm_model(model_name: str, config: dict):
     if model_name == "litellm":
         return AsyncLiteLLM(**config)
@@ -154,3 +250,86 @@ def set_tts_model(model_name: str, config: dict):
         return SherpaOnnxTTS(**config)
     else:
         raise ValueError(f"Invalid model name: {model_name}")
+
+
+def set_audio_encoder(config: dict):
+    """
+    构建音频压缩编码器（Opus/MP3），未启用时返回None
+    """
+    if not config.get("enable", False):
+        return None
+    return AudioEncoder(**{key: value for key, value in config.items() if key != "enable"})
+
+
+def set_phrase_bank(config: dict, synthesize, voice_key: str, lipsync=None):
+    """
+    构建预合成短语库（语气词和兜底回复），未启用时返回None
+    """
+    if not config.get("enable", False):
+        return None
+    return PhraseBank(
+        synthesize,
+        voice_key,
+        fillers=config.get("fillers"),
+        fallbacks=config.get("fallbacks"),
+        lipsync=lipsync,
+    )
+
+
+def set_audio_cache_sweeper(config: dict, keep=None):
+    """
+    构建音频缓存清理（按最近使用时间和总大小删除旧的回复音频），未启用时返回None
+    """
+    if not config.get("enable", False):
+        return None
+    return AudioCacheSweeper(**{key: value for key, value in config.items() if key != "enable"}, keep=keep)
+
+
+def set_admission_controller(config: dict):
+    """
+    构建准入控制（各阶段并发上限、排队和429），未启用时返回None
+    """
+    if not config.get("enable", False):
+        return None
+    return AdmissionController(stages=config.get("stages"), deadline=config.get("deadline", 10.0))
+
+
+def set_degradation_policy(config: dict):
+    """
+    构建负载自适应降级策略（高负载时换用更小的LLM、更短的回复或本地TTS），未启用时返回None
+    """
+    if not config.get("enable", False):
+        return None
+    return DegradationPolicy(**{key: value for key, value in config.items() if key != "enable"})
+
+
+def set_memory(config: dict):
+    """
+    构建长期记忆模块（LanceDB + embedding + 混合检索），未启用时返回None
+    """
+    memory_config = config.get("memory", {})
+    if not memory_config.get("enable", False):
+        return None
+
+    database = LanceDBDatabase(**config["lancedb"])
+    database.connect()
+
+    embedder = AsyncLiteLLM(**config["embedding"])
+    pipeline = EmbeddingIngestionPipeline(database, embedder.embedding, **config.get("ingestion", {}))
+
+    reranker = None
+    if config.get("reranker"):
+        from rag.reranker import OnnxCrossEncoderReranker
+        reranker = OnnxCrossEncoderReranker(**config["reranker"])
+
+    retriever = HybridRetriever(database, embedder.embedding, reranker=reranker, **config.get("retriever", {}))
+    retriever.ensure_fts_index()
+
+    return LongTermMemory(
+        retriever,
+        pipeline,
+        top_k=memory_config.get("top_k", 5),
+        token_cap=memory_config.get("token_cap", 512),
+        retrieval_timeout=memory_config.get("retrieval_timeout", 1.5),
+        content_types=memory_config.get("content_types"),
+    )
@@ -0,0 +1,324 @@
+import os
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime
+from loguru import logger
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Iterator
+
+from rag.lancedb_database import LanceDBDatabase, VectorStoreItem
+
+
+EmbedFn = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+
+def content_hash(content: str, content_type: str = "", session_id: str = "") -> str:
+    """
+    Stable id for a piece of content, used to skip text that is already embedded
+
+    Rows of a session (e.g. chat turns) are keyed per session, so the same line said
+    in two sessions is stored for both; shared rows (e.g. lore) are keyed by content only.
+    """
+    key = f"{content_type}\x00{content}"
+    if session_id:
+        key = f"{key}\x00{session_id}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class IngestionStats:
+    submitted: int = 0
+    skipped: int = 0
+    embedded: int = 0
+    written: int = 0
+    failed: int = 0
+
+
+class EmbeddingIngestionPipeline():
+    def __init__(
+            self,
+            database: LanceDBDatabase,
+            embed_fn: EmbedFn,
+            embed_batch_size: int = 64,
+            max_concurrency: int = 4,
+            write_batch_size: int = 2048,
+            max_retries: int = 3,
+            retry_base_delay: float = 0.5,
+    ):
+        """
+        Embed a stream of texts and write them into LanceDB
+
+        Args:
+            - database(LanceDBDatabase): The connected database to write into
+            - embed_fn(EmbedFn): Async callable embedding a batch of texts, e.g. AsyncLiteLLM.embedding
+            - embed_batch_size(int): Number of texts sent per embedding request
+            - max_concurrency(int): Maximum number of embedding requests in flight
+            - write_batch_size(int): Number of rows buffered before writing to LanceDB
+            - max_retries(int): Retries per embedding request before the batch is dropped
+            - retry_base_delay(float): Base delay in seconds for exponential backoff with jitter
+        """
+        self.database = database
+        self.embed_fn = embed_fn
+        self.embed_batch_size = embed_batch_size
+        self.max_concurrency = max_concurrency
+        self.write_batch_size = write_batch_size
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+
+        self._known_ids: set[str] | None = None
+        self._write_lock = asyncio.Lock()
+        self._on_write: list[Callable[[list[VectorStoreItem]], None]] = []
+
+        logger.info(f"""-----Initialized EmbeddingIngestionPipeline with----- \n
+                    - collection: {database.collection_name} \n
+                    - embed_batch_size: {embed_batch_size} \n
+                    - max_concurrency: {max_concurrency} \n
+                    - write_batch_size: {write_batch_size} \n """)
+
+    def add_write_listener(self, listener: Callable[[list[VectorStoreItem]], None]):
+        """Register a callback invoked with every batch of rows written to LanceDB"""
+        self._on_write.append(listener)
+
+    def _load_known_ids(self) -> set[str]:
+        """Read the ids already stored in the table (only the id column is scanned)"""
+        if self._known_ids is None:
+            if getattr(self.database, "collection", None) is None:
+                self._known_ids = set()
+            else:
+                ids = self.database.query(columns=["id"]).to_arrow()
+                self._known_ids = set(ids.column("id").to_pylist()) if ids.num_rows else set()
+            logger.info(f"Loaded {len(self._known_ids)} existing ids from {self.database.collection_name}")
+        return self._known_ids
+
+    async def _embed_with_retry(self, texts: list[str]) -> list[list[float]] | None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.embed_fn(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Embedding batch of {len(texts)} failed after {attempt + 1} attempts: {e}")
+                    return None
+                delay = self.retry_base_delay * (2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"Embedding batch failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _write(self, rows: list[VectorStoreItem], stats: IngestionStats):
+        if not rows:
+            return
+        async with self._write_lock:
+            # LanceDB writes are blocking, keep them off the event loop
+            await asyncio.to_thread(self.database.load_data, rows)
+        stats.written += len(rows)
+        for listener in self._on_write:
+            listener(rows)
+        logger.info(f"Wrote {len(rows)} rows to {self.database.collection_name} ({stats.written} total)")
+
+    async def ingest(self, items: Iterable[VectorStoreItem] | AsyncIterable[VectorStoreItem]) -> IngestionStats:
+        """
+        Embed and store items whose content is not in the table yet
+
+        Items are keyed by the hash of their content (and session, for rows of a
+        session), so re-running on the same corpus only embeds new or changed text.
+
+        Args:
+            - items: Items with content and without vectors. Their id is replaced by the content hash
+
+        Returns:
+            - IngestionStats: Counters for the run
+        """
+        stats = IngestionStats()
+        known_ids = await asyncio.to_thread(self._load_known_ids)
+        pending_ids: set[str] = set()
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        write_buffer: list[VectorStoreItem] = []
+        tasks: set[asyncio.Task] = set()
+
+        async def embed_batch(batch: list[VectorStoreItem]):
+            try:
+                vectors = await self._embed_with_retry([item.content for item in batch])
+                if vectors is None:
+                    stats.failed += len(batch)
+                    for item in batch:
+                        pending_ids.discard(item.id)
+                    return
+
+                for item, vector in zip(batch, vectors):
+                    item.vector = vector
+                stats.embedded += len(batch)
+                write_buffer.extend(batch)
+
+                if len(write_buffer) >= self.write_batch_size:
+                    rows = write_buffer[:]
+                    write_buffer.clear()
+                    await self._write(rows, stats)
+                    known_ids.update(item.id for item in rows)
+            finally:
+                semaphore.release()
+
+        async def submit(batch: list[VectorStoreItem]):
+            # Bound the number of batches in flight so a huge corpus is not buffered in memory
+            await semaphore.acquire()
+            task = asyncio.create_task(embed_batch(batch))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        batch: list[VectorStoreItem] = []
+        async for item in _aiter(items):
+            stats.submitted += 1
+            if not item.content or not item.content.strip():
+                stats.skipped += 1
+                continue
+
+            session_id = item.attributes.get("session_id", "") if isinstance(item.attributes, dict) else ""
+            item.id = content_hash(item.content, item.content_type, session_id)
+            if item.id in known_ids or item.id in pending_ids:
+                stats.skipped += 1
+                continue
+            pending_ids.add(item.id)
+
+            batch.append(item)
+            if len(batch) >= self.embed_batch_size:
+                await submit(batch)
+                batch = []
+
+        if batch:
+            await submit(batch)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        rows = write_buffer[:]
+        write_buffer.clear()
+        await self._write(rows, stats)
+        known_ids.update(item.id for item in rows)
+
+        logger.info(f"Ingestion finished: {stats}")
+        return stats
+
+
+async def _aiter(items: Iterable[Any] | AsyncIterable[Any]):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+def split_text(text: str, chunk_size: int = 500, overlap: int = 50) -> list[str]:
+    """
+    Split text into chunks of at most chunk_size characters, preferring paragraph breaks
+
+    Args:
+        text: The text to split
+        chunk_size: Maximum characters per chunk
+        overlap: Characters repeated between consecutive chunks of a long paragraph
+    """
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(current) + len(paragraph) + 1 <= chunk_size:
+            current = f"{current}\n{paragraph}" if current else paragraph
+            continue
+        if current:
+            chunks.append(current)
+            current = ""
+        # Paragraphs longer than chunk_size are cut with a sliding window
+        step = max(chunk_size - overlap, 1)
+        while len(paragraph) > chunk_size:
+            chunks.append(paragraph[:chunk_size])
+            paragraph = paragraph[step:]
+        current = paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def iter_lore_files(
+        paths: list[str],
+        chunk_size: int = 500,
+        overlap: int = 50,
+        extensions: tuple[str, ...] = (".txt", ".md"),
+    ) -> Iterator[VectorStoreItem]:
+    """Yield chunked lore items from text files or directories of text files"""
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(path)
+                for name in names
+                if name.lower().endswith(extensions)
+            )
+        else:
+            files = [path]
+
+        for file_path in files:
+            with open(file_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            timestamp = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y-%m-%d %H:%M:%S")
+            for index, chunk in enumerate(split_text(text, chunk_size, overlap)):
+                yield VectorStoreItem(
+                    id="",
+                    timestamp=timestamp,
+                    content_type="lore",
+                    content=chunk,
+                    vector=None,
+                    attributes={"source": file_path, "chunk": index},
+                )
+
+
+def iter_chat_history(history_file: str = "chat_history/chat.json") -> Iterator[VectorStoreItem]:
+    """Yield one item per message of a saved chat history file"""
+    if not os.path.exists(history_file):
+        return
+
+    with open(history_file, "r", encoding="utf-8") as f:
+        history = json.load(f)
+
+    for message in history.get("messages", []):
+        timestamp = message.get("timestamp")
+        if timestamp:
+            timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00")).strftime("%Y-%m-%d %H:%M:%S")
+        yield VectorStoreItem(
+            id="",
+            timestamp=timestamp,
+            content_type="chat",
+            content=message.get("message"),
+            vector=None,
+            attributes={"sender": message.get("sender")},
+        )
+
+
+if __name__ == "__main__":
+    # Backfill example:
+    #   PYTHONPATH=src python -m rag.ingestion --lore lore/ --chat-history chat_history/chat.json
+    import yaml
+    from llm.litellm_service import AsyncLiteLLM
+
+    parser = argparse.ArgumentParser(description="Embed lore files and chat history into LanceDB")
+    parser.add_argument("--config", default="./frontend/public/default.yaml")
+    parser.add_argument("--lore", nargs="*", default=[], help="Lore files or directories")
+    parser.add_argument("--chat-history", default=None, help="Chat history json file")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open(args.config, "r", encoding="utf-8"))
+    rag_config = config["rag"]
+
+    database = LanceDBDatabase(**rag_config["lancedb"])
+    database.connect()
+    embedder = AsyncLiteLLM(**rag_config["embedding"])
+    pipeline = EmbeddingIngestionPipeline(database, embedder.embedding, **rag_config.get("ingestion", {}))
+
+    def sources():
+        yield from iter_lore_files(args.lore, chunk_size=args.chunk_size)
+        if args.chat_history:
+            yield from iter_chat_history(args.chat_history)
+
+    asyncio.run(pipeline.ingest(sources()))
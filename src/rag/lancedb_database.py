@@ -1,8 +1,12 @@
 import os
+import json
 import lancedb
+import numpy as np
 import pandas as pd
 import pyarrow as pa
-from typing import Literal, Any
+import pyarrow.compute as pc
+from loguru import logger
+from typing import Literal, Any, Callable, Iterable, Iterator
 from dataclasses import field, dataclass
 
 @dataclass
@@ -24,6 +28,7 @@ class LanceDBDatabase():
         ):
         self.db_url = db_url
         self.collection_name = collection_name
+        self.collection = None
 
     def connect(self):
         """Connect to the LanceDB database""" 
@@ -31,6 +36,42 @@ class LanceDBDatabase():
         
         if (self.collection_name and self.collection_name in self.db_connection.table_names()):
             self.collection = self.db_connection.open_table(self.collection_name)
+            self._migrate()
+
+    def _migrate(self):
+        """
+        Rewrite a table created by older versions in the current format
+
+        Older tables store attributes as a struct and vectors as float64 lists;
+        attributes are now JSON strings (rows with different keys share one schema)
+        and vectors float32 lists, fixed-size when all rows have the same dimension.
+        Only tables in the old format are rewritten, once: the rewrite drops indices,
+        which are rebuilt by their owners (e.g. HybridRetriever.ensure_fts_index).
+        """
+        schema = self.collection.schema
+        legacy_attributes = "attributes" in schema.names and not pa.types.is_string(schema.field("attributes").type)
+        legacy_vector = "vector" in schema.names and _is_legacy_vector(schema.field("vector").type)
+        if not legacy_attributes and not legacy_vector:
+            return
+
+        table = self.collection.to_arrow()
+        if legacy_attributes:
+            attributes = [
+                None if value is None else json.dumps(
+                    {key: item for key, item in value.items() if item is not None} if isinstance(value, dict) else value,
+                    ensure_ascii=False,
+                )
+                for value in table.column("attributes").to_pylist()
+            ]
+            table = table.set_column(table.schema.get_field_index("attributes"), "attributes", pa.array(attributes, type=pa.string()))
+        if legacy_vector:
+            vectors = table.column("vector")
+            dims = set(pc.list_value_length(vectors).drop_null().unique().to_pylist())
+            vector_type = pa.list_(pa.float32(), dims.pop()) if len(dims) == 1 else pa.list_(pa.float32())
+            table = table.set_column(table.schema.get_field_index("vector"), "vector", vectors.cast(vector_type))
+
+        logger.info(f"Migrating table '{self.collection_name}' ({table.num_rows} rows) to JSON attributes and float32 vectors")
+        self.collection = self.db_connection.create_table(self.collection_name, data=table, mode="overwrite")
 
     def load_data(
             self,
@@ -46,7 +87,8 @@ class LanceDBDatabase():
                 "content_type": item.content_type,
                 "content": item.content,
                 "vector": item.vector,
-                "attributes": item.attributes,
+                # Stored as a JSON string so rows with different attribute keys share one schema
+                "attributes": item.attributes if isinstance(item.attributes, str) else json.dumps(item.attributes, ensure_ascii=False),
             }
             for item in data
         ]
@@ -56,30 +98,113 @@ class LanceDBDatabase():
             "timestamp": pa.string(),
             "content_type": pa.string(),
             "content": pa.string(),
-            "vector": pa.list_(pa.float64()),
+            "vector": pa.list_(pa.float32()),
             "attributes": pa.string(),
         })
 
+        if data:
+            # Build one Arrow table for the whole batch; fixed-size vectors keep the column searchable
+            dims = {len(row["vector"]) for row in data if row["vector"] is not None}
+            if len(dims) == 1:
+                schema = schema.set(schema.get_field_index("vector"), pa.field("vector", pa.list_(pa.float32(), dims.pop())))
+            data = pa.Table.from_pylist(data, schema=schema)
+
         # Check if table exists
         table_exists = self.collection_name in self.db_connection.table_names()
         
-        if overwrite or not table_exists:
+        if not data:
+            # The first batch fixes the vector dimension, so no table is created without rows
+            if overwrite and table_exists:
+                self.db_connection.drop_table(self.collection_name)
+                self.collection = None
+        elif overwrite or not table_exists:
             # Create new table (either overwrite existing or create new)
-            if data:
-                self.collection = self.db_connection.create_table(self.collection_name, data=data, mode="overwrite" if overwrite else "create")
-            else:
-                self.collection = self.db_connection.create_table(self.collection_name, schema=schema, mode="overwrite" if overwrite else "create")
+            self.collection = self.db_connection.create_table(self.collection_name, data=data, mode="overwrite" if overwrite else "create")
         else:
             # Table exists and we don't want to overwrite, so add data to existing table
             self.collection = self.db_connection.open_table(self.collection_name)
-            if data:
-                self.collection.add(data)
+            # e.g. a table whose rows have vectors of different sizes stores variable-size lists
+            if not data.schema.equals(self.collection.schema) and set(data.schema.names) == set(self.collection.schema.names):
+                data = data.select(self.collection.schema.names).cast(self.collection.schema)
+            self.collection.add(data)
     
+    def query(
+        self,
+        where: str | None = None,
+        columns: list[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+        batch_size: int | None = None,
+    ) -> "SearchResult":
+        """
+        Run a filtered scan over the table without materializing it.
+
+        Args:
+            where: SQL filter pushed down to LanceDB (e.g. "content_type = 'chat'")
+            columns: Columns to project. If None, all columns are returned
+            limit: Maximum number of rows to return. If None, returns all matching rows
+            offset: Number of matching rows to skip (for pagination)
+            batch_size: Preferred number of rows per RecordBatch
+
+        Returns:
+            SearchResult over the matching rows
+
+        Raises:
+            ValueError: If a projected column doesn't exist
+        """
+        self._validate_columns(columns)
+
+        def batches():
+            builder = self.collection.search().limit(limit)
+            if where:
+                builder = builder.where(where)
+            if columns:
+                builder = builder.select(columns)
+            if offset:
+                builder = builder.offset(offset)
+            yield from builder.to_batches(batch_size)
+
+        return SearchResult(batches)
+
+    def paginate(
+        self,
+        page_size: int,
+        where: str | None = None,
+        columns: list[str] | None = None,
+    ):
+        """
+        Iterate over matching rows page by page.
+
+        Args:
+            page_size: Number of rows per page
+            where: SQL filter pushed down to LanceDB
+            columns: Columns to project. If None, all columns are returned
+
+        Yields:
+            SearchResult for each non-empty page
+        """
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+
+        offset = 0
+        while True:
+            page = self.query(where=where, columns=columns, limit=page_size, offset=offset)
+            table = page.to_arrow()
+            if table.num_rows == 0:
+                return
+            yield page
+            if table.num_rows < page_size:
+                return
+            offset += page_size
+
     def search_by_content(
         self,
         query: str,
         search_column: str = "content",
-        case_sensitive: bool = False
+        case_sensitive: bool = False,
+        columns: list[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
     ):
         """
         Search for text content in the database using substring matching.
@@ -88,59 +213,40 @@ class LanceDBDatabase():
             query: The text to search for
             search_column: The column name to search in (default: "content")
             case_sensitive: Whether the search should be case sensitive (default: False)
+            columns: Columns to project. If None, all columns are returned
+            limit: Maximum number of rows to return. If None, returns all matching rows
+            offset: Number of matching rows to skip (for pagination)
             
         Returns:
-            List of dictionaries containing matching records
+            SearchResult containing matching records
             
         Raises:
             ValueError: If search_column doesn't exist or search fails
         """
         if not query or not query.strip():
-            return []
-            
+            return SearchResult(lambda: iter(()))
+
+        self._validate_columns([search_column])
+
+        # Substring matching is pushed down to LanceDB, so only matching rows are read
+        operator = "LIKE" if case_sensitive else "ILIKE"
+        pattern = _escape_like(query.strip())
+        where = f"{search_column} {operator} '%{pattern}%' ESCAPE '\\'"
+
         try:
-            # Convert to pandas DataFrame for efficient text search
-            df = self.collection.to_pandas()
-            
-            # Validate search column exists
-            if search_column not in df.columns:
-                available_columns = list(df.columns)
-                raise ValueError(
-                    f"Column '{search_column}' not found in table. "
-                    f"Available columns: {available_columns}"
-                )
-            
-            # Create search mask with case sensitivity option
-            mask = df[search_column].str.contains(
-                query.strip(), 
-                case=case_sensitive,
-                na=False,
-                regex=False  # Disable regex for better performance
-            )
-            
-            # Filter results
-            filtered_df = df[mask]
-            
-            # Convert to list of dictionaries
-            results = filtered_df.to_dict('records')
-            
-            return results
-            
+            return self.query(where=where, columns=columns, limit=limit, offset=offset)
         except Exception as e:
-            # Provide more specific error information
-            if "to_pandas" in str(e):
-                raise ValueError("Failed to read data from database. Please check if the table exists and contains data.")
-            elif "str.contains" in str(e):
-                raise ValueError(f"Failed to search in column '{search_column}'. The column may not contain text data.")
-            else:
-                raise ValueError(f"Search failed: {str(e)}")
+            raise ValueError(f"Search failed: {str(e)}")
             
     
     def search_by_timestamp_range(
         self,
         start_timestamp: str = None,
         end_timestamp: str = None,
-        search_column: str = "timestamp"
+        search_column: str = "timestamp",
+        columns: list[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
     ):
         """
         Search for records within a timestamp range.
@@ -149,72 +255,206 @@ class LanceDBDatabase():
             start_timestamp: Start timestamp (inclusive). If None, searches from earliest time
             end_timestamp: End timestamp (inclusive). If None, searches to latest time
             search_column: The column name containing timestamps (default: "timestamp")
+            columns: Columns to project. If None, all columns are returned
+            limit: Maximum number of rows to return. If None, returns all matching rows
+            offset: Number of matching rows to skip (for pagination)
             
         Returns:
-            List of dictionaries containing records within the specified time range
+            SearchResult containing records within the specified time range
             
         Raises:
             ValueError: If search_column doesn't exist or timestamp format is invalid
         """
+        self._validate_columns([search_column])
+        self._validate_columns(columns)
+
         try:
-            df = self.collection.to_pandas()
-            
-            # Validate search column exists
-            if search_column not in df.columns:
-                available_columns = list(df.columns)
-                raise ValueError(
-                    f"Column '{search_column}' not found in table. "
-                    f"Available columns: {available_columns}"
+            start_dt = pd.to_datetime(start_timestamp) if start_timestamp else None
+            end_dt = pd.to_datetime(end_timestamp) if end_timestamp else None
+        except Exception:
+            raise ValueError(f"Invalid timestamp format. Please use ISO format (e.g., '2024-01-01 12:00:00')")
+
+        # The timestamp column is always read for filtering, even when not projected
+        read_columns = None
+        if columns:
+            read_columns = columns if search_column in columns else [*columns, search_column]
+
+        def batches():
+            for batch in self.query(columns=read_columns).to_batches():
+                # Only the timestamp column is converted, one batch at a time
+                times = pd.to_datetime(
+                    batch.column(search_column).to_pandas(), errors="coerce"
                 )
-            
-            # Convert timestamp column to datetime for proper comparison
-            df[search_column] = pd.to_datetime(df[search_column], errors='coerce')
-            
-            # Remove rows with invalid timestamps
-            df = df.dropna(subset=[search_column])
-            
-            if df.empty:
-                return []
-            
-            # Create time range mask
-            mask = pd.Series([True] * len(df), index=df.index)
-            
-            # Apply start timestamp filter
-            if start_timestamp:
-                start_dt = pd.to_datetime(start_timestamp)
-                mask &= (df[search_column] >= start_dt)
-            
-            # Apply end timestamp filter
-            if end_timestamp:
-                end_dt = pd.to_datetime(end_timestamp)
-                mask &= (df[search_column] <= end_dt)
-            
-            # Filter results and create a copy to avoid SettingWithCopyWarning
-            filtered_df = df[mask].copy()
-            
-            # Convert back to string format for consistency
-            filtered_df.loc[:, search_column] = filtered_df[search_column].dt.strftime('%Y-%m-%d %H:%M:%S')
-            
-            return filtered_df.to_dict('records')
-            
-        except Exception as e:
-            if "to_datetime" in str(e):
-                raise ValueError(f"Invalid timestamp format. Please use ISO format (e.g., '2024-01-01 12:00:00')")
-            else:
-                raise ValueError(f"Search failed: {str(e)}")
+                mask = times.notna()
+                if start_dt is not None:
+                    mask &= times >= start_dt
+                if end_dt is not None:
+                    mask &= times <= end_dt
+                if not mask.any():
+                    continue
+
+                mask = mask.to_numpy()
+                filtered = batch.filter(pa.array(mask))
+
+                # Convert back to string format for consistency
+                formatted = pa.array(times[mask].dt.strftime('%Y-%m-%d %H:%M:%S'), type=pa.string())
+                filtered = filtered.set_column(
+                    filtered.schema.get_field_index(search_column), search_column, formatted
+                )
+                if columns and search_column not in columns:
+                    filtered = filtered.select(columns)
+                yield filtered
+
+        return SearchResult(lambda: _slice_batches(batches(), offset, limit))
             
     
     def search_by_content_type(
         self,
         content_type: str,
-        search_column: str = "content_type"
+        search_column: str = "content_type",
+        columns: list[str] | None = None,
+        limit: int | None = None,
+        offset: int = 0,
     ):
         """Search for records by content type"""
+        self._validate_columns([search_column])
+
+        where = f"{search_column} = '{_escape_sql_string(content_type)}'"
+
         try:
-            df = self.collection.to_pandas()
-            mask = df[search_column] == content_type
-            return df[mask].to_dict('records')
-        
+            return self.query(where=where, columns=columns, limit=limit, offset=offset)
         except Exception as e:
             raise ValueError(f"Search failed: {str(e)}")
 
+    def _validate_columns(self, columns: list[str] | None):
+        """Raise ValueError if any of the columns doesn't exist in the table"""
+        if not columns:
+            return
+
+        available_columns = self.collection.schema.names
+        for column in columns:
+            if column not in available_columns:
+                raise ValueError(
+                    f"Column '{column}' not found in table. "
+                    f"Available columns: {available_columns}"
+                )
+
+
+class SearchResult():
+    """
+    Lazy view over the record batches of a query.
+
+    Rows are streamed as Arrow RecordBatches; Python dicts are only built when
+    the result is iterated or converted with `to_list`.
+    """
+
+    def __init__(self, batch_source: Callable[[], Iterator[pa.RecordBatch]]):
+        """
+        Args:
+            batch_source: Callable returning a fresh iterator of RecordBatches.
+                It is called again for every pass unless the result was materialized.
+        """
+        self._batch_source = batch_source
+        self._table: pa.Table | None = None
+
+    def to_batches(self) -> Iterator[pa.RecordBatch]:
+        """Stream the result as Arrow RecordBatches"""
+        if self._table is not None:
+            return iter(self._table.to_batches())
+        return self._batch_source()
+
+    def to_arrow(self) -> pa.Table:
+        """Materialize the result as an Arrow Table (cached)"""
+        if self._table is None:
+            batches = list(self._batch_source())
+            if batches:
+                self._table = pa.Table.from_batches(batches)
+            else:
+                self._table = pa.table({})
+        return self._table
+
+    def to_numpy(self, column: str) -> np.ndarray:
+        """
+        Return a column as a NumPy array.
+
+        Numeric columns without nulls are returned as zero-copy views when the
+        result fits in a single batch. List columns (e.g. "vector") are returned
+        as a 2D array of shape (rows, dim).
+        """
+        table = self.to_arrow()
+        if column not in table.column_names:
+            raise ValueError(f"Column '{column}' not in result. Available columns: {table.column_names}")
+
+        chunked = table.column(column)
+        array = chunked.chunk(0) if chunked.num_chunks == 1 else chunked.combine_chunks()
+
+        if pa.types.is_fixed_size_list(array.type):
+            values = array.flatten().to_numpy(zero_copy_only=False)
+            return values.reshape(len(array), array.type.list_size)
+
+        if pa.types.is_list(array.type) or pa.types.is_large_list(array.type):
+            values = array.flatten().to_numpy(zero_copy_only=False)
+            lengths = pc.list_value_length(array).to_numpy(zero_copy_only=False)
+            if len(array) and (lengths == lengths[0]).all():
+                return values.reshape(len(array), int(lengths[0]))
+            return np.array(np.split(values, np.cumsum(lengths)[:-1]), dtype=object)
+
+        return array.to_numpy(zero_copy_only=False)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Materialize the result as a pandas DataFrame"""
+        return self.to_arrow().to_pandas()
+
+    def to_list(self) -> list[dict]:
+        """Materialize the result as a list of dictionaries"""
+        return list(self)
+
+    def __iter__(self):
+        # Dicts are built one batch at a time
+        for batch in self.to_batches():
+            yield from batch.to_pylist()
+
+    def __len__(self):
+        return self.to_arrow().num_rows
+
+
+def _slice_batches(
+        batches: Iterable[pa.RecordBatch],
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> Iterator[pa.RecordBatch]:
+    """Apply offset/limit to a stream of batches using zero-copy slices"""
+    remaining = limit if limit is not None and limit > 0 else None
+    to_skip = max(offset, 0)
+
+    for batch in batches:
+        if to_skip >= batch.num_rows:
+            to_skip -= batch.num_rows
+            continue
+        if to_skip:
+            batch = batch.slice(to_skip)
+            to_skip = 0
+        if remaining is not None:
+            if batch.num_rows >= remaining:
+                yield batch.slice(0, remaining)
+                return
+            remaining -= batch.num_rows
+        yield batch
+
+
+def _is_legacy_vector(vector_type: pa.DataType) -> bool:
+    """Vectors written before float32 storage (float64 lists); float32 lists of any size are current"""
+    if pa.types.is_list(vector_type) or pa.types.is_large_list(vector_type) or pa.types.is_fixed_size_list(vector_type):
+        return vector_type.value_type != pa.float32()
+    return False
+
+
+def _escape_sql_string(value: str) -> str:
+    """Escape a value for use inside a single-quoted SQL string literal"""
+    return value.replace("'", "''")
+
+
+def _escape_like(value: str) -> str:
+    """Escape a value for use as a literal inside a LIKE pattern"""
+    value = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return _escape_sql_string(value)
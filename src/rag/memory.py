@@ -0,0 +1,163 @@
+import re
+import asyncio
+from datetime import datetime
+from loguru import logger
+from typing import Any
+
+from rag.ingestion import EmbeddingIngestionPipeline
+from rag.lancedb_database import VectorStoreItem
+from rag.retriever import HybridRetriever, normalize_query, DEFAULT_SESSION
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one token per CJK character, one per ~4 other characters"""
+    cjk = len(re.findall(r"[぀-ヿ㐀-䶿一-鿿가-힯]", text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class MemoryPrefetch():
+    """
+    Retrieval started ahead of the LLM call
+
+    `update` can be fed partial transcripts while ASR is still running; only
+    the latest text is searched. `result` waits for the retrieval matching the
+    final text, reusing the prefetched one when the text did not change.
+    Only memories of the session (and shared ones such as lore) are searched.
+    """
+
+    def __init__(self, memory: "LongTermMemory", session_id: str = DEFAULT_SESSION):
+        self.memory = memory
+        self.session_id = session_id
+        self.text = ""
+        self.task: asyncio.Task | None = None
+
+    def update(self, text: str):
+        if not text or normalize_query(text) == normalize_query(self.text):
+            return
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.text = text
+        self.task = asyncio.create_task(self.memory.retriever.retrieve(
+            text, top_k=self.memory.top_k, content_types=self.memory.content_types, session_id=self.session_id
+        ))
+
+    async def result(self, final_text: str | None = None) -> list[dict]:
+        if final_text:
+            self.update(final_text)
+        if self.task is None:
+            return []
+
+        try:
+            # Memory is best effort, never hold the turn for longer than the budget
+            return await asyncio.wait_for(asyncio.shield(self.task), timeout=self.memory.retrieval_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Memory retrieval exceeded {self.memory.retrieval_timeout}s, continuing without it")
+            return []
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Memory retrieval failed: {e}")
+            return []
+
+
+class LongTermMemory():
+    def __init__(
+            self,
+            retriever: HybridRetriever,
+            pipeline: EmbeddingIngestionPipeline,
+            top_k: int = 5,
+            token_cap: int = 512,
+            retrieval_timeout: float = 1.5,
+            content_types: list[str] | None = None,
+    ):
+        """
+        Long-term memory stage of the chat pipeline
+
+        Args:
+            - retriever(HybridRetriever): Retriever over the memory table
+            - pipeline(EmbeddingIngestionPipeline): Pipeline used to store finished turns
+            - top_k(int): Maximum number of memories retrieved per turn
+            - token_cap(int): Maximum estimated tokens of memory injected into the prompt
+            - retrieval_timeout(float): Seconds the turn waits for retrieval before skipping memory
+            - content_types(list[str]): Content types searched, e.g. ["chat", "lore"]. None searches all
+        """
+        self.retriever = retriever
+        self.pipeline = pipeline
+        self.top_k = top_k
+        self.token_cap = token_cap
+        self.retrieval_timeout = retrieval_timeout
+        self.content_types = content_types
+
+        self._indexed = False
+        self._index_task: asyncio.Task | None = None
+        self.pipeline.add_write_listener(self._on_write)
+
+        logger.info(f"""-----Initialized LongTermMemory with----- \n
+                    - top_k: {top_k} \n
+                    - token_cap: {token_cap} \n
+                    - retrieval_timeout: {retrieval_timeout} \n """)
+
+    def _on_write(self, rows: list[VectorStoreItem]):
+        self.retriever.invalidate()
+        if not self._indexed and self._index_task is None:
+            # Building the index is a blocking LanceDB call, keep it off the event loop
+            self._index_task = asyncio.get_running_loop().create_task(self._build_fts_index())
+
+    async def _build_fts_index(self):
+        try:
+            await asyncio.to_thread(self.retriever.ensure_fts_index)
+            self._indexed = True
+            self.retriever.invalidate()
+        except Exception as e:
+            logger.error(f"Failed to build the full-text index: {e}")
+        finally:
+            self._index_task = None
+
+    def prefetch(self, text: str | None = None, session_id: str = DEFAULT_SESSION) -> MemoryPrefetch:
+        """Start retrieving memories of a session for text (or for partial text fed later via update)"""
+        prefetch = MemoryPrefetch(self, session_id)
+        if text:
+            prefetch.update(text)
+        return prefetch
+
+    def build_context(self, hits: list[dict]) -> str:
+        """Format retrieved hits, most relevant first, under the token cap"""
+        lines = []
+        used = 0
+        for hit in hits:
+            content = (hit.get("content") or "").strip()
+            if not content:
+                continue
+            line = f"- [{hit.get('content_type', '')}] {content}"
+            cost = estimate_tokens(line)
+            if used + cost > self.token_cap:
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(lines)
+
+    def inject(self, messages: list[dict[str, Any]], hits: list[dict]) -> list[dict[str, Any]]:
+        """Insert retrieved memories as a system message right after the main system prompt"""
+        context = self.build_context(hits)
+        if not context:
+            return messages
+
+        memory_message = {
+            "role": "system",
+            "content": f"# 相关记忆\n以下是与当前对话相关的过往对话和设定，仅在相关时参考：\n{context}"
+        }
+        insert_at = 1 if messages and messages[0].get("role") == "system" else 0
+        return [*messages[:insert_at], memory_message, *messages[insert_at:]]
+
+    async def remember_turn(self, user_text: str, assistant_text: str, session_id: str = DEFAULT_SESSION):
+        """Embed and store a finished turn of a session"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        items = [
+            VectorStoreItem(id="", timestamp=timestamp, content_type="chat", content=text, vector=None, attributes={"sender": sender, "session_id": session_id})
+            for sender, text in (("You", user_text), ("Role", assistant_text))
+            if text
+        ]
+        try:
+            await self.pipeline.ingest(items)
+        except Exception as e:
+            logger.error(f"Failed to store turn in memory: {e}")
@@ -0,0 +1,67 @@
+import numpy as np
+import onnxruntime as ort
+from loguru import logger
+from tokenizers import Tokenizer
+
+
+class OnnxCrossEncoderReranker():
+    def __init__(
+            self,
+            model_path: str,
+            tokenizer_path: str,
+            max_length: int = 256,
+            batch_size: int = 16,
+            num_threads: int = 1,
+    ):
+        """
+        Score (query, document) pairs with a small cross-encoder exported to ONNX,
+        e.g. bge-reranker-base or ms-marco-MiniLM, on CPU.
+
+        Args:
+            - model_path(str): Path to the cross-encoder model.onnx
+            - tokenizer_path(str): Path to the matching tokenizer.json
+            - max_length(int): Maximum tokens per (query, document) pair
+            - batch_size(int): Number of pairs per inference call
+            - num_threads(int): Intra-op threads of the ONNX session
+        """
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        logger.info(f"""-----Initialized OnnxCrossEncoderReranker with----- \n
+                    - model_path: {model_path} \n
+                    - max_length: {max_length} \n
+                    - num_threads: {num_threads} \n """)
+
+    def rerank(self, query: str, documents: list[str]) -> list[float]:
+        """
+        Score documents against the query
+
+        Returns:
+            Relevance scores, one per document (higher is more relevant)
+        """
+        scores = []
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([(query, document) for document in batch])
+
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+
+            logits = self.session.run(None, inputs)[0]
+            # Single-logit models output relevance directly, two-class models use the positive class
+            scores.extend(logits[:, -1].tolist() if logits.ndim == 2 else logits.tolist())
+        return scores
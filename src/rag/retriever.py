@@ -0,0 +1,231 @@
+import re
+import asyncio
+import unicodedata
+from loguru import logger
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from rag.lancedb_database import LanceDBDatabase, _escape_sql_string, _escape_like
+
+DEFAULT_SESSION = "default"
+
+if TYPE_CHECKING:
+    from rag.reranker import OnnxCrossEncoderReranker
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share cache entries"""
+    query = unicodedata.normalize("NFKC", query).lower()
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class LRUCache():
+    """Small least-recently-used cache"""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.capacity:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class HybridRetriever():
+    def __init__(
+            self,
+            database: LanceDBDatabase,
+            embed_fn: Callable[[list[str]], Awaitable[list[list[float]]]],
+            reranker: "OnnxCrossEncoderReranker | None" = None,
+            text_column: str = "content",
+            vector_column: str = "vector",
+            columns: list[str] | None = None,
+            candidate_k: int = 20,
+            rrf_k: int = 60,
+            embedding_cache_size: int = 1024,
+            result_cache_size: int = 256,
+            fts_index_kwargs: dict | None = None,
+    ):
+        """
+        Hybrid full-text + vector retrieval over a LanceDB table
+
+        Full-text (BM25) and vector candidates are fused with reciprocal-rank
+        fusion, optionally reranked with a cross-encoder, and cached per
+        normalized query.
+
+        Args:
+            - database(LanceDBDatabase): The connected database to search
+            - embed_fn: Async callable embedding a batch of texts, e.g. AsyncLiteLLM.embedding
+            - reranker(OnnxCrossEncoderReranker): Optional cross-encoder applied to the fused candidates
+            - text_column(str): Column used for full-text search and reranking
+            - vector_column(str): Column used for vector search
+            - columns(list[str]): Columns returned with each hit. Vectors are excluded by default
+            - candidate_k(int): Candidates taken from each retriever before fusion
+            - rrf_k(int): Rank offset of reciprocal-rank fusion
+            - embedding_cache_size(int): Number of cached query embeddings
+            - result_cache_size(int): Number of cached query results
+            - fts_index_kwargs(dict): Options for the full-text index. Defaults to character
+              n-grams, which also work for Chinese and Japanese text
+        """
+        self.database = database
+        self.embed_fn = embed_fn
+        self.reranker = reranker
+        self.text_column = text_column
+        self.vector_column = vector_column
+        self.columns = columns or ["id", "timestamp", "content_type", "content", "attributes"]
+        self.candidate_k = candidate_k
+        self.rrf_k = rrf_k
+        self.fts_index_kwargs = fts_index_kwargs or {
+            "base_tokenizer": "ngram",
+            "ngram_min_length": 2,
+            "ngram_max_length": 3,
+            "stem": False,
+            "remove_stop_words": False,
+        }
+
+        self.embedding_cache = LRUCache(embedding_cache_size)
+        self.result_cache = LRUCache(result_cache_size)
+
+        logger.info(f"""-----Initialized HybridRetriever with----- \n
+                    - collection: {database.collection_name} \n
+                    - candidate_k: {candidate_k} \n
+                    - reranker: {type(reranker).__name__ if reranker else None} \n """)
+
+    def ensure_fts_index(self, replace: bool = False):
+        """Create the full-text index on the text column if it does not exist yet"""
+        collection = getattr(self.database, "collection", None)
+        if collection is None:
+            return
+
+        if not replace:
+            for index in collection.list_indices():
+                if index.index_type == "FTS" and self.text_column in index.columns:
+                    return
+
+        logger.info(f"Creating full-text index on '{self.text_column}'")
+        collection.create_fts_index(self.text_column, replace=True, **self.fts_index_kwargs)
+
+    def invalidate(self, *_):
+        """Drop cached results, e.g. after new rows were written"""
+        self.result_cache.clear()
+
+    async def embed_query(self, query: str) -> list[float]:
+        key = normalize_query(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            vector = (await self.embed_fn([key]))[0]
+            self.embedding_cache.put(key, vector)
+        return vector
+
+    def _where(self, content_types: list[str] | None, session_id: str | None = None) -> str | None:
+        conditions = []
+        if content_types:
+            values = ", ".join(f"'{_escape_sql_string(value)}'" for value in content_types)
+            conditions.append(f"content_type IN ({values})")
+        if session_id is not None:
+            conditions.append(self._session_filter(session_id))
+        return " AND ".join(f"({condition})" for condition in conditions) or None
+
+    def _session_filter(self, session_id: str) -> str:
+        """
+        Rows visible to a session: its own rows, and shared rows without a session
+        (e.g. lore). Chat rows stored before sessions existed belong to the default session.
+        """
+        own = f"attributes LIKE '%\"session_id\": \"{_escape_like(session_id)}\"%' ESCAPE '\\'"
+        shared = "attributes IS NULL OR attributes NOT LIKE '%\"session_id\":%'"
+        if session_id != DEFAULT_SESSION:
+            shared = f"content_type != 'chat' AND ({shared})"
+        return f"{own} OR ({shared})"
+
+    def _fts_search(self, query: str, where: str | None) -> list[dict]:
+        try:
+            builder = self.database.collection.search(query, query_type="fts", fts_columns=self.text_column)
+            if where:
+                builder = builder.where(where, prefilter=True)
+            return builder.select(self.columns).limit(self.candidate_k).to_list()
+        except Exception as e:
+            # e.g. the full-text index has not been created yet; fall back to vector hits only
+            logger.warning(f"Full-text search failed: {e}")
+            return []
+
+    def _vector_search(self, vector: list[float], where: str | None) -> list[dict]:
+        builder = self.database.collection.search(vector, vector_column_name=self.vector_column)
+        if where:
+            builder = builder.where(where, prefilter=True)
+        return builder.select(self.columns).limit(self.candidate_k).to_list()
+
+    def _fuse(self, *rankings: list[dict]) -> list[dict]:
+        """Reciprocal-rank fusion of several ranked hit lists"""
+        fused: dict[Any, dict] = {}
+        for ranking in rankings:
+            for rank, hit in enumerate(ranking):
+                entry = fused.setdefault(hit["id"], {**hit, "_score": 0.0})
+                entry["_score"] += 1.0 / (self.rrf_k + rank + 1)
+        return sorted(fused.values(), key=lambda hit: hit["_score"], reverse=True)
+
+    async def retrieve(
+            self,
+            query: str,
+            top_k: int = 5,
+            content_types: list[str] | None = None,
+            session_id: str | None = None,
+    ) -> list[dict]:
+        """
+        Retrieve the most relevant rows for a query
+
+        Args:
+            - query(str): The query text
+            - top_k(int): Number of hits to return
+            - content_types(list[str]): Only search rows with these content types
+            - session_id(str): Only search the rows of this session and shared rows. None searches all
+
+        Returns:
+            - list[dict]: Hits ordered by relevance, with a fused "_score"
+              (and "_rerank_score" when a reranker is configured)
+        """
+        if not query or not query.strip() or getattr(self.database, "collection", None) is None:
+            return []
+
+        key = (normalize_query(query), top_k, tuple(content_types or ()), session_id)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return cached
+
+        where = self._where(content_types, session_id)
+        vector = await self.embed_query(query)
+
+        # Both searches are blocking LanceDB calls, run them side by side
+        fts_hits, vector_hits = await asyncio.gather(
+            asyncio.to_thread(self._fts_search, key[0], where),
+            asyncio.to_thread(self._vector_search, vector, where),
+        )
+        hits = self._fuse(fts_hits, vector_hits)
+
+        if self.reranker is not None and hits:
+            candidates = hits[:self.candidate_k]
+            scores = await asyncio.to_thread(
+                self.reranker.rerank, query, [hit[self.text_column] or "" for hit in candidates]
+            )
+            for hit, score in zip(candidates, scores):
+                hit["_rerank_score"] = score
+            hits = sorted(candidates, key=lambda hit: hit["_rerank_score"], reverse=True)
+
+        hits = hits[:top_k]
+        self.result_cache.put(key, hits)
+        return hits
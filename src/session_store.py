@@ -0,0 +1,209 @@
+import os
+import re
+import json
+import time
+import asyncio
+from loguru import logger
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+DEFAULT_SESSION = "default"
+
+
+def empty_history() -> dict:
+    return {"version": "1.0", "created": "", "updated": "", "messages": []}
+
+
+@dataclass
+class Session:
+    session_id: str
+    history: dict = field(default_factory=empty_history)
+    character: dict = field(default_factory=dict)  # overrides of the character config
+    system_prompt: str | None = None  # built lazily from the character
+    last_active: float = field(default_factory=time.monotonic)
+    dirty: bool = False  # changed since it was last queued for writing
+
+
+class SessionStore():
+    def __init__(
+            self,
+            spill_dir: str = "chat_history/sessions",
+            default_path: str = "chat_history/chat.json",
+            max_sessions: int = 256,
+            idle_timeout: float = 1800.0,
+            sweep_interval: float = 60.0,
+            is_busy: Callable[[str], bool] | None = None,
+            on_evict: Callable[[str], None] | None = None,
+    ):
+        """
+        Per-session server state (chat history, character selection), bounded in memory
+
+        Sessions are kept in LRU order. Sessions idle for idle_timeout, and the least
+        recently used ones beyond max_sessions, are written to spill_dir and dropped
+        from memory; they are loaded back transparently on their next request.
+
+        Changes are written behind: a session marked with `mark_dirty` is written
+        every sweep_interval, when it is evicted and at shutdown (`flush`), on a
+        single writer thread so that writes of one session land in order.
+
+        Args:
+            - spill_dir(str): Directory of the spilled sessions, one JSON file each
+            - default_path(str): File of the "default" session, compatible with the
+              single-user chat_history/chat.json
+            - max_sessions(int): Sessions kept in memory
+            - idle_timeout(float): Seconds without requests before a session is spilled
+            - sweep_interval(float): Seconds between idle sweeps
+            - is_busy: Sessions for which this returns True (e.g. a turn in flight) are not evicted
+            - on_evict: Called with the id of every evicted session
+        """
+        self.spill_dir = spill_dir
+        self.default_path = default_path
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.is_busy = is_busy or (lambda session_id: False)
+        self.on_evict = on_evict
+
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.loads = 0
+        self.writes = 0
+        # snapshots queued for writing, served to _load until they are on disk
+        self._pending: dict[str, dict] = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session_writer")
+        os.makedirs(spill_dir, exist_ok=True)
+
+        logger.info(f"""-----Initialized SessionStore with----- \n
+                    - spill_dir: {spill_dir} \n
+                    - max_sessions: {max_sessions} \n
+                    - idle_timeout: {idle_timeout} \n """)
+
+    def _path(self, session_id: str) -> str:
+        if session_id == DEFAULT_SESSION:
+            return self.default_path
+        return os.path.join(self.spill_dir, f"{session_id}.json")
+
+    def _load(self, session_id: str) -> Session:
+        session = Session(session_id)
+        try:
+            pending = self._pending.get(session_id)
+            if pending is not None:
+                data = json.loads(json.dumps(pending))
+            else:
+                with open(self._path(session_id), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            session.character = data.pop("character", None) or {}
+            session.history = data
+            self.loads += 1
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load session {session_id}: {e}")
+        return session
+
+    def _write(self, session_id: str, data: dict):
+        path = self._path(session_id)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    def _snapshot(self, session: Session) -> dict:
+        data = dict(session.history)
+        if session.character:
+            data["character"] = session.character
+        return data
+
+    def mark_dirty(self, session: Session):
+        """Record that a session changed (e.g. its history was replaced), it is written behind"""
+        session.dirty = True
+
+    def _write_pending(self, session_id: str, data: dict):
+        try:
+            self._write(session_id, data)
+            self.writes += 1
+        except OSError as e:
+            logger.error(f"Failed to write session {session_id}: {e}")
+        finally:
+            if self._pending.get(session_id) is data:
+                del self._pending[session_id]
+
+    def _write_behind(self, session: Session):
+        """Queue a snapshot of a changed session on the writer thread, without blocking the event loop"""
+        data = self._snapshot(session)
+        session.dirty = False
+        self._pending[session.session_id] = data
+        self._writer.submit(self._write_pending, session.session_id, data)
+
+    def get(self, session_id: str) -> Session:
+        """
+        The session with this id, loaded from disk or created when not in memory
+
+        Raises:
+            ValueError: Invalid session id
+        """
+        if not SESSION_ID.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self._load(session_id)
+            self.sessions[session_id] = session
+            self._evict_overflow(keep=session_id)
+        self.sessions.move_to_end(session_id)
+        session.last_active = time.monotonic()
+        return session
+
+    def _evict(self, session_id: str):
+        session = self.sessions.pop(session_id)
+        if session.dirty:
+            self._write_behind(session)
+        if self.on_evict:
+            self.on_evict(session_id)
+
+    def _evict_overflow(self, keep: str):
+        for session_id in list(self.sessions):
+            if len(self.sessions) <= self.max_sessions:
+                return
+            if session_id != keep and not self.is_busy(session_id):
+                self._evict(session_id)
+
+    def sweep(self) -> int:
+        """Spill sessions idle for longer than idle_timeout, returns how many"""
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [session_id for session_id, session in self.sessions.items() if session.last_active < deadline and not self.is_busy(session_id)]
+        for session_id in idle:
+            self._evict(session_id)
+        return len(idle)
+
+    def checkpoint(self) -> int:
+        """Queue every changed session in memory for writing, returns how many"""
+        dirty = [session for session in self.sessions.values() if session.dirty]
+        for session in dirty:
+            self._write_behind(session)
+        return len(dirty)
+
+    async def run_sweeper(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            evicted = self.sweep()
+            self.checkpoint()
+            if evicted:
+                logger.info(f"Spilled {evicted} idle sessions, {len(self.sessions)} in memory")
+
+    def flush(self):
+        """Write every changed session to disk and wait for queued writes, e.g. at shutdown"""
+        self.checkpoint()
+        self._writer.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "in_memory": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "loads": self.loads,
+            "writes": self.writes,
+            "pending_writes": len(self._pending),
+        }
@@ -0,0 +1,125 @@
+import os
+import time
+import asyncio
+from loguru import logger
+from typing import Callable
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".ogg", ".opus", ".pcm", ".webm", ".flac"}
+
+
+class AudioCacheSweeper():
+    def __init__(
+            self,
+            cache_dir: str = "cache",
+            max_size_mb: int = 2048,
+            max_age: float = 7 * 24 * 3600,
+            min_age: float = 600,
+            sweep_interval: float = 600,
+            keep: Callable[[], set[str]] | None = None,
+    ):
+        """
+        Bounds the disk use of synthesized replies and their encoded variants
+
+        Audio files not used for max_age are deleted. When the cache is still larger
+        than max_size_mb, the least recently used files are deleted until it fits.
+        A file and its encoded variants (same name, other extension) are evicted together.
+
+        Args:
+            - cache_dir(str): Directory of the generated audio
+            - max_size_mb(int): Maximum total size of the audio files, 0 = no limit
+            - max_age(float): Seconds since last use before a file is deleted, 0 = no limit
+            - min_age(float): Files used more recently than this are never deleted,
+              e.g. a reply that was synthesized but not downloaded yet
+            - sweep_interval(float): Seconds between sweeps
+            - keep: Returns paths that must never be deleted, e.g. the phrase bank clips
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size_mb * 1024 * 1024
+        self.max_age = max_age
+        self.min_age = min_age
+        self.sweep_interval = sweep_interval
+        self.keep = keep or (lambda: set())
+
+        self.removed = 0
+        self.freed = 0
+
+        logger.info(f"""-----Initialized AudioCacheSweeper with----- \n
+                    - cache_dir: {cache_dir} \n
+                    - max_size_mb: {max_size_mb} \n
+                    - max_age: {max_age} \n """)
+
+    def _entries(self) -> dict[str, dict]:
+        """Audio files grouped by name without extension: {"last_used", "size", "paths"}"""
+        entries: dict[str, dict] = {}
+        with os.scandir(self.cache_dir) as scan:
+            for item in scan:
+                name, extension = os.path.splitext(item.name)
+                if extension not in AUDIO_EXTENSIONS or not item.is_file():
+                    continue
+                stat = item.stat()
+                entry = entries.setdefault(name, {"last_used": 0.0, "size": 0, "paths": []})
+                entry["last_used"] = max(entry["last_used"], stat.st_atime, stat.st_mtime)
+                entry["size"] += stat.st_size
+                entry["paths"].append(item.path)
+        return entries
+
+    def _remove(self, entry: dict) -> int:
+        freed = 0
+        for path in entry["paths"]:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove cached audio {path}: {e}")
+        return freed
+
+    def sweep(self) -> tuple[int, int]:
+        """
+        Delete expired and least recently used audio files
+
+        Returns:
+            tuple[int, int]: Number of evicted clips and freed bytes
+        """
+        if not os.path.isdir(self.cache_dir):
+            return 0, 0
+
+        kept = {os.path.splitext(os.path.basename(path))[0] for path in self.keep()}
+        now = time.time()
+        entries = self._entries()
+        total = sum(entry["size"] for entry in entries.values())
+        candidates = sorted(
+            (entry for name, entry in entries.items() if name not in kept and now - entry["last_used"] >= self.min_age),
+            key=lambda entry: entry["last_used"],
+        )
+
+        removed, freed = 0, 0
+        for entry in candidates:
+            expired = self.max_age and now - entry["last_used"] > self.max_age
+            oversized = self.max_size and total > self.max_size
+            if not expired and not oversized:
+                # oldest first: every remaining entry is newer and the cache fits
+                break
+            size = self._remove(entry)
+            total -= size
+            removed += 1
+            freed += size
+
+        self.removed += removed
+        self.freed += freed
+        return removed, freed
+
+    async def run(self):
+        while True:
+            try:
+                removed, freed = await asyncio.to_thread(self.sweep)
+                if removed:
+                    logger.info(f"Evicted {removed} cached audio clips, freed {freed / 1024 / 1024:.1f}MB")
+            except Exception as e:
+                logger.error(f"Audio cache sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def stats(self) -> dict:
+        return {"removed": self.removed, "freed_mb": round(self.freed / 1024 / 1024, 1)}
@@ -0,0 +1,273 @@
+import os
+import uuid
+import asyncio
+import soxr
+import numpy as np
+import soundfile as sf
+from loguru import logger
+from typing import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from tts.audio_utils import decode_wav_stream
+
+
+# format -> (libsndfile container, subtype, file extension, supported sample rates)
+ENCODINGS = {
+    "opus": ("OGG", "OPUS", "opus", (8000, 12000, 16000, 24000, 48000)),
+    "mp3": ("MP3", "MPEG_LAYER_III", "mp3", (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)),
+}
+
+# Accept media types -> format
+ACCEPT_TYPES = {
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "application/ogg": "opus",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+}
+
+
+def _target_rate(format: str, sample_rate: int) -> int:
+    """Closest supported sample rate that does not lose bandwidth"""
+    rates = ENCODINGS[format][3]
+    return sample_rate if sample_rate in rates else next((r for r in rates if r > sample_rate), rates[-1])
+
+
+def _parse_accept(accept: str) -> list[tuple[str, float]]:
+    ranges = []
+    for part in accept.split(","):
+        fields = [field.strip() for field in part.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranges.append((fields[0].lower(), q))
+    return ranges
+
+
+class _ChunkSink():
+    """
+    Write-only file object for libsndfile that hands out bytes as they are written
+
+    Encoders may seek back at the end to patch a header (e.g. the MP3 Xing
+    frame count); bytes that were already sent cannot change, so those
+    writes are dropped, which players tolerate.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.flushed = 0
+        self.pending = bytearray()
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        end = self.position + len(data)
+        if end > self.flushed:
+            skip = max(0, self.flushed - self.position)
+            offset = self.position + skip - self.flushed
+            self.pending[offset:offset + len(data) - skip] = data[skip:]
+        self.position = end
+        return len(data)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.flushed + len(self.pending)
+        self.position = offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def read(self, size: int = -1) -> bytes:
+        return b""
+
+    def take(self) -> bytes:
+        data = bytes(self.pending)
+        self.flushed += len(data)
+        self.pending.clear()
+        return data
+
+
+class _StreamEncoder():
+    """Incremental encoder state of one stream, driven from the worker pool"""
+
+    def __init__(self, format: str, sample_rate: int, channels: int, compression_level: float):
+        container, subtype, _, _ = ENCODINGS[format]
+        self.rate = _target_rate(format, sample_rate)
+        self.resampler = soxr.ResampleStream(sample_rate, self.rate, channels, dtype="float32") if self.rate != sample_rate else None
+        self.sink = _ChunkSink()
+        self.file = sf.SoundFile(
+            self.sink, "w",
+            samplerate=self.rate,
+            channels=channels,
+            format=container,
+            subtype=subtype,
+            compression_level=compression_level,
+        )
+
+    def encode(self, samples: np.ndarray, last: bool = False) -> bytes:
+        if self.resampler is not None:
+            samples = self.resampler.resample_chunk(samples, last=last)
+        if len(samples):
+            self.file.write(samples)
+        if last:
+            self.file.close()
+        return self.sink.take()
+
+
+class AudioEncoder():
+    def __init__(
+            self,
+            formats: list[str] = ["mp3", "opus"],
+            max_workers: int = 2,
+            compression_level: float = 0.5,
+            eager: bool = True,
+    ):
+        """
+        Transcode TTS output (WAV/PCM) to compressed formats for delivery
+
+        Args:
+            - formats(list[str]): Offered formats ("mp3", "opus") in order of preference.
+              The first one is used for clients that accept anything ("*/*")
+            - max_workers(int): Size of the encoding thread pool
+            - compression_level(float): 0 (best quality, largest) to 1 (smallest)
+            - eager(bool): Start encoding the preferred format as soon as a file is generated
+        """
+        unknown = [format for format in formats if format not in ENCODINGS]
+        if unknown:
+            raise ValueError(f"Unsupported audio formats: {unknown}, choose from {list(ENCODINGS)}")
+
+        self.formats = list(formats)
+        self.compression_level = compression_level
+        self.eager = eager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio_encoder")
+        self._pending: dict[str, asyncio.Future] = {}
+
+        logger.info(f"""-----Initialized AudioEncoder with----- \n
+                    - formats: {formats} \n
+                    - max_workers: {max_workers} \n
+                    - compression_level: {compression_level} \n """)
+
+    def negotiate(self, accept: str | None, source_format: str) -> str:
+        """
+        Pick the delivery format from an Accept header
+
+        The most specific matching media range decides the quality of each
+        candidate; ties go to the configured preference order, then the source.
+        Without an Accept header the source format is kept.
+        """
+        if not accept:
+            return source_format
+
+        ranges = _parse_accept(accept)
+        best, best_q = source_format, -1.0
+        for candidate in [*self.formats, source_format]:
+            q, specificity = 0.0, -1
+            for media_range, range_q in ranges:
+                if ACCEPT_TYPES.get(media_range) == candidate:
+                    level = 2
+                elif media_range == "audio/*":
+                    level = 1
+                elif media_range == "*/*":
+                    level = 0
+                else:
+                    continue
+                if level > specificity:
+                    q, specificity = range_q, level
+                elif level == specificity:
+                    q = max(q, range_q)
+            if q > best_q:
+                best, best_q = candidate, q
+        return best if best_q > 0 else source_format
+
+    def variant_path(self, path: str, format: str) -> str:
+        """Encoded variants are cached next to the source file"""
+        return f"{os.path.splitext(path)[0]}.{ENCODINGS[format][2]}"
+
+    def _encode_file(self, path: str, target: str, format: str):
+        data, sample_rate = sf.read(path, dtype="float32")
+        rate = _target_rate(format, sample_rate)
+        if rate != sample_rate:
+            data = soxr.resample(data, sample_rate, rate)
+
+        container, subtype, _, _ = ENCODINGS[format]
+        temp_path = f"{target}.{uuid.uuid4().hex}.part"
+        try:
+            sf.write(temp_path, data, rate, format=container, subtype=subtype, compression_level=self.compression_level)
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    async def encode_file(self, path: str, format: str) -> str:
+        """
+        Return the path of path encoded as format, encoding it if not cached yet
+
+        Concurrent requests for the same variant share one encoding job.
+        """
+        if format not in ENCODINGS or os.path.splitext(path)[1].lstrip(".") == ENCODINGS[format][2]:
+            return path
+
+        target = self.variant_path(path, format)
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+            return target
+
+        future = self._pending.get(target)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._encode_file, path, target, format)
+            self._pending[target] = future
+            future.add_done_callback(lambda _: self._pending.pop(target, None))
+
+        # shield: a client disconnecting must not cancel the job other requests wait for
+        await asyncio.shield(future)
+        logger.info(f"Encoded {path} as {format}: {os.path.getsize(path)} -> {os.path.getsize(target)} bytes")
+        return target
+
+    def warm(self, path: str):
+        """Encode the preferred format in the background, before the client asks for it"""
+        if not self.eager or not path:
+            return
+
+        async def encode():
+            try:
+                await self.encode_file(path, self.formats[0])
+            except Exception as e:
+                logger.warning(f"Background encoding of {path} failed: {e}")
+
+        asyncio.create_task(encode())
+
+    async def encode_wav_stream(self, chunks: AsyncIterator[bytes], format: str) -> AsyncIterator[bytes]:
+        """
+        Encode a streamed 16-bit PCM WAV (header first) on the fly
+
+        Yields:
+            bytes: Encoded chunks, available as soon as the encoder emits a page/frame
+        """
+        loop = asyncio.get_running_loop()
+        encoder = None
+        channels = 1
+
+        async for sample_rate, channels, samples in decode_wav_stream(chunks):
+            if encoder is None:
+                encoder = await loop.run_in_executor(
+                    self._executor, _StreamEncoder, format, sample_rate, channels, self.compression_level)
+            if not len(samples):
+                continue
+            encoded = await loop.run_in_executor(self._executor, encoder.encode, samples)
+            if encoded:
+                yield encoded
+
+        if encoder is not None:
+            empty = np.zeros((0, channels) if channels > 1 else 0, dtype=np.float32)
+            encoded = await loop.run_in_executor(self._executor, encoder.encode, empty, True)
+            if encoded:
+                yield encoded
@@ -0,0 +1,101 @@
+import time
+import uuid
+import asyncio
+from loguru import logger
+from typing import AsyncIterator
+
+
+class AudioStream():
+    """
+    Audio chunks of one reply, produced in the background
+
+    Synthesis starts as soon as the stream is created, so it overlaps with
+    delivering the chat response. Chunks are buffered, so a reader that
+    connects late (or a second reader) still gets the clip from the start.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], media_type: str):
+        self.media_type = media_type
+        self.created = time.monotonic()
+        self.chunks: list[bytes] = []
+        self.done = False
+        self.error: BaseException | None = None
+
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._produce(chunks))
+
+    async def _produce(self, chunks: AsyncIterator[bytes]):
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    self.chunks.append(chunk)
+                    self._notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Audio stream failed: {e}")
+            self.error = e
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Yield buffered chunks, then new chunks as they arrive"""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                return
+            await changed.wait()
+
+    def cancel(self):
+        self.task.cancel()
+
+
+class AudioStreamRegistry():
+    def __init__(self, ttl: float = 120.0, max_streams: int = 256):
+        """
+        In-memory registry of reply audio streams, addressed by a random id
+
+        Args:
+            ttl: Seconds a stream stays available after it was created
+            max_streams: Maximum number of streams kept; the oldest are dropped first
+        """
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self.streams: dict[str, AudioStream] = {}
+
+    def _prune(self):
+        now = time.monotonic()
+        for stream_id, stream in list(self.streams.items()):
+            if now - stream.created > self.ttl:
+                stream.cancel()
+                del self.streams[stream_id]
+        while len(self.streams) >= self.max_streams:
+            stream_id = next(iter(self.streams))
+            self.streams.pop(stream_id).cancel()
+
+    def create(self, chunks: AsyncIterator[bytes], media_type: str) -> str:
+        self._prune()
+        stream_id = uuid.uuid4().hex
+        self.streams[stream_id] = AudioStream(chunks, media_type)
+        return stream_id
+
+    def get(self, stream_id: str) -> AudioStream | None:
+        self._prune()
+        return self.streams.get(stream_id)
+
+    def cancel(self, stream_id: str):
+        """Stop producing a stream, e.g. when the user interrupts the reply"""
+        stream = self.streams.pop(stream_id, None)
+        if stream is not None:
+            stream.cancel()
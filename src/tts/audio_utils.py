@@ -0,0 +1,143 @@
+import os
+import re
+import uuid
+import hashlib
+import struct
+import numpy as np
+from typing import AsyncIterator
+
+
+def new_cache_path(format: str, cache_dir: str = "cache") -> str:
+    """Unique output path under the cache directory, so concurrent requests never share a file"""
+    os.makedirs(cache_dir, exist_ok=True)
+    return f"{cache_dir}/speech_{uuid.uuid4().hex}.{format}"
+
+
+CONTENT_ADDRESS = re.compile(r"^[0-9a-f]{32}$")
+
+
+def content_address(file_path: str) -> str:
+    """
+    Rename a generated file after the hash of its content
+
+    The name then identifies the bytes, so it can be cached forever and
+    identical clips share one file.
+
+    Returns:
+        str: The new path, in the same directory with the same extension
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+
+    # keep the "cache/..." form of new_cache_path, which callers turn into urls
+    directory, filename = os.path.split(file_path)
+    name = f"{sha256.hexdigest()[:32]}{os.path.splitext(filename)[1]}"
+    target = f"{directory}/{name}" if directory else name
+    os.replace(file_path, target)
+    return target
+
+
+def is_content_addressed(file_path: str) -> bool:
+    return bool(CONTENT_ADDRESS.match(os.path.splitext(os.path.basename(file_path))[0]))
+
+
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "pcm": "audio/L16",
+    "ogg": "audio/ogg",
+    "opus": "audio/ogg",
+    "webm": "audio/webm",
+}
+
+
+def media_type_for(format: str) -> str:
+    return MEDIA_TYPES.get(format, "application/octet-stream")
+
+
+def wav_stream_header(sample_rate: int, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """
+    WAV header for a stream of unknown length
+
+    The RIFF and data sizes are set to the maximum, which browsers and most
+    decoders accept as "read until the end of the stream".
+    """
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+def float_to_pcm16(samples: np.ndarray) -> bytes:
+    """float32 samples in [-1, 1] to little-endian 16-bit PCM"""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def parse_wav_header(data: bytes) -> tuple[int, int, int] | None:
+    """
+    (sample_rate, channels, offset of the PCM data) of a WAV header, None if incomplete
+
+    Raises:
+        ValueError: If the stream is not 16-bit PCM WAV
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Audio stream is not WAV")
+
+    offset = 12
+    sample_rate = channels = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = int.from_bytes(data[offset + 4:offset + 8], "little")
+        if chunk_id == b"data":
+            if sample_rate is None:
+                raise ValueError("WAV stream has no fmt chunk before its data")
+            return sample_rate, channels, offset + 8
+        if offset + 8 + chunk_size > len(data):
+            return None
+        if chunk_id == b"fmt ":
+            audio_format, channels, sample_rate, _, _, bits_per_sample = struct.unpack("<HHIIHH", data[offset + 8:offset + 24])
+            if audio_format not in (1, 0xFFFE) or bits_per_sample != 16:
+                raise ValueError(f"Only 16-bit PCM WAV streams are supported (format {audio_format}, {bits_per_sample} bits)")
+        offset += 8 + chunk_size + chunk_size % 2
+    return None
+
+
+async def decode_wav_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, int, np.ndarray]]:
+    """
+    Decode a streamed 16-bit PCM WAV (header first) as it arrives
+
+    Yields:
+        tuple[int, int, np.ndarray]: sample_rate, channels and float32 samples
+            (shape (n,) for mono, (n, channels) otherwise). The first item is
+            yielded as soon as the header is complete and may be empty.
+    """
+    header = bytearray()
+    params = None
+    remainder = b""
+
+    async for chunk in chunks:
+        if params is None:
+            header += chunk
+            parsed = parse_wav_header(bytes(header))
+            if parsed is None:
+                continue
+            sample_rate, channels, data_offset = parsed
+            params = (sample_rate, channels)
+            chunk = bytes(header[data_offset:])
+
+        data = remainder + chunk
+        frame_bytes = 2 * params[1]
+        usable = len(data) - len(data) % frame_bytes
+        remainder = data[usable:]
+
+        samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768
+        if params[1] > 1:
+            samples = samples.reshape(-1, params[1])
+        yield params[0], params[1], samples
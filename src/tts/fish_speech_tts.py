@@ -2,6 +2,8 @@ import os
 from loguru import logger
 from fish_audio_sdk import Session, TTSRequest
 from typing import Literal
+from async_utils import iterate_in_thread
+from tts.audio_utils import new_cache_path, media_type_for
 
 # 792e8a3c13164349b29fe44e8fa4921d
 class FishAudioTTS():
@@ -17,6 +19,7 @@ class FishAudioTTS():
         self.latency = latency
         self.format = format
         self.backend = backend
+        self.stream_media_type = media_type_for(format)
 
         logger.info(f"""-----Initialized FishAudioTTS with----- \n 
                     - reference_id: {self.reference_id} \n 
@@ -26,23 +29,22 @@ class FishAudioTTS():
                     - backend: {self.backend}""")
         
         self.session = Session(api_key)
+
+    def build_request(self, text: str) -> TTSRequest:
+        return TTSRequest(
+            text=text,
+            reference_id=self.reference_id,
+            latency=self.latency,
+            format=self.format,
+            backend=self.backend
+        )
         
     def generate_speech(self, text: str):
-        if not os.path.exists(f"cache"):
-            os.makedirs(f"cache")
-
-        file_path = f"cache/speech_temp.{self.format}"
+        file_path = new_cache_path(self.format)
 
         try:
             with open(file_path, "wb") as f:
-                for chunk in self.session.tts(
-                    TTSRequest(
-                        text=text,
-                        reference_id=self.reference_id,
-                        latency=self.latency,
-                        backend=self.backend
-                    )
-                ):
+                for chunk in self.session.tts(self.build_request(text)):
                     f.write(chunk)
 
             return file_path
@@ -51,3 +53,12 @@ class FishAudioTTS():
             logger.error(f"Error generating speech: {e}")
             return None
 
+    async def stream_speech(self, text: str):
+        """
+        Stream audio chunks as they are received from Fish Audio
+
+        Yields:
+            bytes: Encoded audio chunks in self.format
+        """
+        async for chunk in iterate_in_thread(lambda: self.session.tts(self.build_request(text))):
+            yield chunk
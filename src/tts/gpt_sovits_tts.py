@@ -1,11 +1,13 @@
-import os
-import requests
+import asyncio
+import httpx
 from loguru import logger
+from tts.replica_pool import ReplicaPool, RequestRejected
+from tts.audio_utils import new_cache_path, media_type_for
 
 class GPTSoVitsTTS():
     def __init__(
         self,
-        api_url: str = "http://127.0.0.1:5000",
+        api_url: str | list[str] = "http://127.0.0.1:5000",
         character: str = "【原神】八重神子",
         emotion: str = "default",
         text_language: str = "zh",
@@ -15,7 +17,15 @@ class GPTSoVitsTTS():
         top_p: float = 0.7,
         temperature: float = 0.7,
         stream: str = "False",
-        format: str = "wav"
+        format: str = "wav",
+        # http client args
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 2,
+        max_concurrency: int = 4,
+        # replica args (when api_url is a list)
+        health_interval: float = 10.0,
+        hedge_after: float | None = None,
     ):
         self.api_url = api_url
         self.character = character
@@ -28,61 +38,102 @@ class GPTSoVitsTTS():
         self.temperature = temperature
         self.stream = stream
         self.format = format
+        self.stream_media_type = media_type_for(format)
 
-        logger.info(f"""-----Initialized GPTSoVitsTTS with----- \n 
-                    - api_url: {api_url} \n 
-                    - character: {character} \n 
-                    - emotion: {emotion} \n 
-                    - text_language: {text_language} \n """)
+        # one shared keep-alive pool per server, requests routed to the least loaded server
+        self.pool = ReplicaPool(
+            api_url if isinstance(api_url, list) else [api_url],
+            client_factory=lambda http: http,
+            http_kwargs={
+                "connect_timeout": connect_timeout,
+                "read_timeout": read_timeout,
+                "max_retries": max_retries,
+                "max_concurrency": max_concurrency,
+                "max_connections": max_concurrency,
+            },
+            health_interval=health_interval,
+            hedge_after=hedge_after,
+        )
 
-    def generate_speech(self, text: str):
-        if not os.path.exists(f"cache"):
-            os.makedirs(f"cache")
+        logger.info(f"""-----Initialized GPTSoVitsTTS with----- \n
+                    - api_url: {api_url} \n
+                    - character: {character} \n
+                    - emotion: {emotion} \n
+                    - text_language: {text_language} \n
+                    - read_timeout: {read_timeout} \n
+                    - max_concurrency: {max_concurrency} \n """)
 
-        file_path = f"cache/speech_temp.{self.format}"
+    def build_payload(self, text: str, stream: str) -> dict:
+        return {
+            "character": self.character,
+            "emotion": self.emotion,
+            "text": text,
+            "text_language": self.text_language,
+            "batch_size": self.batch_size,
+            "speed": self.speed,
+            "top_k": self.top_k,
+            "top_p": self.top_p,
+            "temperature": self.temperature,
+            "stream": stream,
+            "save_temp": "False"
+        }
+
+    async def generate_speech(self, text: str):
+        file_path = new_cache_path(self.format)
 
         try:
-            payload = {
-                "character": self.character,
-                "emotion": self.emotion,
-                "text": text,
-                "text_language": self.text_language,
-                "batch_size": self.batch_size,
-                "speed": self.speed,
-                "top_k": self.top_k,
-                "top_p": self.top_p,
-                "temperature": self.temperature,
-                "stream": self.stream,
-                "save_temp": "False"
-            }
+            payload = self.build_payload(text, self.stream)
 
             logger.info(f"Sending POST request to {self.api_url}/tts")
             logger.info(f"Payload: {payload}")
 
-            response = requests.post(
-                f"{self.api_url}/tts",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-
-            if response.status_code == 200:
-                with open(file_path, "wb") as f:
-                    f.write(response.content)
-                
-                logger.info(f"Audio generated successfully: {file_path}")
-                return file_path
-            
-            else:
-                logger.error(f"Error generating audio: {response.status_code} {response.text}")
-                return None
-            
-        except requests.exceptions.ConnectionError as e:
+            async def request(replica):
+                response = await replica.client.post("/tts", json=payload)
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{replica.url} returned {response.status_code} {response.text}")
+                if response.status_code != 200:
+                    raise RequestRejected(f"{response.status_code} {response.text}")
+                return response.content
+
+            content = await self.pool.call(request)
+            await asyncio.to_thread(_write_file, file_path, content)
+
+            logger.info(f"Audio generated successfully: {file_path}")
+            return file_path
+
+        except RequestRejected as e:
+            logger.error(f"Error generating audio: {e}")
+            return None
+        except httpx.ConnectError as e:
             logger.error(f"Connection error: {e}")
             return None
-        except requests.exceptions.Timeout as e:
+        except httpx.TimeoutException as e:
             logger.error(f"Request timeout: {e}")
             return None
         except Exception as e:
             logger.error(f"Error generating audio: {e}")
             return None
-        
+
+    async def stream_speech(self, text: str):
+        """
+        Stream synthesized audio as it is produced by the server
+
+        Yields:
+            bytes: Encoded audio chunks (a WAV header followed by PCM for "wav")
+        """
+        payload = self.build_payload(text, "True")
+        logger.info(f"Streaming POST request to {self.api_url}/tts")
+
+        async with self.pool.lease() as replica:
+            async with replica.client.stream("POST", "/tts", json=payload) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    error = RequestRejected if response.status_code < 500 else RuntimeError
+                    raise error(f"Error streaming audio: {response.status_code} {body[:200]}")
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+
+
+def _write_file(file_path: str, content: bytes):
+    with open(file_path, "wb") as f:
+        f.write(content)
@@ -0,0 +1,165 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+from loguru import logger
+from dataclasses import dataclass
+from tts.http_client import AsyncHTTPClient
+
+
+class GradioAPIError(Exception):
+    pass
+
+
+@dataclass
+class UploadedFile:
+    """Placeholder for a local file argument, replaced by its server-side handle before the call"""
+    path: str
+
+
+@dataclass
+class _UploadEntry:
+    size: int
+    mtime_ns: int
+    digest: str
+    file_data: dict
+
+
+def _file_digest(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class GradioAPIClient():
+    """
+    Minimal async client for the HTTP API of a gradio app
+
+    Unlike gradio_client, reference files are uploaded once and their server
+    handles are reused for every call. They are re-uploaded only when the
+    local file changes or the server no longer knows them (e.g. after a restart).
+    Generated files are streamed straight into our cache directory.
+    """
+
+    def __init__(self, http: AsyncHTTPClient):
+        self.http = http
+        self._api_prefix: str | None = None
+        self._uploads: dict[str, _UploadEntry] = {}
+        self._upload_lock = asyncio.Lock()
+
+    async def api_prefix(self) -> str:
+        # gradio 5 serves its API under /gradio_api, gradio 4 at the root
+        if self._api_prefix is None:
+            response = await self.http.get("/config")
+            response.raise_for_status()
+            self._api_prefix = response.json().get("api_prefix", "").rstrip("/")
+        return self._api_prefix
+
+    def invalidate_uploads(self):
+        self._uploads.clear()
+        self._api_prefix = None
+
+    async def upload(self, path: str) -> dict:
+        """Return the server-side FileData of a local file, uploading it only when needed"""
+        async with self._upload_lock:
+            stat = os.stat(path)
+            entry = self._uploads.get(path)
+            if entry and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                return entry.file_data
+
+            digest = await asyncio.to_thread(_file_digest, path)
+            if entry and entry.digest == digest:
+                entry.size, entry.mtime_ns = stat.st_size, stat.st_mtime_ns
+                return entry.file_data
+
+            prefix = await self.api_prefix()
+            with open(path, "rb") as f:
+                response = await self.http.post(f"{prefix}/upload", files=[("files", (os.path.basename(path), f.read()))])
+            response.raise_for_status()
+
+            file_data = {
+                "path": response.json()[0],
+                "orig_name": os.path.basename(path),
+                "meta": {"_type": "gradio.FileData"},
+            }
+            self._uploads[path] = _UploadEntry(stat.st_size, stat.st_mtime_ns, digest, file_data)
+            logger.info(f"Uploaded {path} to {self.http.base_url} ({file_data['path']})")
+            return file_data
+
+    async def _call(self, api_name: str, data: list):
+        prefix = await self.api_prefix()
+        response = await self.http.post(f"{prefix}/call/{api_name.lstrip('/')}", json={"data": data})
+        if response.status_code != 200:
+            raise GradioAPIError(f"Call to {api_name} failed: {response.status_code} {response.text[:200]}")
+        event_id = response.json()["event_id"]
+
+        event = None
+        async with self.http.stream("GET", f"{prefix}/call/{api_name.lstrip('/')}/{event_id}") as result:
+            async for line in result.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event in ("complete", "error"):
+                    payload = line[len("data:"):].strip()
+                    if event == "error":
+                        raise GradioAPIError(f"{api_name} returned an error: {payload}")
+                    return json.loads(payload)
+        raise GradioAPIError(f"{api_name} ended without a result")
+
+    async def predict(self, api_name: str, data: list) -> list:
+        """
+        Call an endpoint with positional data
+
+        UploadedFile entries are replaced by cached server handles. If the call
+        fails while using cached handles, they are re-uploaded once.
+        """
+        has_files = any(isinstance(value, UploadedFile) for value in data)
+        for attempt in range(2):
+            resolved = [
+                await self.upload(value.path) if isinstance(value, UploadedFile) else value
+                for value in data
+            ]
+            try:
+                return await self._call(api_name, resolved)
+            except GradioAPIError as e:
+                if not has_files or attempt == 1:
+                    raise e
+                logger.warning(f"{e}; re-uploading reference files and retrying")
+                self.invalidate_uploads()
+
+    async def download(self, file_data: dict, file_path: str) -> str:
+        """Link (same host) or stream a generated file into file_path"""
+        # Written under a unique name and renamed, so a hedged duplicate request
+        # can never leave a half-written file at file_path
+        part_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            await self._download(file_data, part_path)
+            os.replace(part_path, file_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return file_path
+
+    async def _download(self, file_data: dict, file_path: str):
+        server_path = file_data.get("path")
+        if server_path and os.path.isfile(server_path):
+            # The server runs on this machine: hard-link its output instead of transferring it
+            try:
+                os.link(server_path, file_path)
+                return
+            except OSError:
+                pass
+
+        url = file_data.get("url")
+        if not url:
+            prefix = await self.api_prefix()
+            url = f"{prefix}/file={file_data['path']}"
+
+        async with self.http.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise GradioAPIError(f"Failed to download {url}: {response.status_code}")
+            with open(file_path, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    f.write(chunk)
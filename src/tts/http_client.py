@@ -0,0 +1,113 @@
+import random
+import asyncio
+import httpx
+from loguru import logger
+from contextlib import asynccontextmanager
+
+
+class AsyncHTTPClient():
+    def __init__(
+            self,
+            base_url: str,
+            connect_timeout: float = 5.0,
+            read_timeout: float = 60.0,
+            max_connections: int = 8,
+            keepalive_expiry: float = 60.0,
+            max_retries: int = 2,
+            retry_backoff: float = 0.5,
+            max_concurrency: int = 4,
+            retry_statuses: tuple[int, ...] = (502, 503, 504),
+    ):
+        """
+        Pooled async HTTP client for remote TTS servers
+
+        One keep-alive connection pool is shared by all requests to the server,
+        every request has connect/read timeouts, transient failures are retried
+        with exponential backoff and jitter, and at most `max_concurrency`
+        requests are sent to the server at once.
+
+        Args:
+            - base_url(str): The server url, e.g. "http://127.0.0.1:5000"
+            - connect_timeout(float): Seconds to establish a connection
+            - read_timeout(float): Seconds to wait for each chunk of the response
+            - max_connections(int): Size of the keep-alive connection pool
+            - keepalive_expiry(float): Seconds an idle pooled connection is kept open
+            - max_retries(int): Retries after connection errors, timeouts or retry_statuses
+            - retry_backoff(float): Base delay in seconds between retries
+            - max_concurrency(int): Maximum number of in-flight requests to this server
+            - retry_statuses(tuple[int]): HTTP status codes that are retried
+        """
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_statuses = retry_statuses
+        self.max_concurrency = max_concurrency
+
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _retry_delay(self, attempt: int) -> float:
+        # Full jitter keeps retries from several requests from arriving in lockstep
+        return random.uniform(0, self.retry_backoff * (2 ** attempt))
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request and read the full response body, retrying transient failures"""
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self.client.request(method, path, **kwargs)
+                    if response.status_code not in self.retry_statuses or attempt == self.max_retries:
+                        return response
+                    logger.warning(f"{method} {self.base_url}{path} returned {response.status_code}, retrying")
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise e
+                    logger.warning(f"{method} {self.base_url}{path} failed ({type(e).__name__}: {e}), retrying")
+                await asyncio.sleep(self._retry_delay(attempt))
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs):
+        """
+        Open a streaming response. Only establishing the response is retried,
+        a stream that fails midway is not restarted.
+        """
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    request = self.client.build_request(method, path, **kwargs)
+                    response = await self.client.send(request, stream=True)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise e
+                    logger.warning(f"{method} {self.base_url}{path} failed ({type(e).__name__}: {e}), retrying")
+                    await asyncio.sleep(self._retry_delay(attempt))
+                    continue
+
+                if response.status_code in self.retry_statuses and attempt < self.max_retries:
+                    await response.aclose()
+                    logger.warning(f"{method} {self.base_url}{path} returned {response.status_code}, retrying")
+                    await asyncio.sleep(self._retry_delay(attempt))
+                    continue
+
+                try:
+                    yield response
+                finally:
+                    await response.aclose()
+                return
+
+    async def aclose(self):
+        await self.client.aclose()
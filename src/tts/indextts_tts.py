@@ -1,17 +1,27 @@
 import os
 from typing import Literal
-from gradio_client import Client, handle_file
 from loguru import logger
+from tts.replica_pool import ReplicaPool
+from tts.gradio_api import GradioAPIClient, UploadedFile
+from tts.audio_utils import new_cache_path
 
 class IndexTTS():
     def __init__(
         self,
-        api_url: str = "http://127.0.0.1:7860",
+        api_url: str | list[str] = "http://127.0.0.1:7860",
         prompt_audio_path: str = "",
         infer_mode: Literal["普通推理", "批次推理"] = "普通推理",
         max_text_tokens_per_sentence: float = 120,
         sentences_bucket_max_size: int = 4,
-        format: str = "wav"
+        format: str = "wav",
+        # http client args
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 2,
+        max_concurrency: int = 2,
+        # replica args (when api_url is a list)
+        health_interval: float = 10.0,
+        hedge_after: float | None = None,
     ):
         self.api_url = api_url
         self.prompt_audio_path = prompt_audio_path
@@ -20,7 +30,20 @@ class IndexTTS():
         self.max_text_tokens_per_sentence = max_text_tokens_per_sentence
         self.sentences_bucket_max_size = sentences_bucket_max_size
 
-        self.client = Client(self.api_url)
+        # reference audio is uploaded once per server and reused across requests
+        self.pool = ReplicaPool(
+            api_url if isinstance(api_url, list) else [api_url],
+            client_factory=GradioAPIClient,
+            http_kwargs={
+                "connect_timeout": connect_timeout,
+                "read_timeout": read_timeout,
+                "max_retries": max_retries,
+                "max_concurrency": max_concurrency,
+            },
+            health_path="/config",
+            health_interval=health_interval,
+            hedge_after=hedge_after,
+        )
         logger.info(f"""-----Initialized IndexTTS with----- \n 
                     - api_url: {api_url} \n 
                     - prompt_audio_path: {prompt_audio_path} \n 
@@ -29,58 +52,59 @@ class IndexTTS():
                     - sentences_bucket_max_size: {sentences_bucket_max_size} \n 
                     - format: {format} \n """)
 
-    def generate_speech(self, text: str):
+    async def generate_speech(self, text: str):
         """
         生成语音
         
         Args:
             text: 要转换的文本
-            prompt_audio_path: 参考音频文件路径
             
         Returns:
             str: 生成的音频文件路径，失败时返回None
         """
-        if not os.path.exists("cache"):
-            os.makedirs("cache")
-
         if not os.path.exists(self.prompt_audio_path):
             logger.error(f"Prompt audio file not found: {self.prompt_audio_path}")
             return None
 
-        file_path = f"cache/speech_temp.{self.format}"
+        file_path = new_cache_path(self.format)
 
         try:
             logger.info(f"Generating speech for text: {text[:50]}...")
 
-            response = self.client.predict(
-                prompt=handle_file(self.prompt_audio_path),
-                text=text,
-                infer_mode=self.infer_mode,
-                max_text_tokens_per_sentence=self.max_text_tokens_per_sentence,
-                sentences_bucket_max_size=self.sentences_bucket_max_size,
-                param_5=True,
-                param_6=0.8,
-                param_7=30,
-                param_8=1,
-                param_9=0,
-                param_10=3,
-                param_11=10,
-                param_12=600,
-                api_name="/gen_single"
-            )
+            # /gen_single inputs: prompt, text, infer_mode, max_text_tokens_per_sentence,
+            # sentences_bucket_max_size, do_sample, top_p, top_k, temperature,
+            # length_penalty, num_beams, repetition_penalty, max_mel_tokens
+            async def request(replica):
+                response = await replica.client.predict("/gen_single", [
+                    UploadedFile(self.prompt_audio_path),
+                    text,
+                    self.infer_mode,
+                    self.max_text_tokens_per_sentence,
+                    self.sentences_bucket_max_size,
+                    True,
+                    0.8,
+                    30,
+                    1,
+                    0,
+                    3,
+                    10,
+                    600,
+                ])
 
-            # IndexTTS返回格式: {'visible': True, 'value': 'path/to/audio.wav', '__type__': 'update'}
-            if isinstance(response, dict) and 'value' in response:
-                generated_audio_path = response['value']
-                if os.path.exists(generated_audio_path):
-                    import shutil
-                    shutil.copy2(generated_audio_path, file_path)
-                    logger.info(f"Audio generated successfully: {file_path}")
-                    return file_path
+                # IndexTTS返回格式: [{'visible': True, 'value': {'path': ..., 'url': ...}, '__type__': 'update'}]
+                output = response[0] if response else None
+                if isinstance(output, dict) and isinstance(output.get("value"), dict):
+                    # 生成的文件只存在于处理该请求的服务器上
+                    return await replica.client.download(output["value"], file_path)
 
-            logger.error(f"Failed to get audio file from response: {response}")
-            return None
+                logger.error(f"Failed to get audio file from response: {response}")
+                return None
+
+            file_path = await self.pool.call(request)
+            if file_path:
+                logger.info(f"Audio generated successfully: {file_path}")
+            return file_path
 
         except Exception as e:
             logger.error(f"Error generating audio: {e}")
-            return None
\ No newline at end of file
+            return None
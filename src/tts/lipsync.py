@@ -0,0 +1,76 @@
+import numpy as np
+import soundfile as sf
+from typing import AsyncIterator
+from tts.audio_utils import decode_wav_stream
+
+
+# Energies below this level count as a closed mouth; 0 dBFS is fully open
+FLOOR_DB = -60.0
+
+
+def _to_mono(samples: np.ndarray) -> np.ndarray:
+    return samples.mean(axis=1) if samples.ndim > 1 else samples
+
+
+def energy_envelope(samples: np.ndarray, hop: int) -> np.ndarray:
+    """
+    RMS energy of consecutive windows of hop samples, mapped to 0-255
+
+    The level is mapped on a fixed dB scale (FLOOR_DB..0 dBFS) instead of
+    being normalized per clip, so streamed chunks and whole files give the
+    same values.
+
+    Returns:
+        np.ndarray: uint8 mouth openness per window; a trailing partial window is dropped
+    """
+    frames = len(samples) // hop
+    if frames == 0:
+        return np.zeros(0, dtype=np.uint8)
+    windows = _to_mono(samples)[:frames * hop].reshape(frames, hop).astype(np.float32)
+    rms = np.sqrt(np.mean(np.square(windows), axis=1))
+    db = 20 * np.log10(np.maximum(rms, 1e-10))
+    return np.round(np.clip(1 - db / FLOOR_DB, 0, 1) * 255).astype(np.uint8)
+
+
+def lipsync_track(samples: np.ndarray, sample_rate: int, fps: int = 30) -> dict:
+    """
+    Lip-sync track of a whole clip
+
+    Returns:
+        dict: {"fps": frames per second, "energy": mouth openness per frame (0-255)}
+    """
+    hop = max(1, round(sample_rate / fps))
+    # The last partial frame is padded, so the track covers the full clip
+    padded = np.concatenate([_to_mono(samples), np.zeros(-len(samples) % hop, dtype=np.float32)])
+    return {"fps": sample_rate / hop, "energy": energy_envelope(padded, hop).tolist()}
+
+
+def lipsync_from_file(file_path: str, fps: int = 30) -> dict:
+    samples, sample_rate = sf.read(file_path, dtype="float32")
+    return lipsync_track(samples, sample_rate, fps)
+
+
+async def lipsync_from_wav_stream(chunks: AsyncIterator[bytes], fps: int = 30) -> AsyncIterator[dict]:
+    """
+    Lip-sync frames of a streamed WAV, emitted as soon as the audio for them arrives
+
+    Yields:
+        dict: {"fps": frames per second, "start": index of the first frame, "energy": [...]}
+    """
+    hop = None
+    pending = np.zeros(0, dtype=np.float32)
+    start = 0
+
+    async for sample_rate, _, samples in decode_wav_stream(chunks):
+        if hop is None:
+            hop = max(1, round(sample_rate / fps))
+        pending = np.concatenate([pending, _to_mono(samples)])
+        energy = energy_envelope(pending, hop)
+        if len(energy):
+            pending = pending[len(energy) * hop:]
+            yield {"fps": sample_rate / hop, "start": start, "energy": energy.tolist()}
+            start += len(energy)
+
+    if hop is not None and len(pending):
+        padded = np.concatenate([pending, np.zeros(hop - len(pending), dtype=np.float32)])
+        yield {"fps": sample_rate / hop, "start": start, "energy": energy_envelope(padded, hop).tolist()}
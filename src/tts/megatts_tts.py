@@ -1,18 +1,28 @@
 import os
 from typing import Literal
-from gradio_client import Client, handle_file
 from loguru import logger
+from tts.replica_pool import ReplicaPool
+from tts.gradio_api import GradioAPIClient, UploadedFile
+from tts.audio_utils import new_cache_path
 
 class MegaTTS(): 
     def __init__(
             self,
             inp_audio: str,
             inp_npy: str,
-            api_url: str = "http://127.0.0.1:7929",
+            api_url: str | list[str] = "http://127.0.0.1:7929",
             infer_timestep: float = 32, # The input value that is provided in the "infer timestep" Number component.
             p_w: float = 1.4, # The input value that is provided in the "Intelligibility Weight" Number component.
             t_w: float = 3, # The input value that is provided in the "Similarity Weight" Number component.
-            format: str = "wav"
+            format: str = "wav",
+            # http client args
+            connect_timeout: float = 5.0,
+            read_timeout: float = 120.0,
+            max_retries: int = 2,
+            max_concurrency: int = 2,
+            # replica args (when api_url is a list)
+            health_interval: float = 10.0,
+            hedge_after: float | None = None,
     ):
         self.api_url = api_url
         self.inp_audio = inp_audio
@@ -22,7 +32,20 @@ class MegaTTS():
         self.t_w = t_w
         self.format = format
 
-        self.client = Client(self.api_url)
+        # reference audio/npy are uploaded once per server and reused across requests
+        self.pool = ReplicaPool(
+            api_url if isinstance(api_url, list) else [api_url],
+            client_factory=GradioAPIClient,
+            http_kwargs={
+                "connect_timeout": connect_timeout,
+                "read_timeout": read_timeout,
+                "max_retries": max_retries,
+                "max_concurrency": max_concurrency,
+            },
+            health_path="/config",
+            health_interval=health_interval,
+            hedge_after=hedge_after,
+        )
 
         logger.info(f"""-----Initialized MegaTTS with----- \n 
                     - api_url: {api_url} \n 
@@ -32,42 +55,41 @@ class MegaTTS():
                     - p_w: {p_w} \n 
                     - t_w: {t_w} \n """)
 
-    def generate_speech(self, text: str):
+    async def generate_speech(self, text: str):
         """
         生成语音
         
         Args:
             text: 要转换的文本
-            prompt_audio_path: 参考音频文件路径
         """
-
-        if not os.path.exists("cache"):
-            os.makedirs("cache")
-
-        file_path = f"cache/speech_temp.{self.format}"
+        file_path = new_cache_path(self.format)
 
         try:
             logger.info(f"Generating speech for text: {text[:50]}...")
 
-            response = self.client.predict(
-                inp_audio=handle_file(self.inp_audio),
-                inp_npy=handle_file(self.inp_npy),
-                inp_text=text,
-                infer_timestep=self.infer_timestep,
-                p_w=self.p_w,
-                t_w=self.t_w,
-                api_name="/predict"
-            )
-            
-            # MegaTTS返回直接的字符串路径
-            if isinstance(response, str) and os.path.exists(response):
-                import shutil
-                shutil.copy2(response, file_path)
-                logger.info(f"Audio generated successfully: {file_path}")
-                return file_path
+            async def request(replica):
+                response = await replica.client.predict("/predict", [
+                    UploadedFile(self.inp_audio),
+                    UploadedFile(self.inp_npy),
+                    text,
+                    self.infer_timestep,
+                    self.p_w,
+                    self.t_w,
+                ])
 
-            logger.error(f"Failed to get audio file from response: {response}")
-            return None 
+                # MegaTTS返回单个音频文件
+                output = response[0] if response else None
+                if isinstance(output, dict) and output.get("path"):
+                    # 生成的文件只存在于处理该请求的服务器上
+                    return await replica.client.download(output, file_path)
+
+                logger.error(f"Failed to get audio file from response: {response}")
+                return None
+
+            file_path = await self.pool.call(request)
+            if file_path:
+                logger.info(f"Audio generated successfully: {file_path}")
+            return file_path
 
         except Exception as e:
             logger.error(f"Error generating audio: {e}")
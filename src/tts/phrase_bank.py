@@ -0,0 +1,124 @@
+import os
+import json
+import random
+import asyncio
+import hashlib
+from loguru import logger
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+
+@dataclass
+class Phrase:
+    text: str
+    file_path: str
+    lipsync: dict | None = None
+
+
+class PhraseBank():
+    def __init__(
+            self,
+            synthesize: Callable[[str], Awaitable[str | None]],
+            voice_key: str,
+            fillers: list[str] | None = None,
+            fallbacks: dict[str, str] | None = None,
+            manifest_path: str = "cache/phrase_bank.json",
+            lipsync: Callable[[str], dict] | None = None,
+    ):
+        """
+        Pre-synthesized character phrases: fillers played while the LLM thinks and
+        fallback replies that need no synthesis at request time
+
+        Args:
+            - synthesize: Async TTS call returning the generated file path (content addressed)
+            - voice_key(str): Identifies the TTS backend and voice; clips made with a
+              different voice are not reused
+            - fillers(list[str]): Short in-character interjections
+            - fallbacks(dict[str, str]): Named fallback replies, e.g. {"text": "抱歉..."}
+            - manifest_path(str): Remembers synthesized clips across restarts
+            - lipsync: Computes the lip-sync track of a clip, if enabled
+        """
+        self.synthesize = synthesize
+        self.voice_key = hashlib.sha256(voice_key.encode("utf-8")).hexdigest()[:16]
+        self.fillers = list(fillers or [])
+        self.fallbacks = dict(fallbacks or {})
+        self.manifest_path = manifest_path
+        self.lipsync = lipsync
+
+        self.phrases: dict[str, Phrase] = {}
+        self._last_filler: str | None = None
+
+        logger.info(f"""-----Initialized PhraseBank with----- \n
+                    - fillers: {len(self.fillers)} \n
+                    - fallbacks: {list(self.fallbacks)} \n
+                    - manifest_path: {manifest_path} \n """)
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: dict):
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _load_phrase(self, text: str, file_path: str) -> Phrase:
+        return Phrase(text, file_path, self.lipsync(file_path) if self.lipsync else None)
+
+    async def warm(self):
+        """
+        Make every phrase available, synthesizing only those not rendered before with this voice
+
+        Phrases become usable one by one, so the server does not wait for the whole bank.
+        """
+        manifest = self._load_manifest()
+        voice = manifest.setdefault(self.voice_key, {})
+
+        texts = list(dict.fromkeys([*self.fillers, *self.fallbacks.values()]))
+        synthesized = 0
+        for text in texts:
+            file_path = voice.get(text)
+            if not file_path or not os.path.isfile(file_path):
+                file_path = await self.synthesize(text)
+                if not file_path:
+                    logger.warning(f"Failed to synthesize phrase: {text}")
+                    continue
+                voice[text] = file_path
+                synthesized += 1
+
+            try:
+                self.phrases[text] = await asyncio.to_thread(self._load_phrase, text, file_path)
+            except Exception as e:
+                logger.warning(f"Failed to load phrase {text}: {e}")
+
+        if synthesized:
+            await asyncio.to_thread(self._save_manifest, manifest)
+        logger.info(f"Phrase bank ready: {len(self.phrases)}/{len(texts)} phrases, {synthesized} newly synthesized")
+
+    def files(self) -> set[str]:
+        """Clips of this voice, loaded or recorded in the manifest, which the audio cache must keep"""
+        files = {phrase.file_path for phrase in list(self.phrases.values())}
+        files.update(self._load_manifest().get(self.voice_key, {}).values())
+        return files
+
+    def lookup(self, text: str) -> Phrase | None:
+        """Pre-rendered clip of exactly this text, if any"""
+        return self.phrases.get(text)
+
+    def filler(self) -> Phrase | None:
+        """A random ready filler, avoiding the one played last"""
+        ready = [text for text in self.fillers if text in self.phrases]
+        if len(ready) > 1 and self._last_filler in ready:
+            ready.remove(self._last_filler)
+        if not ready:
+            return None
+        self._last_filler = random.choice(ready)
+        return self.phrases[self._last_filler]
+
+    def fallback_text(self, name: str, default: str) -> str:
+        return self.fallbacks.get(name, default)
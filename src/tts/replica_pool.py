@@ -0,0 +1,244 @@
+import time
+import asyncio
+from loguru import logger
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+from tts.http_client import AsyncHTTPClient
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class RequestRejected(Exception):
+    """The replica answered but rejected the request (e.g. HTTP 4xx); not retried and not held against the replica"""
+
+
+class Replica(Generic[T]):
+    def __init__(self, url: str, http: AsyncHTTPClient, client: T):
+        self.url = url
+        self.http = http
+        self.client = client
+
+        self.outstanding = 0
+        self.latency_ewma: float | None = None
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "outstanding": self.outstanding,
+            "latency_ewma": self.latency_ewma,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class ReplicaPool(Generic[T]):
+    def __init__(
+            self,
+            urls: list[str],
+            client_factory: Callable[[AsyncHTTPClient], T],
+            http_kwargs: dict | None = None,
+            health_path: str = "/",
+            health_interval: float = 10.0,
+            failure_threshold: int = 2,
+            eject_base: float = 5.0,
+            eject_max: float = 120.0,
+            hedge_after: float | None = None,
+    ):
+        """
+        Replicas of a remote TTS server with health checks and least-loaded routing
+
+        Args:
+            - urls(list[str]): Server urls, one per replica
+            - client_factory: Builds the backend client of a replica from its AsyncHTTPClient
+            - http_kwargs(dict): Extra arguments of each replica's AsyncHTTPClient
+            - health_path(str): Path probed periodically; an error or a response of 500 or above ejects the replica
+            - health_interval(float): Seconds between health probes. 0 disables probing
+            - failure_threshold(int): Consecutive failures before a replica is ejected
+            - eject_base(float): First ejection time in seconds, doubled on every further ejection
+            - eject_max(float): Upper bound of the ejection time
+            - hedge_after(float): If set, a request still running after this many seconds is
+              also sent to a second replica and the first answer wins
+        """
+        if not urls:
+            raise ValueError("ReplicaPool needs at least one url")
+
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.eject_base = eject_base
+        self.eject_max = eject_max
+        self.hedge_after = hedge_after
+
+        self.replicas: list[Replica[T]] = []
+        for url in urls:
+            http = AsyncHTTPClient(url, **(http_kwargs or {}))
+            self.replicas.append(Replica(url, http, client_factory(http)))
+
+        self._health_task: asyncio.Task | None = None
+
+        logger.info(f"""-----Initialized ReplicaPool with----- \n
+                    - urls: {urls} \n
+                    - health_path: {health_path} \n
+                    - health_interval: {health_interval} \n
+                    - hedge_after: {hedge_after} \n """)
+
+    def _ensure_health_checks(self):
+        # The pool is created before the event loop runs, so probing starts on first use
+        if self.health_interval and len(self.replicas) > 1 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _probe(self, replica: Replica[T]):
+        try:
+            response = await replica.http.client.get(self.health_path, timeout=self.health_interval)
+            healthy = response.status_code < 500
+        except Exception:
+            healthy = False
+
+        # the probe only shows the server is up, not that synthesis works, so it never
+        # re-admits a replica: an ejection lasts until ejected_until, after which the
+        # replica gets one trial request at a time (see pick); its failure count is only
+        # reset by a successful request (_record_success), so a failed trial ejects it
+        # again with a doubled backoff
+        if not healthy and replica.available:
+            self._eject(replica, "health check failed")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*(self._probe(replica) for replica in self.replicas))
+            await asyncio.sleep(self.health_interval)
+
+    def _eject(self, replica: Replica[T], reason: str):
+        duration = min(self.eject_base * (2 ** replica.ejections), self.eject_max)
+        replica.ejections += 1
+        replica.ejected_until = time.monotonic() + duration
+        logger.warning(f"Ejected replica {replica.url} for {duration:.0f}s ({reason})")
+
+    def pick(self, exclude: tuple[Replica[T], ...] = ()) -> Replica[T] | None:
+        """
+        Least outstanding requests first, then lowest latency; ejected replicas only as a last resort
+
+        A replica whose ejection ran out but which has not succeeded since (half-open)
+        gets one trial request at a time.
+        """
+        candidates = [r for r in self.replicas if r not in exclude]
+        if not candidates:
+            return None
+        available = [r for r in candidates if r.available and not (self._half_open(r) and r.outstanding)]
+        if not available:
+            return min(candidates, key=lambda r: r.ejected_until)
+        return min(available, key=lambda r: (r.outstanding, r.latency_ewma or 0.0))
+
+    def _half_open(self, replica: Replica[T]) -> bool:
+        return replica.consecutive_failures >= self.failure_threshold
+
+    def _record_success(self, replica: Replica[T], latency: float):
+        replica.consecutive_failures = 0
+        replica.ejections = 0
+        replica.ejected_until = 0.0
+        replica.latency_ewma = latency if replica.latency_ewma is None else 0.8 * replica.latency_ewma + 0.2 * latency
+
+    def _record_failure(self, replica: Replica[T], error: Exception):
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.failure_threshold and replica.available:
+            self._eject(replica, f"{type(error).__name__}: {error}")
+
+    async def _run(self, replica: Replica[T], fn: Callable[[Replica[T]], Awaitable[R]]) -> R:
+        replica.outstanding += 1
+        start = time.monotonic()
+        try:
+            result = await fn(replica)
+        except (asyncio.CancelledError, RequestRejected):
+            raise
+        except Exception as e:
+            self._record_failure(replica, e)
+            raise e
+        finally:
+            replica.outstanding -= 1
+        self._record_success(replica, time.monotonic() - start)
+        return result
+
+    async def call(self, fn: Callable[[Replica[T]], Awaitable[R]]) -> R:
+        """
+        Run fn on the least-loaded replica
+
+        fn must raise on failure. A failed request is retried once on another
+        replica; with hedge_after set, a slow request is duplicated on a second
+        replica and the first successful result is returned.
+        """
+        self._ensure_health_checks()
+
+        first = self.pick()
+        tasks = {asyncio.create_task(self._run(first, fn)): first}
+        hedged = False
+        last_error: Exception | None = None
+
+        try:
+            while tasks:
+                timeout = self.hedge_after if not hedged and self.hedge_after is not None else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Slow request: hedge on another replica, keep the first one running
+                    hedged = True
+                    second = self.pick(exclude=tuple(tasks.values()))
+                    if second is not None:
+                        logger.info(f"Hedging request on {second.url} after {self.hedge_after}s")
+                        tasks[asyncio.create_task(self._run(second, fn))] = second
+                    continue
+
+                for task in done:
+                    replica = tasks.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    if isinstance(last_error, RequestRejected):
+                        raise last_error
+                    logger.warning(f"Request to {replica.url} failed: {last_error}")
+
+                    # Fail over once to a replica that has not been tried yet
+                    if not hedged:
+                        hedged = True
+                        retry = self.pick(exclude=(replica, *tasks.values()))
+                        if retry is not None:
+                            tasks[asyncio.create_task(self._run(retry, fn))] = retry
+
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @asynccontextmanager
+    async def lease(self):
+        """Hold the least-loaded replica for a streaming request (no failover or hedging)"""
+        self._ensure_health_checks()
+        replica = self.pick()
+        replica.outstanding += 1
+        start = time.monotonic()
+        try:
+            yield replica
+        except RequestRejected:
+            raise
+        except Exception as e:
+            self._record_failure(replica, e)
+            raise e
+        else:
+            self._record_success(replica, time.monotonic() - start)
+        finally:
+            replica.outstanding -= 1
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [replica.stats() for replica in self.replicas]
+
+    async def aclose(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for replica in self.replicas:
+            await replica.http.aclose()
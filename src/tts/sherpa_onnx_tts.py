@@ -1,9 +1,15 @@
 import os
+import queue
+import threading
 import sherpa_onnx
 import numpy as np
 import soundfile as sf
 from loguru import logger
-from typing import List, Literal
+from typing import AsyncIterator, Iterator, List, Literal, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from async_utils import ThreadBridge
+from tts.audio_utils import new_cache_path, wav_stream_header, float_to_pcm16
+from tts.text_utils import split_sentences
 
 class SherpaOnnxTTS():
     def __init__(
@@ -37,6 +43,10 @@ class SherpaOnnxTTS():
         sid: int = 0,  # Speaker ID. Used only for multi-speaker models
         speed: float = 1.0,  # Speed of the speech
         format: Literal["mp3", "wav", "pcm"] = "wav",  # Format for the output audio
+        # parallel args
+        parallel: bool = False,  # Synthesize sentences concurrently on a pool of models
+        num_workers: int = 0,  # Number of models in the pool, 0 = cpu cores / num_threads
+        sentence_silence: float = 0.1,  # Seconds of silence inserted between sentences
     ):
         # vits args
         self.vits_model = vits_model
@@ -67,9 +77,25 @@ class SherpaOnnxTTS():
         self.sid = sid
         self.speed = speed
         self.format = format
+        # parallel args
+        self.parallel = parallel
+        self.num_workers = (num_workers or max(1, (os.cpu_count() or 1) // num_threads)) if parallel else 1
+        self.sentence_silence = sentence_silence
 
-        # initialize tts
-        self.tts = sherpa_onnx.OfflineTts(self.initialize_vits_config())
+        # initialize tts, one model instance per worker (an instance is not safe to share between threads)
+        tts_config = self.initialize_vits_config()
+        self.tts = sherpa_onnx.OfflineTts(tts_config)
+        self._instances: queue.Queue = queue.Queue()
+        self._instances.put(self.tts)
+        for _ in range(self.num_workers - 1):
+            self._instances.put(sherpa_onnx.OfflineTts(tts_config))
+        self._executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="sherpa_tts") if parallel else None
+        # with a pool every request takes its own instance and writes its own file, so concurrent
+        # requests need no serialization; a single instance is serialized by the caller instead
+        # of blocking a thread per waiting request
+        self.thread_safe = self.num_workers > 1
+        self.sample_rate = self.tts.sample_rate
+        self.stream_media_type = "audio/wav"
 
         logger.info(f"""Initialized SherpaOnnxTTS with: \n 
                     - vits_model: {self.vits_model} \n 
@@ -77,6 +103,8 @@ class SherpaOnnxTTS():
                     - matcha_vocoder: {self.matcha_vocoder} \n 
                     - kokoro_model: {self.kokoro_model} \n 
                     - provider: {self.provider} \n 
+                    - parallel: {self.parallel} \n 
+                    - num_workers: {self.num_workers} \n 
                     - debug: {self.debug}""")
 
     def initialize_vits_config(self):
@@ -118,26 +146,78 @@ class SherpaOnnxTTS():
         
         return tts_config
 
-    def generate_speech(self, text: str):
-        
-        if not os.path.exists(f"cache"):
-            os.makedirs(f"cache")
+    def _generate_samples(self, text: str, callback=None) -> Tuple[np.ndarray, int]:
+        tts = self._instances.get()
+        try:
+            if callback is None:
+                audio = tts.generate(text, sid=self.sid, speed=self.speed)
+            else:
+                audio = tts.generate(text, sid=self.sid, speed=self.speed, callback=callback)
+        finally:
+            self._instances.put(tts)
+        return np.asarray(audio.samples, dtype=np.float32), audio.sample_rate
 
-        file_path = f"cache/speech_temp.{self.format}"
-        
-        print(file_path)
+    def generate_sentences(self, text: str, callback=None) -> Iterator[Tuple[np.ndarray, int]]:
+        """
+        Synthesize text sentence by sentence
+
+        In parallel mode all sentences are submitted to the model pool at once and
+        yielded in reading order, so the first sentence is available as soon as it
+        is done while the rest are still being synthesized.
+
+        Yields:
+            Tuple[np.ndarray, int]: float32 samples and sample rate of each sentence
+        """
+        if not self.parallel:
+            yield self._generate_samples(text, callback)
+            return
+
+        futures = [self._executor.submit(self._generate_samples, sentence, callback) for sentence in split_sentences(text)]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Consumer stopped early: drop sentences that have not started yet
+            for future in futures:
+                future.cancel()
+
+    def generate_speech(self, text: str, cancel_event: threading.Event | None = None):
+        """
+        Synthesize text into a file in the cache directory
+
+        Args:
+            text: Text to synthesize
+            cancel_event: When set (e.g. the user interrupted the reply), generation stops
+                and None is returned
+        """
+        file_path = new_cache_path(self.format)
+
+        # returning 0 from the progress callback tells sherpa-onnx to stop generating
+        callback = (lambda samples, progress: 0 if cancel_event.is_set() else 1) if cancel_event else None
 
         try:
-            audio = self.tts.generate(text, sid=self.sid, speed=self.speed)
+            chunks = []
+            sample_rate = None
+            sentences = self.generate_sentences(text, callback)
+            for samples, sample_rate in sentences:
+                if cancel_event and cancel_event.is_set():
+                    sentences.close()
+                    logger.info("Speech generation cancelled")
+                    return None
+                if len(samples) == 0:
+                    continue
+                if chunks and self.sentence_silence > 0:
+                    chunks.append(np.zeros(int(sample_rate * self.sentence_silence), dtype=np.float32))
+                chunks.append(samples)
 
-            if len(audio.samples) == 0:
+            if not chunks:
                 logger.error("Error in generating audio, please check the text and model")
                 return None
             
             sf.write(
                 file_path,
-                audio.samples,
-                audio.sample_rate,
+                np.concatenate(chunks),
+                sample_rate,
                 subtype="PCM_16"
             )
 
@@ -146,3 +226,62 @@ class SherpaOnnxTTS():
         except Exception as e:
             logger.error(f"Error in generating audio: {e}")
             return None
+
+    async def stream_samples(self, text: str) -> AsyncIterator[np.ndarray]:
+        """
+        Stream synthesized audio while the model is still generating
+
+        Without parallel mode, chunks come from the sherpa-onnx generation callback
+        as soon as the model produces them; in parallel mode, one chunk per
+        sentence in reading order. Closing the iterator stops generation.
+
+        Yields:
+            np.ndarray: float32 samples at self.sample_rate
+        """
+        bridge = ThreadBridge()
+        silence = np.zeros(int(self.sample_rate * self.sentence_silence), dtype=np.float32)
+
+        def on_samples(samples, progress):
+            # Runs on the native thread; the buffer is only valid during the call
+            bridge.put(np.array(samples, dtype=np.float32))
+            # returning 0 tells sherpa-onnx to stop generating
+            return 0 if bridge.cancelled else 1
+
+        def worker():
+            try:
+                if not self.parallel:
+                    self._generate_samples(text, callback=on_samples)
+                else:
+                    sentences = self.generate_sentences(text)
+                    try:
+                        for index, (samples, _) in enumerate(sentences):
+                            if bridge.cancelled:
+                                break
+                            if index and len(silence):
+                                bridge.put(silence)
+                            bridge.put(samples)
+                    finally:
+                        sentences.close()
+                bridge.close()
+            except BaseException as e:
+                bridge.close(e)
+
+        threading.Thread(target=worker, daemon=True).start()
+        async for samples in bridge:
+            if len(samples):
+                yield samples
+
+    async def stream_speech(self, text: str) -> AsyncIterator[bytes]:
+        """
+        Stream synthesized audio as WAV
+
+        Yields:
+            bytes: A WAV header followed by 16-bit PCM chunks
+        """
+        yield wav_stream_header(self.sample_rate)
+        samples = self.stream_samples(text)
+        try:
+            async for chunk in samples:
+                yield float_to_pcm16(chunk)
+        finally:
+            await samples.aclose()
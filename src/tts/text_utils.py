@@ -0,0 +1,67 @@
+import re
+from typing import List
+
+
+# Sentence terminators (CJK and latin), closing quotes/brackets stay with their sentence
+_SENTENCE_END = re.compile(r'([。！？!?；;…~～\n]+[”’」』）)]*|(?<=[a-zA-Z0-9\)])\.(?=\s))')
+_CLAUSE_END = re.compile(r'([，,、：:]+)')
+
+
+def _split_keep(pattern: re.Pattern, text: str) -> List[str]:
+    parts = pattern.split(text)
+    pieces = []
+    for i in range(0, len(parts), 2):
+        piece = parts[i] + (parts[i + 1] if i + 1 < len(parts) and parts[i + 1] else "")
+        if piece.strip():
+            pieces.append(piece.strip())
+    return pieces
+
+
+def _join(left: str, right: str) -> str:
+    # Latin text needs the whitespace back that splitting stripped
+    if left and right and left[-1].isascii() and right[0].isascii():
+        return f"{left} {right}"
+    return left + right
+
+
+def split_sentences(text: str, min_chars: int = 4, max_chars: int = 80) -> List[str]:
+    """
+    Split text into sentences for independent synthesis
+
+    Args:
+        text: Text to split
+        min_chars: Sentences shorter than this are merged into the next one
+            (very short inputs synthesize poorly and waste a model call)
+        max_chars: Longer sentences are split further at clause punctuation
+
+    Returns:
+        List[str]: Sentences in reading order
+    """
+    sentences = []
+    for sentence in _split_keep(_SENTENCE_END, text):
+        if len(sentence) <= max_chars:
+            sentences.append(sentence)
+            continue
+
+        current = ""
+        for clause in _split_keep(_CLAUSE_END, sentence):
+            if current and len(current) + len(clause) > max_chars:
+                sentences.append(current)
+                current = ""
+            current = _join(current, clause)
+        if current:
+            sentences.append(current)
+
+    merged = []
+    pending = ""
+    for sentence in sentences:
+        pending = _join(pending, sentence)
+        if len(pending) >= min_chars:
+            merged.append(pending)
+            pending = ""
+    if pending:
+        if merged:
+            merged[-1] = _join(merged[-1], pending)
+        else:
+            merged.append(pending)
+    return merged
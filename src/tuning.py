@@ -0,0 +1,285 @@
+"""
+Tune sherpa-onnx ASR and TTS sessions for this machine.
+
+Every candidate combination of provider, threads per session and session pool
+size (TTS model instances, concurrent ASR decodes) is loaded and benchmarked under the expected number of concurrent
+requests. The best combination is written to tuning.yaml next to the config,
+and is applied on top of the config whenever the server starts on the same host.
+
+Example:
+    python src/tuning.py --config frontend/public/default.yaml --concurrency 4
+"""
+import os
+import gc
+import time
+import argparse
+import platform
+import threading
+import numpy as np
+import yaml
+from datetime import datetime
+from loguru import logger
+from concurrent.futures import ThreadPoolExecutor
+
+TUNING_FILE = "tuning.yaml"
+BENCHMARK_TEXT = "你好呀，小家伙。今天的稻妻也很热闹呢，要不要陪我去八重堂看看新出的小说？"
+OBJECTIVES = ("balanced", "throughput", "latency")
+
+
+def tuning_path(config_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(config_path)), TUNING_FILE)
+
+
+def host_fingerprint() -> dict:
+    """Tuning results are only valid on the machine they were measured on"""
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def thread_candidates(max_threads: int) -> list[int]:
+    candidates = []
+    threads = 1
+    while threads < max_threads:
+        candidates.append(threads)
+        threads *= 2
+    candidates.append(max_threads)
+    return candidates
+
+
+def run_load(fn, concurrency: int, requests: int) -> dict:
+    """
+    Run fn requests times from concurrency threads
+
+    Returns:
+        dict: {"throughput": requests per second, "p50": seconds, "p95": seconds}
+    """
+    # warm up every thread's first run (allocations, lazy initialization)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: fn(), range(concurrency)))
+
+    latencies = []
+    lock = threading.Lock()
+
+    def timed(_):
+        started = time.perf_counter()
+        fn()
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "throughput": round(requests / elapsed, 3),
+        "p50": round(float(np.percentile(latencies, 50)), 4),
+        "p95": round(float(np.percentile(latencies, 95)), 4),
+    }
+
+
+def pick_best(results: list[dict], objective: str = "balanced") -> dict | None:
+    """
+    Choose the best measured settings
+
+    - throughput: most requests per second
+    - latency: lowest p95 latency
+    - balanced: most requests per second among results within 25% of the lowest p95
+    """
+    results = [result for result in results if "error" not in result]
+    if not results:
+        return None
+    if objective == "latency":
+        return min(results, key=lambda result: (result["p95"], -result["throughput"]))
+    if objective == "balanced":
+        fastest = min(result["p95"] for result in results)
+        results = [result for result in results if result["p95"] <= fastest * 1.25]
+    return max(results, key=lambda result: (result["throughput"], -result["p95"]))
+
+
+def _benchmark(name: str, settings: dict, build, run, concurrency: int, requests: int) -> dict:
+    result = dict(settings)
+    model = None
+    try:
+        started = time.perf_counter()
+        model = build(settings)
+        result["load_time"] = round(time.perf_counter() - started, 3)
+        result.update(run_load(lambda: run(model), concurrency, requests))
+        logger.info(f"{name} {settings}: {result['throughput']} req/s, p50 {result['p50']}s, p95 {result['p95']}s")
+    except Exception as e:
+        # e.g. a provider this build of onnxruntime does not support
+        logger.warning(f"{name} {settings} failed: {e}")
+        result["error"] = str(e)
+    finally:
+        del model
+        gc.collect()
+    return result
+
+
+def tune_asr(asr_config: dict, audio: np.ndarray, providers: list[str], concurrency: int, requests: int, max_threads: int) -> list[dict]:
+    from asr.sherpa_onnx_asr import SherpaOnnxASR
+
+    def build(settings):
+        return SherpaOnnxASR(**{**asr_config, **settings})
+
+    results = []
+    for provider in providers:
+        for num_threads in thread_candidates(max_threads):
+            # more concurrent decodes than requests are never used
+            for num_workers in thread_candidates(max(1, min(concurrency, max_threads // num_threads))):
+                settings = {"provider": provider, "num_threads": num_threads, "num_workers": num_workers}
+                results.append(_benchmark("ASR", settings, build, lambda model: model.audio2text(audio), concurrency, requests))
+    return results
+
+
+def tune_tts(tts_config: dict, text: str, providers: list[str], concurrency: int, requests: int, max_threads: int) -> list[dict]:
+    from tts.sherpa_onnx_tts import SherpaOnnxTTS
+
+    def build(settings):
+        return SherpaOnnxTTS(**{**tts_config, **settings})
+
+    def run(model):
+        for _ in model.generate_sentences(text):
+            pass
+
+    results = []
+    cpu_count = os.cpu_count() or 1
+    for provider in providers:
+        for num_threads in thread_candidates(max_threads):
+            # sessions beyond the core count only compete with each other
+            for num_workers in thread_candidates(max(1, cpu_count // num_threads)):
+                settings = {"provider": provider, "num_threads": num_threads, "parallel": num_workers > 1, "num_workers": num_workers}
+                results.append(_benchmark("TTS", settings, build, run, concurrency, requests))
+    return results
+
+
+def benchmark_audio(config: dict, audio_path: str | None = None, sample_rate: int = 16000) -> np.ndarray:
+    """
+    Speech to benchmark the ASR with: the given file, otherwise a sentence
+    synthesized by the configured sherpa-onnx TTS, otherwise quiet noise
+    """
+    import soxr
+    import soundfile as sf
+
+    if audio_path:
+        audio, source_rate = sf.read(audio_path, dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+    elif config["system"]["default_model"]["tts"] == "sherpa_onnx":
+        from tts.sherpa_onnx_tts import SherpaOnnxTTS
+        audio, source_rate = SherpaOnnxTTS(**config["tts"]["sherpa_onnx"])._generate_samples(BENCHMARK_TEXT)
+    else:
+        logger.warning("No benchmark audio, using noise; pass --audio for representative ASR numbers")
+        return (np.random.default_rng(0).standard_normal(sample_rate * 5) * 0.01).astype(np.float32)
+
+    if source_rate != sample_rate:
+        audio = soxr.resample(audio, source_rate, sample_rate)
+    return np.asarray(audio, dtype=np.float32)
+
+
+def tune(
+        config: dict,
+        concurrency: int = 4,
+        requests: int = 0,
+        providers: list[str] | None = None,
+        max_threads: int = 0,
+        objective: str = "balanced",
+        audio_path: str | None = None,
+) -> dict:
+    """
+    Benchmark the configured sherpa-onnx models and return the tuning to persist
+
+    Only backends set to sherpa_onnx in system.default_model are tuned.
+    """
+    providers = providers or ["cpu"]
+    requests = requests or max(concurrency * 3, 6)
+    max_threads = max_threads or os.cpu_count() or 1
+    default_model = config["system"]["default_model"]
+
+    tuning = {
+        "host": host_fingerprint(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "concurrency": concurrency,
+        "objective": objective,
+        "asr": {},
+        "tts": {},
+        "results": {},
+    }
+
+    if config["system"]["chat_mode"] != "text_only" and default_model["asr"] == "sherpa_onnx":
+        audio = benchmark_audio(config, audio_path)
+        results = tune_asr(config["asr"]["sherpa_onnx"], audio, providers, concurrency, requests, max_threads)
+        best = pick_best(results, objective)
+        tuning["results"]["asr"] = results
+        if best:
+            tuning["asr"]["sherpa_onnx"] = {key: best[key] for key in ("provider", "num_threads", "num_workers")}
+
+    if default_model["tts"] == "sherpa_onnx":
+        results = tune_tts(config["tts"]["sherpa_onnx"], BENCHMARK_TEXT, providers, concurrency, requests, max_threads)
+        best = pick_best(results, objective)
+        tuning["results"]["tts"] = results
+        if best:
+            tuning["tts"]["sherpa_onnx"] = {key: best[key] for key in ("provider", "num_threads", "parallel", "num_workers")}
+
+    return tuning
+
+
+def save_tuning(config_path: str, tuning: dict):
+    path = tuning_path(config_path)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(tuning, f, allow_unicode=True, sort_keys=False)
+    os.replace(temp_path, path)
+    logger.info(f"Saved tuning to {path}")
+
+
+def load_tuning(config_path: str) -> dict | None:
+    """The persisted tuning, if it was measured on this host"""
+    path = tuning_path(config_path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tuning = yaml.safe_load(f) or {}
+    except OSError:
+        return None
+
+    if tuning.get("host") != host_fingerprint():
+        logger.warning(f"Ignoring {path}: it was measured on a different host, run src/tuning.py again")
+        return None
+    return tuning
+
+
+def apply_tuning(config: dict, tuning: dict | None) -> dict:
+    """Override the model settings in config with the tuned ones"""
+    if not tuning:
+        return config
+    for section in ("asr", "tts"):
+        for model_name, settings in (tuning.get(section) or {}).items():
+            if model_name in config.get(section, {}):
+                config[section][model_name].update(settings)
+                logger.info(f"Applied tuned {section}.{model_name} settings: {settings}")
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune sherpa-onnx ASR/TTS threads, providers and session pools for this machine")
+    parser.add_argument("--config", default="frontend/public/default.yaml")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent requests to tune for")
+    parser.add_argument("--requests", type=int, default=0, help="requests per measurement, default 3x concurrency")
+    parser.add_argument("--providers", nargs="+", default=["cpu"], help="onnxruntime providers to try, e.g. cpu cuda")
+    parser.add_argument("--max-threads", type=int, default=0, help="largest thread count per session, default all cores")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="balanced")
+    parser.add_argument("--audio", default=None, help="speech recording to benchmark the ASR with")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+
+    tuning = tune(config, args.concurrency, args.requests, args.providers, args.max_threads, args.objective, args.audio)
+    save_tuning(args.config, tuning)
+    print(yaml.safe_dump({"asr": tuning["asr"], "tts": tuning["tts"]}, allow_unicode=True, sort_keys=False))
+
+
+if __name__ == "__main__":
+    main()
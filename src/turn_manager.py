@@ -0,0 +1,100 @@
+import time
+import uuid
+import asyncio
+from loguru import logger
+from typing import Any, Awaitable, Callable
+
+
+class TurnInterrupted(Exception):
+    """The turn was superseded by a newer turn or an explicit interrupt"""
+
+
+class Turn():
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turn_id = uuid.uuid4().hex
+        self.started = time.monotonic()
+        self.task: asyncio.Task | None = None
+        self.interrupted = False
+        self._cleanups: list[Callable[[], Any]] = []
+
+    def on_interrupt(self, cleanup: Callable[[], Any]):
+        """Register work to abort when the turn is interrupted, e.g. cancelling an audio stream"""
+        self._cleanups.append(cleanup)
+
+    def _interrupt(self):
+        self.interrupted = True
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        for cleanup in self._cleanups:
+            try:
+                cleanup()
+            except Exception as e:
+                logger.warning(f"Turn cleanup failed: {e}")
+
+
+class TurnManager():
+    def __init__(self):
+        """
+        Tracks the latest turn of every session, for barge-in
+
+        Starting a new turn interrupts the previous one of the same session: its
+        task is cancelled (closing the LLM stream and dropping queued or running
+        TTS work) and its audio streams are stopped, even when the reply was
+        already sent and is still being played.
+        """
+        self.turns: dict[str, Turn] = {}
+        self.interrupted_count = 0
+
+    def current(self, session_id: str) -> Turn | None:
+        return self.turns.get(session_id)
+
+    def in_flight(self, session_id: str) -> bool:
+        turn = self.turns.get(session_id)
+        return turn is not None and turn.task is not None and not turn.task.done()
+
+    def forget(self, session_id: str):
+        """Drop the finished turn of a session that is no longer tracked"""
+        if not self.in_flight(session_id):
+            self.turns.pop(session_id, None)
+
+    def interrupt(self, session_id: str) -> bool:
+        """
+        Interrupt the latest turn of a session
+
+        Returns:
+            bool: Whether the turn was still being generated
+        """
+        turn = self.turns.pop(session_id, None)
+        if turn is None:
+            return False
+        in_flight = turn.task is not None and not turn.task.done()
+        if in_flight:
+            logger.info(f"Interrupting turn {turn.turn_id} of session {session_id}")
+            self.interrupted_count += 1
+        turn._interrupt()
+        return in_flight
+
+    async def run(self, session_id: str, work: Callable[[Turn], Awaitable[Any]]) -> Any:
+        """
+        Run work as the new turn of a session
+
+        Raises:
+            TurnInterrupted: A newer turn or an interrupt superseded this one
+        """
+        self.interrupt(session_id)
+        turn = Turn(session_id)
+        self.turns[session_id] = turn
+        turn.task = asyncio.create_task(work(turn))
+        try:
+            return await turn.task
+        except asyncio.CancelledError:
+            if turn.interrupted:
+                raise TurnInterrupted(turn.turn_id)
+            # the request itself went away, stop its work as well
+            turn._interrupt()
+            raise
+
+    def stats(self) -> dict:
+        in_flight = sum(1 for turn in self.turns.values() if turn.task is not None and not turn.task.done())
+        return {"in_flight": in_flight, "interrupted": self.interrupted_count}